@@ -0,0 +1,223 @@
+"""
+Local micro-benchmarks of the hot paths, without a server or a database.
+
+Each suite times the current implementation against the approach it replaced and prints the best of
+``--repeat`` runs in milliseconds::
+
+    python benchmarks.py --suite routes
+
+``analyze_track_python`` is also the reference the vectorized analytics are tested against.
+"""
+import argparse
+import json
+import math
+import timeit
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from uuid import uuid4
+
+import numpy as np
+import orjson
+import shapely
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from schemas import (
+    LocationRead,
+    MovementRollup,
+    MovementRollupsResponse,
+    SessionAnalytics,
+    TrackSegments,
+    TrackStop,
+    TransportSegmentRead,
+)
+from tracking.analytics import TrackAnalytics, TrackArrays, analyze_track
+from tracking.geo import bearing, haversine
+from tracking.route_builder import StreamingSimplifier
+
+
+def analyze_track_python(
+    track: TrackArrays,
+    stop_speed: float = 0.5,
+    min_stop_duration: float = 120.0
+) -> TrackAnalytics:
+    """Pure-Python baseline of ``analyze_track``, one loop iteration per segment"""
+    timestamps = track.timestamps.tolist()
+    lon = track.lon.tolist()
+    lat = track.lat.tolist()
+    distances, durations, speeds, bearings, accelerations = [], [], [], [], []
+    for i in range(len(timestamps) - 1):
+        distance = haversine(lon[i], lat[i], lon[i + 1], lat[i + 1])
+        duration = timestamps[i + 1] - timestamps[i]
+        speed = distance / duration if duration > 0 else 0.0
+        acceleration = 0.0
+        if i > 0:
+            dt = (durations[-1] + duration) / 2
+            acceleration = (speed - speeds[-1]) / dt if dt > 0 else 0.0
+        distances.append(distance)
+        durations.append(duration)
+        speeds.append(speed)
+        bearings.append(bearing(lon[i], lat[i], lon[i + 1], lat[i + 1]))
+        accelerations.append(acceleration)
+
+    stops = []
+    run_start = None
+    run_duration = 0.0
+    for i, (speed, duration) in enumerate(zip([*speeds, math.inf], [*durations, 0.0], strict=True)):
+        if speed < stop_speed:
+            if run_start is None:
+                run_start, run_duration = i, 0.0
+            run_duration += duration
+        elif run_start is not None:
+            if run_duration >= min_stop_duration:
+                stops.append((run_start, i))
+            run_start = None
+    return TrackAnalytics(
+        *(np.array(values, dtype=np.float64) for values in (distances, durations, speeds, bearings, accelerations)),
+        np.array(stops, dtype=np.int64).reshape(-1, 2)
+    )
+
+
+def synthetic_track(size: int, seed: int = 0) -> TrackArrays:
+    """Walk with pauses: one point every 1-10 s, five minutes standing still out of every 25"""
+    rng = np.random.default_rng(seed)
+    timestamps = 1.7e9 + np.cumsum(rng.uniform(1, 10, size))
+    moving = (timestamps // 300) % 5 != 0
+    steps = rng.normal(0, 0.00003, (size, 2)) * moving[:, None]
+    lon, lat = (np.cumsum(steps, axis=0) + np.array([37.6, 55.7])).T
+    return TrackArrays(
+        timestamps, np.ascontiguousarray(lon), np.ascontiguousarray(lat), rng.uniform(3, 20, size), np.full(size, np.nan)
+    )
+
+
+def analytics_benchmark(sizes: tuple[int, ...] = (1_000, 100_000, 1_000_000), repeat: int = 3) -> dict[int, dict[str, float]]:
+    """Time of ``analyze_track`` and of the pure-Python baseline in milliseconds (best of ``repeat``)"""
+    results = {}
+    for size in sizes:
+        track = synthetic_track(size)
+        results[size] = {
+            'numpy': min(timeit.repeat(lambda track=track: analyze_track(track), number=1, repeat=repeat)) * 1000,
+            'python': min(timeit.repeat(lambda track=track: analyze_track_python(track), number=1, repeat=repeat)) * 1000,
+        }
+    return results
+
+
+def route_update_benchmark(
+    sizes: tuple[int, ...] = (1_000, 100_000, 1_000_000),
+    batch_size: int = 100,
+    repeat: int = 3
+) -> dict[int, dict[str, float]]:
+    """
+    Cost of one route update in milliseconds (best of ``repeat``) for routes of ``sizes`` points.
+
+    ``full rebuild`` is what the former trigger did on every update: the line is built from all
+    points and simplified with Douglas-Peucker (GEOS, as ``ST_Simplify``); reading the points from
+    the hypertable is not included. ``incremental`` appends a batch of ``batch_size`` new points:
+    the streaming simplifier runs over the new points only and both lines are extended,
+    which copies them once like ``ST_MakeLine(path, new)``.
+    """
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in sizes:
+        # Random walk with steps of about 5 m
+        coords = np.cumsum(rng.normal(0, 0.00005, (size + batch_size, 2)), axis=0) + np.array([37.6, 55.7])
+        path, new_points = coords[:size], coords[size:]
+        simplified = shapely.simplify(shapely.linestrings(path), 0.0001)
+        simplified_coords = shapely.get_coordinates(simplified)
+        new_points_list = [tuple(point) for point in new_points.tolist()]
+
+        def full_rebuild(coords=coords):
+            shapely.simplify(shapely.linestrings(coords), 0.0001)
+
+        def incremental(path=path, new_points=new_points, points=new_points_list, simplified_coords=simplified_coords):
+            simplifier = StreamingSimplifier(0.0001, 64)
+            simplifier.add(tuple(path[-1]))
+            vertices = [vertex for point in points if (vertex := simplifier.add(point)) is not None]
+            np.concatenate((path, new_points))
+            if vertices:
+                np.concatenate((simplified_coords, np.array(vertices)))
+
+        results[size] = {
+            'full rebuild': min(timeit.repeat(full_rebuild, number=1, repeat=repeat)) * 1000,
+            'incremental': min(timeit.repeat(incremental, number=1, repeat=repeat)) * 1000,
+        }
+    return results
+
+
+def serialization_benchmark(size: int = 5000, repeat: int = 5) -> dict[str, dict[str, float]]:
+    """
+    Serialization time per schema, in milliseconds (best of ``repeat``).
+
+    Compares FastAPI's generic path (``jsonable_encoder`` and ``json.dumps``, used with a custom
+    response class or without a response model), orjson over ``model_dump`` and pydantic-core
+    ``TypeAdapter.dump_json``, which FastAPI uses for endpoints with a response model.
+    """
+    now = datetime.now(UTC)
+    samples = {
+        'list[LocationRead]': (list[LocationRead], [
+            LocationRead(
+                id=i, user_id=1, timestamp=(now + timedelta(seconds=i)).isoformat(), latitude=55.75, longitude=37.62,
+                accuracy=10.0, elevation=150.0, is_waypoint=False, session_id=str(uuid4()), raw_data={'source': 'live'}
+            )
+            for i in range(size)
+        ]),
+        'list[TransportSegmentRead]': (list[TransportSegmentRead], [
+            TransportSegmentRead(mode='walking', start_time=now, end_time=now, distance=120.5, points_count=40)
+            for _ in range(size)
+        ]),
+        'MovementRollupsResponse': (MovementRollupsResponse, MovementRollupsResponse(
+            user_id=1,
+            resolution='hourly',
+            rollups=[
+                MovementRollup(bucket=now, points_count=120, distance=850.0, bounds=[37.6, 55.7, 37.7, 55.8])
+                for _ in range(size)
+            ]
+        )),
+        'SessionAnalytics': (SessionAnalytics, SessionAnalytics(
+            session_id=uuid4(), points_count=size + 1, total_distance=1e4, duration=3600.0, moving_time=3000.0,
+            average_speed=3.3, max_speed=12.0,
+            stops=[TrackStop(start_time=now, end_time=now, duration=300.0, longitude=37.6, latitude=55.7)] * 10,
+            segments=TrackSegments(
+                distances=[1.5] * size, speeds=[1.2] * size, bearings=[90.0] * size, accelerations=[0.1] * size
+            )
+        )),
+    }
+
+    results = {}
+    for name, (schema, value) in samples.items():
+        adapter = TypeAdapter(schema)
+        encoders = {
+            'jsonable_encoder+json': lambda value=value: json.dumps(jsonable_encoder(value)).encode(),
+            'orjson(model_dump)': lambda value=value, adapter=adapter: orjson.dumps(adapter.dump_python(value)),
+            'pydantic dump_json': lambda value=value, adapter=adapter: adapter.dump_json(value),
+        }
+        results[name] = {
+            encoder_name: min(timeit.repeat(encoder, number=1, repeat=repeat)) * 1000
+            for encoder_name, encoder in encoders.items()
+        }
+    return results
+
+
+# Suite name: benchmark taking ``repeat`` and the label of its result rows
+SUITES: dict[str, tuple[Callable[..., dict], str]] = {
+    'analytics': (analytics_benchmark, "{} points"),
+    'routes': (route_update_benchmark, "{} points"),
+    'serialization': (serialization_benchmark, "{}"),
+}
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suite', choices=(*SUITES, 'all'), default='all')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    for name, (benchmark, label) in SUITES.items():
+        if args.suite not in (name, 'all'):
+            continue
+        print(f"# {name}")
+        for key, timings in benchmark(repeat=args.repeat).items():
+            print(f"{label.format(key)}: " + ', '.join(f"{method} {ms:.2f} ms" for method, ms in timings.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -10,14 +10,40 @@ from sqlalchemy.dialects.postgresql import ENUM, JSONB
 from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.types import (
     UUID,
     BigInteger,
     Boolean,
     DateTime,
     Float,
+    Integer,
     String,
 )
+from tracking.transport_mode import TRANSPORT_MODES
+
+
+# Shared by sessions (dominant mode) and transport segments
+transport_mode_enum = ENUM(*TRANSPORT_MODES, name='transport_mode_enum')
+
+
+def _drop_not_null(schema_name: str, table_name: str, *columns: str) -> str:
+    """DO block making columns of an existing table nullable, ALTER runs only if a column is still NOT NULL"""
+    steps = ''.join(
+        f"""
+            IF EXISTS (
+                SELECT 1
+                FROM information_schema.columns
+                WHERE table_schema = {schema_name!r}
+                AND table_name = {table_name!r}
+                AND column_name = {column!r}
+                AND is_nullable = 'NO'
+            ) THEN
+                ALTER TABLE {schema_name}.{table_name} ALTER COLUMN {column} DROP NOT NULL;
+            END IF;"""
+        for column in columns
+    )
+    return f"DO $$\nBEGIN{steps}\nEND $$;"
 
 
 class Base(DeclarativeBase):
@@ -53,7 +79,11 @@ class User(Base):
 
     # ================================== Relationships ==================================
     sessions: Mapped[list["Session"]] = relationship(back_populates="user")
-    track_points: Mapped[list["TrackPoint"]] = relationship(back_populates="user")
+    # No FK from the hypertable: points may arrive before the user is registered
+    track_points: Mapped[list["TrackPoint"]] = relationship(
+        primaryjoin="User.id == foreign(TrackPoint.user_id)",
+        viewonly=True
+    )
 
     def update(self, user_update: dict):
         """Update a user"""
@@ -106,13 +136,22 @@ class TrackPoint(Base):
     accuracy: Mapped[float] = mapped_column(Float)  # В метрах
     elevation: Mapped[float] = mapped_column(Float, nullable=True)
     raw_data: Mapped[dict] = mapped_column(JSONB)  # Полные сырые данные с устройства
-    session_id: Mapped[UUID] = mapped_column(
+    session_id: Mapped[UUID | None] = mapped_column(
         UUID,
         ForeignKey('geo.sessions.id'),
-        index=True
+        index=True,
+        nullable=True  # Points from the bot may arrive outside of any session
     )
     is_waypoint: Mapped[bool] = mapped_column(Boolean, default=False)  # Ручные точки маршрута
-    note: Mapped[str] = mapped_column(String(200))  # Пользовательские заметки
+    note: Mapped[str | None] = mapped_column(String(200), nullable=True)  # Пользовательские заметки
+    # Distance from the previous point of the same trail in meters, filled at ingest for rollups
+    segment_distance: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+    # Continuous aggregates: view name -> bucket width. The daily one is built on top of the hourly one
+    ROLLUP_VIEWS: ClassVar[dict[str, str]] = {
+        'hourly': 'track_points_hourly',
+        'daily': 'track_points_daily',
+    }
 
     @classmethod
     async def is_hypertable(cls, engine: AsyncEngine) -> bool:
@@ -150,6 +189,51 @@ class TrackPoint(Base):
                     )
                 )
 
+    @classmethod
+    async def create_spatial_indexes(cls, engine: AsyncEngine):
+        """
+        Creates GiST indexes on the track point locations.
+
+        Indexes of a hypertable are built per chunk, so a spatial query bounded in time only scans
+        the indexes of the chunks left after chunk exclusion. The (user_id, location) index serves
+        searches within the points of one user, the plain one searches across users.
+        """
+        schema_name = cls.__table_args__['schema']
+        table_name = cls.__tablename__
+        async with engine.begin() as conn:
+            # GiST operator classes for scalar columns, needed for user_id in a GiST index
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+            # Declared by GeoAlchemy2 for new tables, created here for tables that existed without it
+            await conn.execute(
+                text(
+                    f"""
+                    CREATE INDEX IF NOT EXISTS idx_{table_name}_location
+                    ON {schema_name}.{table_name} USING GIST (location);
+                    """
+                )
+            )
+            await conn.execute(
+                text(
+                    f"""
+                    CREATE INDEX IF NOT EXISTS idx_{table_name}_user_location
+                    ON {schema_name}.{table_name} USING GIST (user_id, location);
+                    """
+                )
+            )
+
+    @classmethod
+    async def migrate_columns(cls, engine: AsyncEngine):
+        """Brings tables created by earlier versions to the model, ``create_all`` skips existing tables"""
+        schema_name = cls.__table_args__['schema']
+        table_name = cls.__tablename__
+        async with engine.begin() as conn:
+            # Points may arrive outside of any session and without a note
+            await conn.execute(text(_drop_not_null(schema_name, table_name, 'session_id', 'note')))
+            # Points may arrive before the user is registered, see ``User.track_points``
+            await conn.execute(
+                text(f"ALTER TABLE {schema_name}.{table_name} DROP CONSTRAINT IF EXISTS {table_name}_user_id_fkey")
+            )
+
     @classmethod
     async def enable_compression(
         cls,
@@ -191,6 +275,90 @@ class TrackPoint(Base):
                 )
             )
 
+    @classmethod
+    async def create_continuous_aggregates(cls, engine: AsyncEngine):
+        """Creates hourly and daily per-user movement rollups (point count, distance, bbox)"""
+        schema_name = cls.__table_args__['schema']
+        table_name = cls.__tablename__
+        hourly_view = cls.ROLLUP_VIEWS['hourly']
+        daily_view = cls.ROLLUP_VIEWS['daily']
+        async with engine.begin() as conn:
+            # The column is new for tables created before the rollups existed
+            await conn.execute(
+                text(
+                    f"""
+                    ALTER TABLE {schema_name}.{table_name}
+                    ADD COLUMN IF NOT EXISTS segment_distance DOUBLE PRECISION;
+                    """
+                )
+            )
+            # WITH NO DATA keeps the statement transactional, the refresh policy fills the views
+            await conn.execute(
+                text(
+                    f"""
+                    CREATE MATERIALIZED VIEW IF NOT EXISTS {schema_name}.{hourly_view}
+                    WITH (timescaledb.continuous) AS
+                    SELECT
+                        user_id,
+                        time_bucket(INTERVAL '1 hour', timestamp) AS bucket,
+                        count(*) AS points_count,
+                        coalesce(sum(segment_distance), 0) AS distance,
+                        min(ST_X(location)) AS min_lon,
+                        min(ST_Y(location)) AS min_lat,
+                        max(ST_X(location)) AS max_lon,
+                        max(ST_Y(location)) AS max_lat
+                    FROM {schema_name}.{table_name}
+                    GROUP BY user_id, bucket
+                    WITH NO DATA;
+                    """
+                )
+            )
+            await conn.execute(
+                text(
+                    f"""
+                    CREATE MATERIALIZED VIEW IF NOT EXISTS {schema_name}.{daily_view}
+                    WITH (timescaledb.continuous) AS
+                    SELECT
+                        user_id,
+                        time_bucket(INTERVAL '1 day', bucket) AS bucket,
+                        sum(points_count) AS points_count,
+                        sum(distance) AS distance,
+                        min(min_lon) AS min_lon,
+                        min(min_lat) AS min_lat,
+                        max(max_lon) AS max_lon,
+                        max(max_lat) AS max_lat
+                    FROM {schema_name}.{hourly_view}
+                    GROUP BY user_id, time_bucket(INTERVAL '1 day', bucket)
+                    WITH NO DATA;
+                    """
+                )
+            )
+
+    @classmethod
+    async def add_continuous_aggregate_policies(cls, engine: AsyncEngine):
+        """Adds refresh policies for the hourly and daily rollups"""
+        schema_name = cls.__table_args__['schema']
+        policies = {
+            # view: (start_offset, end_offset, schedule_interval)
+            cls.ROLLUP_VIEWS['hourly']: ('3 days', '1 hour', '30 minutes'),
+            cls.ROLLUP_VIEWS['daily']: ('7 days', '1 day', '1 hour'),
+        }
+        async with engine.begin() as conn:
+            for view_name, (start_offset, end_offset, schedule_interval) in policies.items():
+                await conn.execute(
+                    text(
+                        f"""
+                        SELECT add_continuous_aggregate_policy(
+                            '{schema_name}.{view_name}',
+                            start_offset => INTERVAL '{start_offset}',
+                            end_offset => INTERVAL '{end_offset}',
+                            schedule_interval => INTERVAL '{schedule_interval}',
+                            if_not_exists => true
+                        );
+                        """
+                    )
+                )
+
     @classmethod
     async def add_retention_policy(cls, engine: AsyncEngine, older_than: str = "1 year"):
         """Adds a data retention policy for TrackPoint"""
@@ -223,7 +391,13 @@ class GeoZone(Base):
     zone_type: Mapped[str] = mapped_column(String(30))  # home/work/favorite/custom
     geometry: Mapped[Geometry] = mapped_column(Geometry('POLYGON', srid=4326))
     notify_on_enter: Mapped[bool] = mapped_column(Boolean, default=True)
-    radius: Mapped[float] = mapped_column(Float)  # Для окружностей
+    radius: Mapped[float | None] = mapped_column(Float, nullable=True)  # Для окружностей
+
+    @classmethod
+    async def migrate_columns(cls, engine: AsyncEngine):
+        """Polygons have no radius, tables created by earlier versions required one"""
+        async with engine.begin() as conn:
+            await conn.execute(text(_drop_not_null(cls.__table_args__['schema'], cls.__tablename__, 'radius')))
 
     @hybrid_property
     def area_sq_meters(self):
@@ -273,12 +447,14 @@ class Session(Base):
         nullable=False
     )
     end_time: Mapped[datetime] = mapped_column(DateTime(timezone=True))
-    transport_type: Mapped[str] = mapped_column(
+    status: Mapped[str] = mapped_column(
         ENUM('active', 'completed', 'paused', name='session_status_enum'),
         default='active'
     )
+    # Dominant transport mode by distance, see tracking.transport_mode
+    transport_type: Mapped[str | None] = mapped_column(transport_mode_enum, nullable=True)
 
-    # Statistics (calculated by triggers)
+    # Statistics (maintained incrementally during ingest, see tracking.session_stats)
     total_distance: Mapped[float] = mapped_column(Float)  # в метрах
     points_count: Mapped[int] = mapped_column()
     bounds: Mapped[Geometry] = mapped_column(Geometry('POLYGON', srid=4326))  # Bounding box маршрута
@@ -286,13 +462,6 @@ class Session(Base):
     # ================================== Relationships ==================================
     user: Mapped["User"] = relationship(back_populates="sessions")
 
-    def add_point(self, point: TrackPoint):
-        """Updates session bounds when adding a point"""
-        if not self.bounds:
-            self.bounds = f'POLYGON(({point.lon} {point.lat}, ...))'
-        else:
-            self.bounds = func.ST_Expand(self.bounds, point)
-
     @classmethod
     async def is_hypertable(cls, engine: AsyncEngine) -> bool:
         """Checks if the table is a TimescaleDB hypertable"""
@@ -329,6 +498,65 @@ class Session(Base):
                     )
                 )
 
+    @classmethod
+    async def migrate_transport_type(cls, engine: AsyncEngine):
+        """Moves session statuses out of ``transport_type`` in tables created when it was a status ENUM"""
+        schema_name = cls.__table_args__[-1]['schema']
+        table_name = cls.__tablename__
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(
+                    f"""
+                    DO $$
+                    BEGIN
+                        IF EXISTS (
+                            SELECT 1
+                            FROM information_schema.columns
+                            WHERE table_schema = {schema_name!r}
+                            AND table_name = {table_name!r}
+                            AND column_name = 'transport_type'
+                            AND udt_name = 'session_status_enum'
+                        ) THEN
+                            ALTER TABLE {schema_name}.{table_name}
+                            ADD COLUMN IF NOT EXISTS status session_status_enum DEFAULT 'active';
+                            UPDATE {schema_name}.{table_name} SET status = transport_type WHERE transport_type IS NOT NULL;
+                            ALTER TABLE {schema_name}.{table_name} ALTER COLUMN transport_type DROP DEFAULT;
+                            ALTER TABLE {schema_name}.{table_name}
+                            ALTER COLUMN transport_type TYPE transport_mode_enum USING NULL;
+                        END IF;
+                    END $$;
+                    """
+                )
+            )
+
+
+class TransportSegment(Base):
+    """Transport segment model: part of a trail travelled with one transport mode"""
+
+    __tablename__: str = 'transport_segments'
+    __table_args__: ClassVar[tuple[..., dict[str, str]]] = (
+        Index('idx_transport_segment_user_time', 'user_id', 'start_time'),
+        {
+            'schema': 'geo',
+            'comment': 'Transport modes detected at ingest, see tracking.transport_mode'
+        }
+    )
+
+    # ================================== Table fields ===================================
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)  # Assigned by the classifier
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    session_id: Mapped[UUID | None] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey('geo.sessions.id', ondelete='CASCADE'),
+        index=True,
+        nullable=True  # Trails of points outside of any session
+    )
+    mode: Mapped[str] = mapped_column(transport_mode_enum)
+    start_time: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    end_time: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    distance: Mapped[float] = mapped_column(Float)  # В метрах
+    points_count: Mapped[int] = mapped_column(Integer)
+
 
 class Route(Base):
     """Route model"""
@@ -346,9 +574,17 @@ class Route(Base):
         }
     )
 
-    id: Mapped[int] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    id: Mapped[int] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text('gen_random_uuid()')
+    )
     user_id: Mapped[int] = mapped_column(BigInteger, index=True)
-    session_id: Mapped[int] = mapped_column(UUID, ForeignKey('geo.sessions.id', ondelete='CASCADE'))
+    session_id: Mapped[int] = mapped_column(
+        UUID,
+        ForeignKey('geo.sessions.id', ondelete='CASCADE'),
+        index=True  # New points are appended to the routes of their session
+    )
     name: Mapped[str] = mapped_column(String(100))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     tags: Mapped[dict] = mapped_column(JSONB)  # {'scenic': True, 'public': False}
@@ -410,27 +646,26 @@ class Route(Base):
                 )
             )
 
-    # Триггер для автоматического построения маршрута
-    @staticmethod
-    def create_route_trigger():
-        """Create route trigger for updating path and simplified_path"""
-        return text(
-        """
-        CREATE OR REPLACE FUNCTION update_route_path()
-        RETURNS TRIGGER AS $$
-        BEGIN
-            NEW.path = (
-                SELECT ST_MakeLine(location ORDER BY timestamp)
-                FROM geo.track_points
-                WHERE session_id = NEW.session_id
-            );
-            NEW.simplified_path = ST_Simplify(NEW.path, 0.0001);
-            RETURN NEW;
-        END;
-        $$ LANGUAGE plpgsql;
-
-        CREATE TRIGGER route_path_update
-        BEFORE INSERT OR UPDATE ON geo.routes
-        FOR EACH ROW EXECUTE FUNCTION update_route_path();
-        """
-    )
+    @classmethod
+    async def migrate_columns(cls, engine: AsyncEngine):
+        """Brings tables created by earlier versions to the model: generated ids and the indexes of the model"""
+        schema_name = cls.__table_args__[-1]['schema']
+        table_name = cls.__tablename__
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(f"ALTER TABLE {schema_name}.{table_name} ALTER COLUMN id SET DEFAULT gen_random_uuid();")
+            )
+            # E.g. the session_id index, new points are appended to the routes of their session
+            for index in sorted(cls.__table__.indexes, key=lambda index: index.name):
+                await conn.execute(CreateIndex(index, if_not_exists=True))
+
+    # Маршрут строится инкрементально (tracking.route_builder), полная перестройка -
+    # только явная операция восстановления (TimescaleDBRepository.rebuild_route_path)
+    @classmethod
+    async def drop_route_trigger(cls, engine: AsyncEngine):
+        """Drops the legacy trigger that rebuilt the whole path on every INSERT or UPDATE"""
+        schema_name = cls.__table_args__[-1]['schema']
+        table_name = cls.__tablename__
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP TRIGGER IF EXISTS route_path_update ON {schema_name}.{table_name};"))
+            await conn.execute(text("DROP FUNCTION IF EXISTS update_route_path();"))
@@ -0,0 +1,162 @@
+import asyncio
+import functools
+import logging
+from collections.abc import Callable
+
+from sqlalchemy import Select, event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+
+logger = logging.getLogger(f"uvicorn.{__file__}")
+
+# Whether the server is a standby and its replication lag in seconds; 0 when the replica has replayed
+# everything it received (the last replay timestamp alone grows while the primary is idle),
+# NULL when nothing has been replayed yet
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT pg_is_in_recovery(), CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class ReplicaMonitor:
+    """
+    Availability and replication lag of the read replica.
+
+    The lag is checked every ``interval`` seconds; reads are routed to the replica only while it
+    answers, is still a standby and lags behind the primary by at most ``max_lag`` seconds; an unknown
+    lag counts as unavailable. A connection error on any replica query marks it unavailable at once,
+    until the next successful check.
+    """
+
+    def __init__(self, engine: AsyncEngine, max_lag: float):
+        """Initialize the monitor, the replica is considered unavailable until the first check"""
+        self.engine = engine
+        self.max_lag = max_lag
+        self.available = False
+        self.lag: float | None = None
+        event.listen(engine.sync_engine, 'handle_error', self._on_error)
+
+    async def check(self):
+        """Measures the replication lag and updates availability"""
+        try:
+            async with self.engine.connect() as conn:
+                in_recovery, lag = (await conn.execute(REPLICA_LAG_QUERY)).one()
+        except (OSError, SQLAlchemyError) as exc:
+            self._unavailable(f"Read replica is unavailable, reading from the primary: {exc}")
+            return
+        if not in_recovery:
+            self._unavailable("Read replica is not a standby (promoted?), reading from the primary")
+            return
+        if lag is None:
+            self._unavailable("Read replica has not replayed any transaction yet, reading from the primary")
+            return
+        self.lag = float(lag)
+        available = self.lag <= self.max_lag
+        if available != self.available:
+            if available:
+                logger.info(f"Read replica is available, lag {self.lag:.1f}s")
+            else:
+                logger.warning(f"Read replica lags {self.lag:.1f}s behind, reading from the primary")
+        self.available = available
+
+    def _unavailable(self, reason: str):
+        if self.available:
+            logger.warning(reason)
+        self.available = False
+        self.lag = None
+
+    async def run(self, interval: float):
+        """Background task checking the replica every ``interval`` seconds"""
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+    def _on_error(self, context):
+        if context.is_disconnect or context.connection is None:
+            self.available = False
+
+
+class RoutingSession(Session):
+    """
+    Session sending plain SELECTs to the read replica and everything else to the primary.
+
+    Once a session has written (or flushed, or was pinned explicitly with ``pin_to_primary``) all its
+    further reads go to the primary too, so a request reads its own writes. Locking reads
+    (``SELECT ... FOR UPDATE``) always go to the primary. A read that loses its replica connection
+    is repeated once on the primary. Engines are set by ``routing_session``.
+    """
+
+    primary: AsyncEngine
+    replica: ReplicaMonitor | None = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        """Engine for a statement"""
+        if self._reads_replica(clause):
+            return self.replica.engine.sync_engine
+        if self._flushing or (clause is not None and not isinstance(clause, Select)):
+            self.info['pinned'] = True
+        return self.primary.sync_engine
+
+    def execute(self, statement, *args, **kwargs):
+        """Executes a statement, see ``_with_fallback``"""
+        return self._with_fallback(super().execute, statement, *args, **kwargs)
+
+    def scalar(self, statement, *args, **kwargs):
+        """Executes a statement returning a scalar, see ``_with_fallback``"""
+        return self._with_fallback(super().scalar, statement, *args, **kwargs)
+
+    def _with_fallback(self, method: Callable, statement, *args, **kwargs):
+        """
+        Runs ``method``, repeats a replica read on the primary if its connection was lost.
+
+        The monitor marks the replica unavailable on a connection error (see ``ReplicaMonitor._on_error``),
+        other errors are raised as they are. The session has not written anything while it reads from
+        the replica, so rolling back its transaction with the broken connection loses no changes.
+        """
+        if not self._reads_replica(statement):
+            return method(statement, *args, **kwargs)
+        try:
+            return method(statement, *args, **kwargs)
+        except (OSError, SQLAlchemyError) as exc:
+            if self.replica.available:
+                raise
+            logger.warning(f"Read replica connection lost, repeating the read on the primary: {exc}")
+        self.rollback()
+        self.info['pinned'] = True
+        return method(statement, *args, **kwargs)
+
+    def _reads_replica(self, clause) -> bool:
+        """Whether a statement is sent to the replica"""
+        return (
+            self.replica is not None
+            and self.replica.available
+            and not self._flushing
+            and not self.info.get('pinned')
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+        )
+
+
+def routing_session(primary: AsyncEngine, replica: ReplicaMonitor | None) -> type[RoutingSession]:
+    """Session class routing between the given engines, for ``async_sessionmaker(sync_session_class=...)``"""
+    return type('RoutingSession', (RoutingSession,), {'primary': primary, 'replica': replica})
+
+
+def pin_to_primary(session: AsyncSession):
+    """Sends all further reads of the session to the primary"""
+    session.info['pinned'] = True
+
+
+def on_primary(method: Callable) -> Callable:
+    """Repository method decorator for freshness-sensitive reads and read-modify-write operations"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        pin_to_primary(self.db)
+        return await method(self, *args, **kwargs)
+    return wrapper
@@ -1,9 +1,47 @@
 import logging
+from collections.abc import AsyncIterator, Sequence
+from datetime import UTC, datetime
+from uuid import UUID
 
-from db.orm_models import GeoZone, Route, Session, TrackPoint, User
-from schemas import TelegramUser, TelegramUserUpdate
-from sqlalchemy import delete, select
+import numpy as np
+from db.orm_models import GeoZone, Route, Session, TrackPoint, TransportSegment, User
+from db.replica import on_primary
+from db.user_cache import UserCache
+from geoalchemy2 import Geography, Geometry
+from metrics import timed_methods
+from schemas import GeoZoneCreate, LocationCreate, RouteCreate, TelegramUser, TelegramUserUpdate
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Float,
+    Integer,
+    Row,
+    String,
+    TableClause,
+    bindparam,
+    case,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    null,
+    or_,
+    select,
+    table,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by, array
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from tracking.analytics import TrackArrays
+from tracking.geo import BoundingBox, bounding_box
+from tracking.route_builder import Coordinate, RouteAppend
+from tracking.session_stats import SessionStats
+from tracking.transport_mode import TransportSegmentState
 
 
 # from sqlalchemy import select, delete, and_, text, func
@@ -12,6 +50,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(f"uvicorn.{__file__}")
 
+ROUTE_SIMPLIFY_TOLERANCE = 0.0001  # In degrees, used by the full route rebuild
+
 
 class UserNotFoundError(Exception):
     """Raised when a user is not found in the database."""
@@ -19,12 +59,14 @@ class UserNotFoundError(Exception):
     pass
 
 
+@timed_methods
 class TimescaleDBRepository:
     """Repository for TimescaleDB"""
 
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, user_cache: UserCache | None = None):
         """Initialize the repository"""
         self.db = db
+        self.user_cache = user_cache
 
     async def create_user(self, user: TelegramUser) -> User:
         """Create a user"""
@@ -32,15 +74,55 @@ class TimescaleDBRepository:
         self.db.add(new_user)
         await self.db.commit()
         await self.db.refresh(new_user)
+        if self.user_cache is not None:
+            self.user_cache.invalidate(new_user.id)
         return new_user
 
+    async def upsert_user(self, user: TelegramUser) -> tuple[User, bool]:
+        """
+        Create a user or refresh the profile of an existing one in a single round trip.
+
+        ``INSERT ... ON CONFLICT (id) DO UPDATE ... RETURNING`` is atomic, so concurrent
+        registrations of the same user do not race. ``xmax = 0`` holds only for freshly
+        inserted rows, which gives the created flag without a second query.
+
+        Returns
+        -------
+            tuple[User, bool]: The stored user and whether it was created.
+
+        """
+        values = user.model_dump()
+        stmt = pg_insert(User).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.id],
+            set_={
+                **{key: stmt.excluded[key] for key in values if key != 'id'},
+                'updated_at': func.now(),
+            }
+        ).returning(User, literal_column('xmax = 0').label('created'))
+
+        result = await self.db.execute(stmt, execution_options={'populate_existing': True})
+        stored_user, created = result.one()
+        await self.db.commit()
+        if self.user_cache is not None:
+            self.user_cache.set(stored_user)
+        return stored_user, created
+
     async def get_user(self, user_id: int) -> User | None:
-        """Get a user by their ID"""
+        """Get a user by their ID, served from the user cache when possible"""
+        if self.user_cache is not None:
+            cached_user = self.user_cache.get(user_id)
+            if cached_user is not None:
+                return cached_user
+
         stmt = select(User).where(User.id == user_id)
         result = await self.db.execute(stmt)
         user = result.scalar_one_or_none()
+        if user is not None and self.user_cache is not None:
+            self.user_cache.set(user)
         return user
 
+    @on_primary
     async def update_user(self, user_id: int, user_update: TelegramUserUpdate) -> User:
         """Update a user"""
         stmt = select(User).where(User.id == user_id)
@@ -50,30 +132,645 @@ class TimescaleDBRepository:
             raise UserNotFoundError()
         user.update(user_update.model_dump())
         await self.db.commit()
+        if self.user_cache is not None:
+            self.user_cache.invalidate(user_id)
         return user
 
     async def delete_user(self, user_id: int) -> None:
         """Delete a user"""
-        stmt = delete(User).where(User.id == user_id)
+        stmt = delete(User).where(User.id == user_id).returning(User.id)
         result = await self.db.execute(stmt)
-        user = result.scalar_one_or_none()
-        if user is None:
+        if result.scalar_one_or_none() is None:
             raise UserNotFoundError()
-        await self.db.delete(user)
         await self.db.commit()
+        if self.user_cache is not None:
+            self.user_cache.invalidate(user_id)
 
     async def get_session(self, session_id: int) -> Session:
         """Get a session by its ID"""
         return await self.db.execute(select(Session).where(Session.id == session_id))
 
+    async def create_track_points(
+        self,
+        points: list[LocationCreate],
+        segment_distances: list[float] | None = None
+    ) -> int:
+        """
+        Bulk insert of track points in a single transaction.
+
+        The statement has no RETURNING, so SQLAlchemy passes all rows to the driver's executemany:
+        asyncpg prepares the INSERT once and sends the rows in a single pipelined batch instead of
+        waiting for a round trip per point.
+
+        Returns
+        -------
+            int: Number of inserted points.
+
+        """
+        if not points:
+            return 0
+        received_at = datetime.now(UTC)
+        rows = [self._track_point_row(point, received_at) for point in points]
+        if segment_distances is not None:
+            for row, distance in zip(rows, segment_distances, strict=True):
+                row['segment_distance'] = distance
+        await self.db.execute(insert(TrackPoint), rows)
+        await self.db.commit()
+        return len(rows)
+
+    @on_primary
+    async def find_session_ids(self, session_ids: set[UUID]) -> set[UUID]:
+        """Those of ``session_ids`` that exist, checked with one query"""
+        result = await self.db.execute(select(Session.id).where(Session.id.in_(session_ids)))
+        return set(result.scalars())
+
+    @staticmethod
+    def _track_point_row(point: LocationCreate, received_at: datetime) -> dict:
+        """Converts a submitted location point into a ``geo.track_points`` row"""
+        return {
+            'user_id': point.user_id,
+            'timestamp': point.date_time or received_at,
+            'location': f'SRID=4326;POINT({point.longitude} {point.latitude})',
+            'accuracy': point.accuracy,
+            'elevation': point.elevation,
+            'note': point.note,
+            'is_waypoint': point.is_waypoint,
+            'raw_data': point.raw_data or {},
+            'session_id': UUID(point.session_id) if point.session_id else None,
+        }
+
+    @on_primary
+    async def get_session_summary(self, session_id: UUID) -> Row | None:
+        """Get the precomputed statistics of a session, a single-row read"""
+        stmt = select(
+            Session.id,
+            Session.user_id,
+            Session.start_time,
+            Session.end_time,
+            Session.total_distance,
+            Session.points_count,
+            Session.transport_type,
+            func.ST_XMin(Session.bounds).label('min_lon'),
+            func.ST_YMin(Session.bounds).label('min_lat'),
+            func.ST_XMax(Session.bounds).label('max_lon'),
+            func.ST_YMax(Session.bounds).label('max_lat'),
+        ).where(Session.id == session_id)
+        result = await self.db.execute(stmt)
+        return result.one_or_none()
+
+    async def apply_session_stats(self, pending: dict[str, SessionStats]) -> None:
+        """
+        Adds accumulated statistics deltas to sessions with one executemany UPDATE.
+
+        Counters are incremented and the bounding box is expanded in place, the session's
+        track points are never read.
+        """
+        sessions = Session.__table__
+        stmt = (
+            update(sessions)
+            .where(sessions.c.id == bindparam('session_id'))
+            .values(
+                total_distance=func.coalesce(sessions.c.total_distance, 0) + bindparam('d_distance', type_=Float),
+                points_count=func.coalesce(sessions.c.points_count, 0) + bindparam('d_points_count', type_=Integer),
+                # LEAST/GREATEST ignore NULL, so the first flush builds the box from the deltas alone
+                bounds=func.ST_MakeEnvelope(
+                    func.least(func.ST_XMin(sessions.c.bounds), bindparam('min_lon', type_=Float)),
+                    func.least(func.ST_YMin(sessions.c.bounds), bindparam('min_lat', type_=Float)),
+                    func.greatest(func.ST_XMax(sessions.c.bounds), bindparam('max_lon', type_=Float)),
+                    func.greatest(func.ST_YMax(sessions.c.bounds), bindparam('max_lat', type_=Float)),
+                    4326
+                ),
+            )
+        )
+        params = [
+            {
+                'session_id': UUID(session_id),
+                'd_distance': stats.distance,
+                'd_points_count': stats.points_count,
+                'min_lon': stats.min_lon,
+                'min_lat': stats.min_lat,
+                'max_lon': stats.max_lon,
+                'max_lat': stats.max_lat,
+            }
+            for session_id, stats in pending.items()
+        ]
+        await self.db.execute(stmt, params)
+        await self.db.commit()
+
+    async def save_transport_segments(self, segments: list[TransportSegmentState]) -> None:
+        """Upserts transport segments and recomputes the dominant mode of their sessions"""
+        stmt = pg_insert(TransportSegment)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TransportSegment.id],
+            set_={
+                'end_time': stmt.excluded.end_time,
+                'distance': stmt.excluded.distance,
+                'points_count': stmt.excluded.points_count,
+                'updated_at': func.now(),
+            }
+        )
+        params = [
+            {
+                'id': segment.id,
+                'user_id': segment.user_id,
+                'session_id': UUID(segment.session_id) if segment.session_id is not None else None,
+                'mode': segment.mode,
+                'start_time': segment.start_time,
+                'end_time': segment.end_time,
+                'distance': segment.distance,
+                'points_count': segment.points_count,
+            }
+            for segment in segments
+        ]
+        await self.db.execute(stmt, params)
+
+        session_ids = {UUID(segment.session_id) for segment in segments if segment.session_id is not None}
+        if session_ids:
+            dominant_mode = (
+                select(TransportSegment.mode)
+                .where(TransportSegment.session_id == Session.id)
+                .group_by(TransportSegment.mode)
+                .order_by(func.sum(TransportSegment.distance).desc())
+                .limit(1)
+                .scalar_subquery()
+            )
+            await self.db.execute(
+                update(Session)
+                .where(Session.id.in_(session_ids))
+                .values(transport_type=dominant_mode)
+                .execution_options(synchronize_session=False)
+            )
+        await self.db.commit()
+
+    async def get_transport_segments(self, session_id: UUID) -> Sequence[TransportSegment]:
+        """Get the transport segments of a session ordered by time"""
+        stmt = (
+            select(TransportSegment)
+            .where(TransportSegment.session_id == session_id)
+            .order_by(TransportSegment.start_time)
+        )
+        result = await self.db.execute(stmt)
+        return result.scalars().all()
+
+    async def get_movement_rollups(
+        self,
+        user_id: int,
+        resolution: str,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None
+    ) -> Sequence[Row]:
+        """Get hourly or daily movement rollups of a user from the continuous aggregates"""
+        view = self._rollup_view(resolution)
+        stmt = select(
+            view.c.bucket,
+            view.c.points_count,
+            view.c.distance,
+            view.c.min_lon,
+            view.c.min_lat,
+            view.c.max_lon,
+            view.c.max_lat,
+        ).where(view.c.user_id == user_id)
+        if start_time is not None:
+            stmt = stmt.where(view.c.bucket >= start_time)
+        if end_time is not None:
+            stmt = stmt.where(view.c.bucket < end_time)
+        result = await self.db.execute(stmt.order_by(view.c.bucket))
+        return result.all()
+
+    async def get_movement_report(self, user_id: int, start_time: datetime, end_time: datetime) -> Row:
+        """Get totals of a user over a period (e.g. a week) from the daily rollup"""
+        view = self._rollup_view('daily')
+        stmt = select(
+            func.coalesce(func.sum(view.c.distance), 0).label('distance'),
+            func.coalesce(func.sum(view.c.points_count), 0).label('points_count'),
+            func.count().label('active_days'),
+            func.min(view.c.min_lon).label('min_lon'),
+            func.min(view.c.min_lat).label('min_lat'),
+            func.max(view.c.max_lon).label('max_lon'),
+            func.max(view.c.max_lat).label('max_lat'),
+        ).where(
+            view.c.user_id == user_id,
+            view.c.bucket >= start_time,
+            view.c.bucket < end_time
+        )
+        result = await self.db.execute(stmt)
+        return result.one()
+
+    @staticmethod
+    def _rollup_view(resolution: str) -> TableClause:
+        """Lightweight table clause for a continuous aggregate of ``geo.track_points``"""
+        return table(
+            TrackPoint.ROLLUP_VIEWS[resolution],
+            column('user_id', BigInteger),
+            column('bucket', DateTime(timezone=True)),
+            column('points_count', BigInteger),
+            column('distance', Float),
+            column('min_lon', Float),
+            column('min_lat', Float),
+            column('max_lon', Float),
+            column('max_lat', Float),
+            schema=TrackPoint.__table_args__['schema']
+        )
+
     async def get_track_point(self, track_point_id: int) -> TrackPoint:
         """Get a track point by its ID"""
         return await self.db.execute(select(TrackPoint).where(TrackPoint.id == track_point_id))
 
+    async def stream_track_points(
+        self,
+        session_id: UUID | None = None,
+        user_id: int | None = None,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        partition_size: int = 1000
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Streams track points ordered by time through a server-side cursor.
+
+        Rows are fetched in partitions of ``partition_size``, so memory usage does not depend
+        on the number of points and the first partition is available before the query finishes.
+
+        Yields
+        ------
+            Sequence[Row]: Partition of rows with plain columns (``longitude``/``latitude`` instead of geometry).
+
+        """
+        stmt = select(
+            TrackPoint.id,
+            TrackPoint.user_id,
+            TrackPoint.session_id,
+            TrackPoint.timestamp,
+            func.ST_X(TrackPoint.location).label('longitude'),
+            func.ST_Y(TrackPoint.location).label('latitude'),
+            TrackPoint.accuracy,
+            TrackPoint.elevation,
+            TrackPoint.is_waypoint,
+            TrackPoint.note,
+        )
+        if session_id is not None:
+            stmt = stmt.where(TrackPoint.session_id == session_id)
+        if user_id is not None:
+            stmt = stmt.where(TrackPoint.user_id == user_id)
+        if start_time is not None:
+            stmt = stmt.where(TrackPoint.timestamp >= start_time)
+        if end_time is not None:
+            stmt = stmt.where(TrackPoint.timestamp < end_time)
+        stmt = stmt.order_by(TrackPoint.timestamp).execution_options(yield_per=partition_size)
+
+        result = await self.db.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+    async def get_track_arrays(self, session_id: UUID, partition_size: int = 50000) -> TrackArrays:
+        """
+        Loads the points of a session into contiguous NumPy columns ordered by time.
+
+        Only float columns are selected, so every partition converts to a float64 block directly,
+        without building ORM objects or per-point Python structures.
+        """
+        return await self._load_track_arrays(TrackPoint.session_id == session_id, partition_size=partition_size)
+
+    async def get_user_track_arrays(
+        self,
+        user_id: int,
+        windows: Sequence[tuple[datetime, datetime]],
+        partition_size: int = 50000
+    ) -> TrackArrays:
+        """
+        Loads the points of a user within time windows into NumPy columns ordered by time.
+
+        All windows are read by one query, each of them is a range scan over the (user_id, timestamp)
+        index of the chunks it overlaps.
+        """
+        in_windows = or_(*(TrackPoint.timestamp.between(start, end) for start, end in windows))
+        return await self._load_track_arrays(TrackPoint.user_id == user_id, in_windows, partition_size=partition_size)
+
+    async def _load_track_arrays(self, *conditions, partition_size: int) -> TrackArrays:
+        """Float columns of the matching points, converted partition by partition"""
+        stmt = (
+            select(
+                cast(func.extract('epoch', TrackPoint.timestamp), Float),
+                func.ST_X(TrackPoint.location),
+                func.ST_Y(TrackPoint.location),
+                TrackPoint.accuracy,
+                func.coalesce(TrackPoint.elevation, float('nan')),
+            )
+            .where(*conditions)
+            .order_by(TrackPoint.timestamp)
+            .execution_options(yield_per=partition_size)
+        )
+        result = await self.db.stream(stmt)
+        partitions = [np.array(partition, dtype=np.float64) async for partition in result.partitions()]
+        return TrackArrays.from_partitions(partitions)
+
+    async def find_track_points(
+        self,
+        user_id: int,
+        start_time: datetime,
+        end_time: datetime,
+        bbox: BoundingBox | None = None,
+        center: Coordinate | None = None,
+        radius: float | None = None,
+        after: tuple[datetime, int] | None = None,
+        limit: int = 1000
+    ) -> Sequence[Row]:
+        """
+        Points of a user within an area and a time range, ordered by (timestamp, id).
+
+        The time range is required: TimescaleDB excludes the chunks outside of it, and only the
+        (user_id, location) index of the remaining chunks is searched. Pages are keyset-paginated:
+        ``after`` is the (timestamp, id) of the last point of the previous page, so every page
+        costs the same regardless of how deep it is.
+        """
+        stmt = select(
+            TrackPoint.id,
+            TrackPoint.session_id,
+            TrackPoint.timestamp,
+            func.ST_X(TrackPoint.location).label('longitude'),
+            func.ST_Y(TrackPoint.location).label('latitude'),
+            TrackPoint.accuracy,
+            TrackPoint.elevation,
+            TrackPoint.is_waypoint,
+            TrackPoint.note,
+        ).where(
+            TrackPoint.user_id == user_id,
+            TrackPoint.timestamp >= start_time,
+            TrackPoint.timestamp < end_time,
+            *self._area_filter(bbox, center, radius)
+        )
+        if after is not None:
+            timestamp, point_id = after
+            stmt = stmt.where(
+                tuple_(TrackPoint.timestamp, TrackPoint.id) > tuple_(timestamp, literal(point_id, BigInteger))
+            )
+        result = await self.db.execute(stmt.order_by(TrackPoint.timestamp, TrackPoint.id).limit(limit))
+        return result.all()
+
+    async def find_session_passages(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        bbox: BoundingBox | None = None,
+        center: Coordinate | None = None,
+        radius: float | None = None,
+        user_id: int | None = None,
+        after: tuple[datetime, UUID] | None = None,
+        limit: int = 100
+    ) -> Sequence[Row]:
+        """
+        Sessions with points within an area and a time range, ordered by the time they entered the area.
+
+        Matching points are found through the location index of the chunks of the time range and
+        grouped by session; ``after`` is the (entered_at, session_id) of the last session of the
+        previous page. Session bounds are not used for the search, they are built from smoothed
+        positions and may miss stored points near their edges.
+        """
+        conditions = [
+            TrackPoint.session_id.is_not(None),
+            TrackPoint.timestamp >= start_time,
+            TrackPoint.timestamp < end_time,
+            *self._area_filter(bbox, center, radius)
+        ]
+        if user_id is not None:
+            conditions.append(TrackPoint.user_id == user_id)
+        passages = (
+            select(
+                TrackPoint.session_id,
+                func.min(TrackPoint.timestamp).label('entered_at'),
+                func.max(TrackPoint.timestamp).label('left_at'),
+                func.count().label('points_count'),
+            )
+            .where(*conditions)
+            .group_by(TrackPoint.session_id)
+            .subquery()
+        )
+        stmt = (
+            select(
+                passages.c.session_id,
+                Session.user_id,
+                Session.start_time,
+                Session.end_time,
+                Session.transport_type,
+                passages.c.entered_at,
+                passages.c.left_at,
+                passages.c.points_count,
+            )
+            .join(Session, Session.id == passages.c.session_id)
+            # A session starts before its points, this excludes the later chunks of the sessions hypertable
+            .where(Session.start_time < end_time)
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(passages.c.entered_at, passages.c.session_id) > tuple_(*after))
+        result = await self.db.execute(stmt.order_by(passages.c.entered_at, passages.c.session_id).limit(limit))
+        return result.all()
+
+    @staticmethod
+    def _area_filter(
+        bbox: BoundingBox | None = None,
+        center: Coordinate | None = None,
+        radius: float | None = None
+    ) -> list:
+        """
+        Conditions for track points within a bounding box or within ``radius`` meters of ``center``.
+
+        Both start with ``&&`` against a box, which the GiST indexes answer; a radius is then
+        checked exactly on the geography of the points inside its bounding box.
+        """
+        if bbox is None:
+            bbox = bounding_box(*center, radius)
+        conditions = [TrackPoint.location.intersects(func.ST_MakeEnvelope(*bbox, 4326))]
+        if center is not None:
+            point = func.ST_SetSRID(func.ST_MakePoint(*center), 4326)
+            geography = Geography(srid=4326)
+            conditions.append(func.ST_DWithin(cast(TrackPoint.location, geography), cast(point, geography), radius))
+        return conditions
+
     async def get_geo_zone(self, geo_zone_id: int) -> GeoZone:
         """Get a geo zone by its ID"""
         return await self.db.execute(select(GeoZone).where(GeoZone.id == geo_zone_id))
 
+    async def get_geo_zones(self, user_ids: set[int]) -> Sequence[Row]:
+        """Get geo zones of several users with their geometry as WKB"""
+        stmt = select(
+            GeoZone.id,
+            GeoZone.user_id,
+            GeoZone.name,
+            GeoZone.zone_type,
+            GeoZone.notify_on_enter,
+            GeoZone.radius,
+            func.ST_AsBinary(GeoZone.geometry).label('wkb'),
+        ).where(GeoZone.user_id.in_(user_ids))
+        result = await self.db.execute(stmt)
+        return result.all()
+
+    async def create_geo_zone(self, zone: GeoZoneCreate) -> Row:
+        """Create a geo zone from a polygon ring or from a center and radius in meters"""
+        if zone.coordinates is not None:
+            ring = list(zone.coordinates)
+            if ring[0] != ring[-1]:
+                ring.append(ring[0])  # Close the ring
+            geometry = f"SRID=4326;POLYGON(({', '.join(f'{lon} {lat}' for lon, lat in ring)}))"
+        else:
+            center = func.ST_SetSRID(func.ST_MakePoint(*zone.center), 4326)
+            # Buffer on geography to get a circle with a radius in meters
+            geometry = cast(func.ST_Buffer(cast(center, Geography), zone.radius), Geometry('POLYGON', srid=4326))
+
+        stmt = insert(GeoZone).values(
+            user_id=zone.user_id,
+            name=zone.name,
+            zone_type=zone.zone_type,
+            geometry=geometry,
+            notify_on_enter=zone.notify_on_enter,
+            radius=zone.radius,
+        ).returning(
+            GeoZone.id,
+            GeoZone.user_id,
+            GeoZone.name,
+            GeoZone.zone_type,
+            GeoZone.notify_on_enter,
+            GeoZone.radius,
+            func.ST_AsBinary(GeoZone.geometry).label('wkb'),
+        )
+        result = await self.db.execute(stmt)
+        row = result.one()
+        await self.db.commit()
+        return row
+
+    async def delete_geo_zone(self, zone_id: int) -> int | None:
+        """Delete a geo zone, returns the id of its owner or None if the zone does not exist"""
+        stmt = delete(GeoZone).where(GeoZone.id == zone_id).returning(GeoZone.user_id)
+        result = await self.db.execute(stmt)
+        user_id = result.scalar_one_or_none()
+        await self.db.commit()
+        return user_id
+
+    async def create_route(self, route: RouteCreate, before: datetime | None = None) -> Row | None:
+        """
+        Create a route of a session, its path is built once from the points stored so far.
+
+        ``before`` bounds the points taken, see ``rebuild_route_path``.
+
+        Returns
+        -------
+            Row | None: Route summary (see ``rebuild_route_path``) or None if the session does not exist.
+
+        """
+        routes = Route.__table__
+        # INSERT ... SELECT from the session: no row is inserted when the session does not exist
+        session = select(
+            Session.user_id,
+            Session.id,
+            literal(route.name, String),
+            literal(route.tags or {}, JSONB),
+        ).where(Session.id == route.session_id)
+        stmt = (
+            insert(routes)
+            .from_select(['user_id', 'session_id', 'name', 'tags'], session)
+            .returning(routes.c.id)
+        )
+        route_id = (await self.db.execute(stmt)).scalar_one_or_none()
+        if route_id is None:
+            return None
+        return await self.rebuild_route_path(route_id, before)
+
+    @on_primary
+    async def get_route_session_id(self, route_id: UUID) -> UUID | None:
+        """Get the session of a route"""
+        result = await self.db.execute(select(Route.session_id).where(Route.id == route_id))
+        return result.scalar_one_or_none()
+
+    async def rebuild_route_path(self, route_id: UUID, before: datetime | None = None) -> Row | None:
+        """
+        Rebuild ``path`` and ``simplified_path`` of a route from all points of its session.
+
+        This is O(n) over the session's points and is meant only as an explicit repair operation,
+        regular updates append new points incrementally (see ``append_route_points``).
+        With ``before`` only the points older than it are taken: the newer ones are still pending
+        in ``RouteBuilder`` and are appended by the next flush (see ``RouteBuilder.rebuilding``).
+        """
+        routes = Route.__table__
+        session_id = select(routes.c.session_id).where(routes.c.id == route_id).scalar_subquery()
+        conditions = [TrackPoint.session_id == session_id]
+        if before is not None:
+            conditions.append(TrackPoint.timestamp < before)
+        line = select(
+            func.ST_MakeLine(aggregate_order_by(TrackPoint.location, TrackPoint.timestamp)).label('path')
+        ).where(*conditions).subquery()
+        stmt = (
+            update(routes)
+            .where(routes.c.id == route_id)
+            .values(
+                path=line.c.path,
+                simplified_path=func.ST_Simplify(line.c.path, ROUTE_SIMPLIFY_TOLERANCE)
+            )
+            .returning(*self._route_columns(routes))
+        )
+        result = await self.db.execute(stmt)
+        row = result.one_or_none()
+        await self.db.commit()
+        return row
+
+    async def append_route_points(self, pending: dict[str, RouteAppend]) -> None:
+        """
+        Append new points to the routes of sessions with one executemany UPDATE.
+
+        ``ST_MakeLine(line, points)`` concatenates the new points to the stored line,
+        so the cost depends on the number of new points, not on the length of the route.
+        """
+        routes = Route.__table__
+        geometry = Geometry(srid=4326)
+        new_points = bindparam('new_points', type_=geometry)
+        new_vertices = bindparam('new_vertices', type_=geometry)
+        # The array form of ST_MakeLine skips NULLs: a route saved before its session had points
+        # (NULL lines) starts from the new points, and a line without new vertices stays as it is.
+        # The simplified line of such a route starts at the first point, the simplifier never emits it.
+        first_point = case(
+            (routes.c.simplified_path.is_(None), func.ST_GeometryN(func.ST_Points(new_points), 1)),
+            else_=null()
+        )
+        stmt = (
+            update(routes)
+            .where(routes.c.session_id == bindparam('route_session_id'))
+            .values(
+                path=func.ST_MakeLine(array([routes.c.path, new_points], type_=geometry)),
+                simplified_path=func.ST_MakeLine(
+                    array([routes.c.simplified_path, first_point, new_vertices], type_=geometry)
+                )
+            )
+        )
+        params = [
+            {
+                'route_session_id': UUID(session_id),
+                'new_points': self._ewkt_points(append.points),
+                'new_vertices': self._ewkt_points(append.vertices) if append.vertices else None,
+            }
+            for session_id, append in pending.items()
+            if append.points
+        ]
+        if params:
+            await self.db.execute(stmt, params)
+            await self.db.commit()
+
+    @staticmethod
+    def _ewkt_points(points: list[Coordinate]) -> str:
+        """A single point or a line of points as EWKT"""
+        if len(points) == 1:
+            return f'SRID=4326;POINT({points[0][0]} {points[0][1]})'
+        return f"SRID=4326;LINESTRING({', '.join(f'{lon} {lat}' for lon, lat in points)})"
+
+    @staticmethod
+    def _route_columns(routes: TableClause) -> list:
+        """Columns of a route summary"""
+        return [
+            routes.c.id,
+            routes.c.user_id,
+            routes.c.session_id,
+            routes.c.name,
+            routes.c.tags,
+            func.coalesce(func.ST_NPoints(routes.c.path), 0).label('points_count'),
+            func.coalesce(func.ST_NPoints(routes.c.simplified_path), 0).label('simplified_points_count'),
+        ]
+
     async def get_route(self, route_id: int) -> Route:
         """Get a route by its ID"""
         return await self.db.execute(select(Route).where(Route.id == route_id))
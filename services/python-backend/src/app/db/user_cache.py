@@ -0,0 +1,49 @@
+import time
+from collections import OrderedDict
+
+from db.orm_models import User
+
+
+class UserCache:
+    """
+    In-process LRU cache with TTL for user rows.
+
+    Entries are stored as plain column snapshots and returned as transient ``User`` instances,
+    so cached users never depend on a closed (or expired) database session.
+    The TTL bounds staleness when several worker processes modify the same user.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 300.0):
+        """Initialize the cache"""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> User | None:
+        """Returns a cached user or None if it is absent or expired"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, snapshot = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return User(**snapshot)
+
+    def set(self, user: User) -> None:
+        """Stores a snapshot of the user's columns"""
+        snapshot = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        self._entries[user.id] = (time.monotonic() + self.ttl, snapshot)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Removes a user from the cache"""
+        self._entries.pop(user_id, None)
@@ -0,0 +1,186 @@
+"""
+Local throughput check of the HTTP server.
+
+Sends GET requests over ``--concurrency`` keep-alive connections and reports requests per second
+and latency percentiles. To compare the launch modes, start the server in each mode and run the
+same load against it::
+
+    SERVER_MODE=development python main.py
+    python loadtest.py --url http://127.0.0.1:8015/metrics
+
+    SERVER_MODE=uvloop python main.py
+    python loadtest.py --url http://127.0.0.1:8015/metrics
+
+``--mode ingest`` posts synthetic trails to ``POST /location/tracks`` and reports stored points per
+second. A batch size of 1 is the single-row insert path (one INSERT and one commit per point),
+compare it with batched ingest on the same server::
+
+    python loadtest.py --mode ingest --url http://127.0.0.1:8015/location/tracks --batch-size 1
+    python loadtest.py --mode ingest --url http://127.0.0.1:8015/location/tracks --batch-size 500
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import UTC, datetime, timedelta
+from urllib.parse import urlsplit
+
+
+async def _read_response(reader: asyncio.StreamReader) -> int:
+    """Reads one response with a Content-Length body, returns its status code"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status_code = int(lines[0].split(' ', 2)[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status_code
+
+
+async def run_load(url: str, concurrency: int, duration: float) -> dict[str, float]:
+    """
+    Requests ``url`` from ``concurrency`` connections for ``duration`` seconds.
+
+    Returns
+    -------
+        dict: Number of requests and errors, requests per second and latency percentiles in milliseconds.
+
+    """
+    parts = urlsplit(url)
+    request = (
+        f"GET {parts.path or '/'}{'?' + parts.query if parts.query else ''} HTTP/1.1\r\n"
+        f"Host: {parts.netloc}\r\nConnection: keep-alive\r\n\r\n"
+    ).encode()
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        try:
+            while time.perf_counter() < deadline:
+                start_time = time.perf_counter()
+                writer.write(request)
+                status_code = await _read_response(reader)
+                latencies.append(time.perf_counter() - start_time)
+                if status_code >= 400:
+                    errors += 1
+        finally:
+            writer.close()
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': quantiles[49] * 1000,
+        'p99_ms': quantiles[98] * 1000,
+    }
+
+
+def synthetic_trail(user_id: int, points: int, start_time: datetime) -> list[dict]:
+    """
+    ``LocationCreate`` payloads of a user walking north at 5 m/s, one point per second.
+
+    The steps are large enough not to be dropped as stationary jitter and small enough not to be
+    rejected as outliers, so every point is stored.
+    """
+    return [
+        {
+            'user_id': user_id,
+            'date_time': (start_time + timedelta(seconds=i)).isoformat(),
+            'latitude': 55.0 + i * 0.000045,
+            'longitude': 37.0,
+            'accuracy': 5.0,
+        }
+        for i in range(points)
+    ]
+
+
+async def run_ingest(url: str, points: int, batch_size: int, concurrency: int, user_id: int) -> dict[str, float]:
+    """
+    Posts ``points`` points in batches of ``batch_size`` from ``concurrency`` connections.
+
+    Every connection sends the trail of its own user in time order, users start at ``user_id``.
+
+    Returns
+    -------
+        dict: Points stored, errors, points per second and batch latency percentiles in milliseconds.
+
+    """
+    parts = urlsplit(url)
+    start_time = datetime.now(UTC) - timedelta(seconds=points)
+    per_client = -(-points // concurrency)
+    latencies: list[float] = []
+    errors = 0
+    stored = 0
+
+    async def client(trail: list[dict]):
+        nonlocal errors, stored
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        try:
+            for offset in range(0, len(trail), batch_size):
+                batch = trail[offset:offset + batch_size]
+                body = json.dumps({'points': batch}).encode()
+                request = (
+                    f"POST {parts.path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: keep-alive\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                ).encode() + body
+                batch_start = time.perf_counter()
+                writer.write(request)
+                status_code = await _read_response(reader)
+                latencies.append(time.perf_counter() - batch_start)
+                if status_code >= 400:
+                    errors += 1
+                else:
+                    stored += len(batch)
+        finally:
+            writer.close()
+
+    trails = [
+        synthetic_trail(user_id + i, min(per_client, points - i * per_client), start_time)
+        for i in range(concurrency)
+        if points - i * per_client > 0
+    ]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(trail) for trail in trails))
+    elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        'points': stored,
+        'errors': errors,
+        'points_per_second': stored / elapsed,
+        'p50_ms': quantiles[49] * 1000,
+        'p99_ms': quantiles[98] * 1000,
+    }
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('get', 'ingest'), default='get')
+    parser.add_argument('--url', default='http://127.0.0.1:8015/metrics')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds, get mode')
+    parser.add_argument('--points', type=int, default=20000, help='ingest mode')
+    parser.add_argument('--batch-size', type=int, default=500, help='ingest mode, 1 - single-row inserts')
+    parser.add_argument('--user-id', type=int, default=900_000_000, help='first synthetic user, ingest mode')
+    args = parser.parse_args()
+    if args.mode == 'ingest':
+        result = asyncio.run(run_ingest(args.url, args.points, args.batch_size, args.concurrency, args.user_id))
+    else:
+        result = asyncio.run(run_load(args.url, args.concurrency, args.duration))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+from log_handlers import NonBlockingQueueHandler, RateLimitFilter
+
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_FILE = os.getenv('LOG_FILE', 'api.log')  # Empty - console only
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # Records waiting to be written, newer are dropped
+LOG_RATE_LIMIT = int(os.getenv('LOG_RATE_LIMIT', 20))  # Records of one message per interval, 0 disables the limit
+LOG_RATE_INTERVAL = float(os.getenv('LOG_RATE_INTERVAL', 1))  # In seconds
+
+_listeners: list[QueueListener] = []
+
+
+def route_through_queue(logger: logging.Logger, *filters: logging.Filter):
+    """Moves the handlers of a logger to a background thread, the logger only puts records into a queue"""
+    if not logger.handlers or any(isinstance(handler, QueueHandler) for handler in logger.handlers):
+        return
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    listener = QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    for log_filter in filters:
+        queue_handler.addFilter(log_filter)
+    logger.handlers = [queue_handler]
+    listener.start()
+    _listeners.append(listener)
+
+
+def stop_logging():
+    """Writes the queued records and stops the background threads"""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def setup_logger():
+    """
+    Configures logging to console and ``LOG_FILE``.
+
+    Records are written by background threads, so a slow disk or console never blocks request handling.
+    Uvicorn's own loggers (configured before the application is imported) are moved to the queue too.
+    """
+    root_logger = logging.getLogger()
+    if any(isinstance(handler, QueueHandler) for handler in root_logger.handlers):
+        return  # Already configured
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers: list[logging.Handler] = [logging.StreamHandler()]
+    if LOG_FILE:
+        handlers.append(logging.FileHandler(LOG_FILE, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root_logger.setLevel(LOG_LEVEL.upper())
+    root_logger.handlers = handlers
+    route_through_queue(root_logger, RateLimitFilter(LOG_RATE_LIMIT, LOG_RATE_INTERVAL))
+    # Application loggers are named ``uvicorn.<module>`` and stop at uvicorn's handlers, limit them there too
+    route_through_queue(logging.getLogger('uvicorn'), RateLimitFilter(LOG_RATE_LIMIT, LOG_RATE_INTERVAL))
+    route_through_queue(logging.getLogger('uvicorn.access'))
+    atexit.register(stop_logging)
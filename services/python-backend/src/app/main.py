@@ -2,20 +2,38 @@
 import asyncio
 import logging
 import os
+import random
+import time
 from contextlib import asynccontextmanager
 
-from db.database import create_tables
+from db.database import (
+    DATABASE_READ_CHECK_INTERVAL,
+    async_session_factory,
+    create_tables,
+    dispose_engines,
+    replica_monitor,
+)
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import location_router, user_router
+from logger import setup_logger
+from metrics import MetricsMiddleware, startup_duration
+from routers import geozone_router, location_router, metrics_router, route_router, user_router
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from tracking.maintenance import run_maintenance, shutdown_maintenance
 
 
-logging.basicConfig(level=logging.INFO)
+setup_logger()
 logger = logging.getLogger(f"uvicorn.{__name__}")
 
 MAX_DB_CONNECTION_RETRIES = int(os.getenv("MAX_DB_CONNECTION_RETRIES", 5))
-RETRY_DB_CONNECTION_DELAY = int(os.getenv("RETRY_DB_CONNECTION_DELAY", 5))
+RETRY_DB_CONNECTION_DELAY = float(os.getenv("RETRY_DB_CONNECTION_DELAY", 2))  # Initial delay, doubled per attempt
+RETRY_DB_CONNECTION_MAX_DELAY = float(os.getenv("RETRY_DB_CONNECTION_MAX_DELAY", 30))
+# development: auto-reload; uvloop: uvloop and httptools without reload. Both run one process, see the launch below
+SERVER_MODE = os.getenv("SERVER_MODE", "development")
+# Only one worker while ingest state in ``tracking`` is kept in process memory
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", 1))
+SERVER_GRACEFUL_TIMEOUT = float(os.getenv("SERVER_GRACEFUL_TIMEOUT", 30))  # In seconds, to finish requests on SIGTERM
+TRACKING_MAINTENANCE_INTERVAL = float(os.getenv("TRACKING_MAINTENANCE_INTERVAL", 10))  # In seconds
 
 
 @asynccontextmanager
@@ -23,24 +41,30 @@ async def lifespan(app: FastAPI):
     """
     Application lifespan context manager.
 
-    Handles database table creation with retry logic on startup.
+    Handles database table creation with retry logic on startup
+    and runs maintenance of the in-memory tracking state until shutdown.
     """
     logger.info("Starting table creation process")
+    start_time = time.perf_counter()
 
     retries = 0
+    migrated = False
     # Retry loop for database connection with exponential backoff
     while retries < MAX_DB_CONNECTION_RETRIES:
         try:
-            await create_tables()
+            migrated = await create_tables()
             break  # Success - exit retry loop
-        except (OperationalError, SQLAlchemyError) as e:
+        except (OperationalError, SQLAlchemyError, OSError) as e:
             retries += 1
             logger.error(f"Database connection error (attempt {retries}/{MAX_DB_CONNECTION_RETRIES}): {e}")
 
             # Check if we should retry or give up
             if retries < MAX_DB_CONNECTION_RETRIES:
-                logger.info(f"Retrying in {RETRY_DB_CONNECTION_DELAY} seconds...")
-                await asyncio.sleep(RETRY_DB_CONNECTION_DELAY)
+                # Jitter spreads the retries of workers restarted at the same time
+                delay = min(RETRY_DB_CONNECTION_DELAY * 2 ** (retries - 1), RETRY_DB_CONNECTION_MAX_DELAY)
+                delay = delay / 2 + random.uniform(0, delay / 2)
+                logger.info(f"Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
             else:
                 logger.error("Maximum number of connection attempts exceeded.")
                 raise  # Re-raise exception if retries are exhausted
@@ -49,20 +73,31 @@ async def lifespan(app: FastAPI):
             logger.error(f"Unexpected database error: {e}")
             raise  # Re-raise exception for other errors
 
-    logger.info("Tables created successfully")
+    elapsed = time.perf_counter() - start_time
+    startup_duration.set(elapsed)
+    if migrated:
+        logger.info(f"Database schema set up in {elapsed:.2f}s")
+    else:
+        logger.info(f"Database schema is up to date, checked in {elapsed:.2f}s")
+
+    # Tracking state is accumulated in memory during ingest, flushed and evicted periodically
+    stop_maintenance = asyncio.Event()
+    maintenance = asyncio.create_task(
+        run_maintenance(async_session_factory, TRACKING_MAINTENANCE_INTERVAL, stop_maintenance)
+    )
+    # Reads go to the replica only after its lag has been checked
+    replica_check = None
+    if replica_monitor is not None:
+        await replica_monitor.check()
+        replica_check = asyncio.create_task(replica_monitor.run(DATABASE_READ_CHECK_INTERVAL))
     yield  # Application startup complete, yield control to FastAPI
 
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("api.log"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+    if replica_check is not None:
+        replica_check.cancel()
+    stop_maintenance.set()
+    await maintenance  # Lets a running flush finish, its drained deltas are not lost
+    await shutdown_maintenance(async_session_factory)
+    await dispose_engines()
 
 
 # Создаем FastAPI приложение
@@ -106,17 +141,42 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(location_router)
 app.include_router(user_router)
+app.include_router(geozone_router)
+app.include_router(route_router)
+app.include_router(metrics_router)
 
 # Запуск сервер
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("APP_PORT", 8015))  # Берём порт из переменной или 8000 по умолчанию
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=port,
-        reload=True
-    )
+    if SERVER_MODE == "uvloop":
+        # Ingest state in ``tracking`` (last points, Kalman filters, dedup, transport windows, route simplifiers,
+        # geofence presence) lives in process memory and has to see every point of a trail. Uvicorn workers share
+        # one socket, so points of a trail would be split between them: more workers need that state in the database
+        if SERVER_WORKERS != 1:
+            raise SystemExit(
+                f"SERVER_WORKERS={SERVER_WORKERS} is not supported: tracking state is kept in process memory, use 1"
+            )
+        # On SIGTERM uvicorn stops accepting connections, waits for running requests and runs the shutdown
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=port,
+            workers=SERVER_WORKERS,
+            loop="uvloop",
+            http="httptools",
+            timeout_graceful_shutdown=SERVER_GRACEFUL_TIMEOUT
+        )
+    elif SERVER_MODE == "development":
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=port,
+            reload=True
+        )
+    else:
+        raise SystemExit(f"Unknown SERVER_MODE={SERVER_MODE}, use development or uvloop")
@@ -0,0 +1,238 @@
+import bisect
+import functools
+import inspect
+import math
+import time
+from collections.abc import Callable, Iterable
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base of the metrics: name, help text and values by label values"""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        """Initialize the metric"""
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict[str, object]) -> tuple:
+        return tuple(labels[name] for name in self.labels)
+
+    def render(self) -> list[str]:
+        """Lines of the metric in the Prometheus text format"""
+        lines = [f'# HELP {self.name} {_escape(self.documentation)}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        return [
+            f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+            for key, value in self._values.items()
+        ]
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        """Initialize the counter, without labels it is exported as 0 before the first increment"""
+        super().__init__(name, documentation, labels)
+        if not self.labels:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels):
+        """Increments the counter of the given label values"""
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down, either set directly or read by ``collect`` on every scrape"""
+
+    type = 'gauge'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        collect: Callable[[], float | dict[tuple, float]] | None = None
+    ):
+        """Initialize the gauge, ``collect`` returns the value, or values by label values"""
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        """Sets the value of the given label values"""
+        self._values[self._key(labels)] = value
+
+    def _samples(self) -> list[str]:
+        if self.collect is not None:
+            values = self.collect()
+            self._values = values if isinstance(values, dict) else {(): values}
+        return super()._samples()
+
+
+class Histogram(Metric):
+    """Distribution of observed values (e.g. durations in seconds) in cumulative buckets"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        """Initialize the histogram"""
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        """Accounts an observed value for the given label values"""
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            # Counts per bucket (the last one is +Inf), sum
+            series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+            labels = _format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process metrics exported in the Prometheus text format.
+
+    Metrics are updated from the event loop only, so no locking is needed; values computed
+    elsewhere (connection pools, in-memory tracking state) are read by gauges at scrape time.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._metrics: dict[str, Metric] = {}
+
+    def register[M: Metric](self, metric: M) -> M:
+        """Adds a metric, names must be unique"""
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(Counter(
+    'http_requests_total', 'HTTP requests by method, route and status code', ('method', 'route', 'status')
+))
+http_request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by method and route', ('method', 'route')
+))
+repository_duration = registry.register(Histogram(
+    'repository_call_duration_seconds', 'Duration of repository methods, including failed calls', ('method',)
+))
+ingest_batches = registry.register(Counter('ingest_batches_total', 'Location batches received'))
+ingest_points = registry.register(Counter(
+    'ingest_points_total', 'Location points by outcome: accepted, invalid, outlier or dropped', ('result',)
+))
+startup_duration = registry.register(Gauge(
+    'startup_duration_seconds', 'Time spent on database connection and schema setup at startup'
+))
+
+
+def timed_methods[T: type](cls: T) -> T:
+    """Class decorator recording the duration of every public coroutine method in ``repository_duration``"""
+    for name, method in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.iscoroutinefunction(method):
+            continue
+
+        def wrap(method: Callable, name: str = name) -> Callable:
+            @functools.wraps(method)
+            async def timed(*args, **kwargs):
+                start_time = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    repository_duration.observe(time.perf_counter() - start_time, method=name)
+            return timed
+
+        setattr(cls, name, wrap(method))
+    return cls
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts and latency.
+
+    Requests are labeled by the route template (``/location/sessions/{session_id}``) rather than
+    the path, so the number of series stays bounded; unknown paths share the ``unmatched`` label.
+    """
+
+    def __init__(self, app):
+        """Initialize the middleware"""
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """Handles a request, measuring the time until the response is sent completely"""
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            method = scope['method']
+            http_request_duration.observe(time.perf_counter() - start_time, method=method, route=route)
+            http_requests.inc(method=method, route=route, status=status_code)
@@ -1,9 +1,15 @@
 """Routers package initialization."""
 
 __all__ = [
+    "geozone_router",
     "location_router",
+    "metrics_router",
+    "route_router",
     "user_router"
 ]
 
+from .geozone import router as geozone_router
 from .location import router as location_router
+from .metrics import router as metrics_router
+from .route import router as route_router
 from .user import router as user_router
@@ -0,0 +1,104 @@
+import logging
+
+import shapely
+from db.database import get_repository
+from db.timescaledb_repository import TimescaleDBRepository
+from fastapi import APIRouter, Depends, HTTPException, status
+from schemas import GeoZoneCreate, GeoZoneRead
+from sqlalchemy import Row
+from tracking.geofence import geofence_engine
+
+
+logger = logging.getLogger(f"uvicorn.{__file__}")
+router = APIRouter(prefix='/geozones')
+
+
+def _zone_read(row: Row) -> GeoZoneRead:
+    """Builds the response schema from a geo zone row with WKB geometry"""
+    geometry = shapely.from_wkb(row.wkb)
+    return GeoZoneRead(
+        id=row.id,
+        user_id=row.user_id,
+        name=row.name,
+        zone_type=row.zone_type,
+        notify_on_enter=row.notify_on_enter,
+        radius=row.radius,
+        coordinates=list(geometry.exterior.coords)
+    )
+
+
+@router.post(
+    '/',
+    response_model=GeoZoneRead,
+    status_code=status.HTTP_201_CREATED,
+    tags=['geozone'],
+    summary="Create a geo zone (polygon or circle)"
+)
+async def create_geo_zone(
+    request: GeoZoneCreate,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Create a geo zone and add it to the in-memory geofence index."""
+    if request.coordinates is None and (request.center is None or request.radius is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either coordinates or center and radius must be provided"
+        )
+    try:
+        row = await repo.create_geo_zone(request)
+    except Exception as exc:
+        logger.error(f"Error creating geo zone: {exc}", exc_info=exc)
+        await repo.db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    geofence_engine.upsert_zone(row.user_id, row.id, row.name, row.notify_on_enter, shapely.from_wkb(row.wkb))
+    return _zone_read(row)
+
+
+@router.get(
+    '/users/{user_id}',
+    response_model=list[GeoZoneRead],
+    tags=['geozone'],
+    summary="Get geo zones of a user"
+)
+async def get_user_geo_zones(
+    user_id: int,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Get all geo zones of a user."""
+    try:
+        rows = await repo.get_geo_zones({user_id})
+    except Exception as exc:
+        logger.error(f"Error getting geo zones: {exc}", exc_info=exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    return [_zone_read(row) for row in rows]
+
+
+@router.delete(
+    '/{zone_id}',
+    status_code=status.HTTP_204_NO_CONTENT,
+    tags=['geozone'],
+    summary="Delete geo zone"
+)
+async def delete_geo_zone(
+    zone_id: int,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Delete a geo zone and remove it from the in-memory geofence index."""
+    try:
+        user_id = await repo.delete_geo_zone(zone_id)
+    except Exception as exc:
+        logger.error(f"Error deleting geo zone: {exc}", exc_info=exc)
+        await repo.db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    if user_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Geo zone not found")
+    geofence_engine.remove_zone(user_id, zone_id)
@@ -1,14 +1,701 @@
+import asyncio
+import base64
 import logging
+import math
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
+from typing import Literal
+from uuid import UUID
 
-from fastapi import APIRouter
+import numpy as np
+import orjson
+from db.database import get_repository, get_session_factory
+from db.timescaledb_repository import TimescaleDBRepository
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from metrics import ingest_batches, ingest_points
+from schemas import (
+    GeofenceEventRead,
+    LocationCreate,
+    MovementReport,
+    MovementRollup,
+    MovementRollupsResponse,
+    PositionEstimate,
+    PositionsRequest,
+    PositionsResponse,
+    SessionAnalytics,
+    SessionPassage,
+    SessionPassagesPage,
+    SessionSummary,
+    TrackPointError,
+    TrackPointRead,
+    TrackPointsCreateRequest,
+    TrackPointsCreateResponse,
+    TrackPointsPage,
+    TrackSegments,
+    TrackStop,
+    TransportSegmentRead,
+)
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from tracking.analytics import TrackArrays, analyze_track, interpolate_positions, time_windows
+from tracking.geo import position
+from tracking.geofence import geofence_engine
+from tracking.ingest_filter import ingest_filter
+from tracking.kalman import kalman_smoother
+from tracking.route_builder import route_builder
+from tracking.session_stats import session_stats
+from tracking.trail_locks import trail_locks
+from tracking.transport_mode import transport_classifier
 
 
 logger = logging.getLogger(f"uvicorn.{__file__}")
 router = APIRouter(prefix='/location')
 
-@router.post('/tracks')
-async def tracks():
-    pass
+EXPORT_PARTITION_SIZE = 5000  # Rows fetched from the server-side cursor at once
+EXPORT_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'geojson': 'application/geo+json',
+}
+SEARCH_MAX_POINTS = 5000  # Page size limits of the spatial searches
+SEARCH_MAX_SESSIONS = 500
+POSITIONS_MAX_TIMESTAMPS = 1000  # Every timestamp adds a time window to the query
+POSITIONS_MAX_GAP = 86400  # In seconds
+
+
+def validate_point(point: LocationCreate) -> str | None:
+    """Returns the reason why a point cannot be stored, or None if it is valid"""
+    if not (math.isfinite(point.latitude) and -90 <= point.latitude <= 90):
+        return "latitude must be within [-90, 90]"
+    if not (math.isfinite(point.longitude) and -180 <= point.longitude <= 180):
+        return "longitude must be within [-180, 180]"
+    if not (math.isfinite(point.accuracy) and point.accuracy >= 0):
+        return "accuracy must be a non-negative number"
+    if point.session_id is not None:
+        try:
+            UUID(point.session_id)
+        except ValueError:
+            return "session_id must be a valid UUID"
+    return None
+
+
+@router.post(
+    '/tracks',
+    response_model=TrackPointsCreateResponse,
+    status_code=status.HTTP_201_CREATED,
+    tags=['location'],
+    summary="Bulk ingest of location points, possibly of several users at once"
+)
+async def create_track_points(
+    request: TrackPointsCreateRequest,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """
+    Store a batch of location points in one round trip.
+
+    Invalid points and GPS outliers are rejected individually, repeated positions of stationary users
+    are dropped (see ``tracking.ingest_filter``), the rest of the batch is written with a single
+    executemany. Points are smoothed on the way, see ``tracking.kalman``.
+    """
+    received_at = datetime.now(UTC)
+    valid_points = []
+    errors = []
+    indexes = {}  # id(point) -> index in the request, for errors found after sorting
+    for index, point in enumerate(request.points):
+        reason = validate_point(point)
+        if reason is not None:
+            errors.append(TrackPointError(index=index, reason=reason))
+            continue
+        point.date_time = point.date_time or received_at
+        if point.session_id is not None:
+            point.session_id = str(UUID(point.session_id))  # Canonical form, used as in-memory key
+        indexes[id(point)] = index
+        valid_points.append(point)
+    # A point of an unknown session would violate the foreign key and fail the whole insert
+    session_ids = {point.session_id for point in valid_points if point.session_id is not None}
+    if session_ids:
+        try:
+            known_sessions = {str(session_id) for session_id in await repo.find_session_ids(
+                {UUID(session_id) for session_id in session_ids}
+            )}
+        except Exception as exc:
+            logger.error(f"Error checking sessions: {exc}", exc_info=exc)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error"
+            ) from exc
+        errors.extend(
+            TrackPointError(index=indexes[id(point)], reason=f"Session {point.session_id} does not exist")
+            for point in valid_points
+            if point.session_id is not None and point.session_id not in known_sessions
+        )
+        valid_points = [
+            point for point in valid_points if point.session_id is None or point.session_id in known_sessions
+        ]
+    # Tracking state is measured before the write and applied after it, concurrent batches of a trail wait
+    async with trail_locks.hold(point.session_id or f'user:{point.user_id}' for point in valid_points):
+        # Incremental statistics expect each session's points in time order
+        valid_points.sort(key=lambda point: point.date_time)
+        kalman_batch = kalman_smoother.measure(valid_points)
+        errors.extend(
+            TrackPointError(index=indexes[id(point)], reason=f"Implausible jump of {speed:.0f} m/s, rejected as outlier")
+            for point, speed in kalman_batch.outliers
+        )
+        filter_batch = ingest_filter.select(kalman_batch.kept)
+        valid_points = filter_batch.kept
+
+        stats_batch = session_stats.measure(valid_points)
+        try:
+            accepted = await repo.create_track_points(valid_points, segment_distances=stats_batch.distances)
+        except Exception as exc:
+            logger.error(f"Error storing track points: {exc}", exc_info=exc)
+            await repo.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error"
+            ) from exc
+        kalman_smoother.apply(kalman_batch)
+        ingest_filter.apply(filter_batch)
+        session_stats.apply(stats_batch)
+        ingest_batches.inc()
+        ingest_points.inc(accepted, result='accepted')
+        ingest_points.inc(len(errors) - len(kalman_batch.outliers), result='invalid')
+        ingest_points.inc(len(kalman_batch.outliers), result='outlier')
+        ingest_points.inc(filter_batch.dropped, result='dropped')
+        route_builder.observe(valid_points)
+        transport_classifier.observe(valid_points)
+        events = await _evaluate_geofences(repo, valid_points)
+        return TrackPointsCreateResponse(
+            accepted=accepted,
+            rejected=len(errors),
+            dropped=filter_batch.dropped,
+            errors=errors,
+            events=events
+        )
+
+
+async def _evaluate_geofences(repo: TimescaleDBRepository, points: list[LocationCreate]) -> list[GeofenceEventRead]:
+    """Checks stored points against the users' geo zones in memory; zones are loaded on first use"""
+    users_to_load = geofence_engine.users_to_load({point.user_id for point in points})
+    if users_to_load:
+        try:
+            geofence_engine.load_rows(users_to_load, await repo.get_geo_zones(users_to_load))
+        except Exception as exc:
+            # Points are already stored, a geofence failure must not fail the ingest
+            logger.error(f"Error loading geo zones: {exc}", exc_info=exc)
+    return [
+        GeofenceEventRead(
+            user_id=event.user_id,
+            zone_id=event.zone_id,
+            zone_name=event.zone_name,
+            event=event.event,
+            timestamp=event.timestamp,
+            notify=event.notify
+        )
+        for point in points
+        for event in geofence_engine.evaluate(point.user_id, *position(point), point.date_time)
+    ]
+
+
+@router.get(
+    '/sessions/{session_id}/summary',
+    response_model=SessionSummary,
+    tags=['location'],
+    summary="Get session statistics: distance, number of points and bounding box"
+)
+async def get_session_summary(
+    session_id: UUID,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Session statistics are stored on the session row, so this is an O(1) read."""
+    try:
+        row = await repo.get_session_summary(session_id)
+    except Exception as exc:
+        logger.error(f"Error getting session summary: {exc}", exc_info=exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+
+    total_distance = row.total_distance or 0.0
+    points_count = row.points_count or 0
+    bounds = _bounds(row)
+    # Add the deltas this worker has not flushed yet
+    pending = session_stats.pending(str(session_id))
+    if pending is not None:
+        total_distance += pending.distance
+        points_count += pending.points_count
+        bounds = [
+            min(pending.min_lon, bounds[0]) if bounds else pending.min_lon,
+            min(pending.min_lat, bounds[1]) if bounds else pending.min_lat,
+            max(pending.max_lon, bounds[2]) if bounds else pending.max_lon,
+            max(pending.max_lat, bounds[3]) if bounds else pending.max_lat,
+        ]
+    return SessionSummary(
+        id=row.id,
+        user_id=row.user_id,
+        start_time=row.start_time,
+        end_time=row.end_time,
+        total_distance=total_distance,
+        points_count=points_count,
+        bounds=bounds,
+        transport_type=row.transport_type
+    )
+
+
+@router.get(
+    '/sessions/{session_id}/transport',
+    response_model=list[TransportSegmentRead],
+    tags=['location'],
+    summary="Get transport mode segments of a session"
+)
+async def get_transport_segments(
+    session_id: UUID,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Segments are detected during ingest and stored, nothing is recomputed here."""
+    try:
+        return await repo.get_transport_segments(session_id)
+    except Exception as exc:
+        logger.error(f"Error getting transport segments: {exc}", exc_info=exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+
+
+@router.get(
+    '/sessions/{session_id}/analytics',
+    response_model=SessionAnalytics,
+    tags=['location'],
+    summary="Get session analytics: speed, moving time and stops"
+)
+async def get_session_analytics(
+    session_id: UUID,
+    stop_speed: float = Query(0.5, gt=0),
+    min_stop_duration: float = Query(120.0, ge=0),
+    segments: bool = False,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Points are loaded into NumPy arrays and processed in a worker thread, without per-point Python code."""
+    try:
+        track = await repo.get_track_arrays(session_id)
+    except Exception as exc:
+        logger.error(f"Error loading session track: {exc}", exc_info=exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    if len(track) == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session has no track points")
+    return await asyncio.to_thread(_session_analytics, session_id, track, stop_speed, min_stop_duration, segments)
+
+
+def _session_analytics(
+    session_id: UUID,
+    track: TrackArrays,
+    stop_speed: float,
+    min_stop_duration: float,
+    include_segments: bool
+) -> SessionAnalytics:
+    """Builds the analytics response, CPU-bound"""
+    analytics = analyze_track(track, stop_speed, min_stop_duration)
+    stops = []
+    stopped_time = 0.0
+    for first, last in analytics.stops.tolist():
+        duration = float(track.timestamps[last] - track.timestamps[first])
+        stopped_time += duration
+        stops.append(TrackStop(
+            start_time=datetime.fromtimestamp(track.timestamps[first], UTC),
+            end_time=datetime.fromtimestamp(track.timestamps[last], UTC),
+            duration=duration,
+            longitude=float(track.lon[first:last + 1].mean()),
+            latitude=float(track.lat[first:last + 1].mean())
+        ))
+
+    total_distance = float(analytics.distances.sum())
+    duration = float(track.timestamps[-1] - track.timestamps[0])
+    moving_time = duration - stopped_time
+    return SessionAnalytics(
+        session_id=session_id,
+        points_count=len(track),
+        total_distance=total_distance,
+        duration=duration,
+        moving_time=moving_time,
+        average_speed=total_distance / moving_time if moving_time > 0 else 0.0,
+        max_speed=float(analytics.speeds.max(initial=0.0)),
+        stops=stops,
+        segments=TrackSegments(
+            distances=analytics.distances.tolist(),
+            speeds=analytics.speeds.tolist(),
+            bearings=analytics.bearings.tolist(),
+            accelerations=analytics.accelerations.tolist()
+        ) if include_segments else None
+    )
+
+
+def _bounds(row: Row) -> list[float] | None:
+    """Bounding box of a row with min/max lon/lat columns"""
+    if row.min_lon is None:
+        return None
+    return [row.min_lon, row.min_lat, row.max_lon, row.max_lat]
+
+
+@router.get(
+    '/users/{user_id}/rollups',
+    response_model=MovementRollupsResponse,
+    tags=['location'],
+    summary="Get hourly or daily movement rollups of a user"
+)
+async def get_movement_rollups(
+    user_id: int,
+    resolution: Literal['hourly', 'daily'] = 'daily',
+    start_time: datetime | None = None,
+    end_time: datetime | None = None,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Rollups are read from continuous aggregates, not from the raw (compressed) track points."""
+    try:
+        rows = await repo.get_movement_rollups(user_id, resolution, start_time, end_time)
+    except Exception as exc:
+        logger.error(f"Error getting movement rollups: {exc}", exc_info=exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    rollups = [
+        MovementRollup(bucket=row.bucket, points_count=row.points_count, distance=row.distance, bounds=_bounds(row))
+        for row in rows
+    ]
+    return MovementRollupsResponse(user_id=user_id, resolution=resolution, rollups=rollups)
+
+
+@router.get(
+    '/users/{user_id}/report',
+    response_model=MovementReport,
+    tags=['location'],
+    summary="Get a movement report of a user for the last days (weekly by default)"
+)
+async def get_movement_report(
+    user_id: int,
+    days: int = Query(7, ge=1, le=366),
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Distance covered, number of points and active days, aggregated over the daily rollup."""
+    end_time = datetime.now(UTC)
+    start_time = end_time - timedelta(days=days)
+    try:
+        row = await repo.get_movement_report(user_id, start_time, end_time)
+    except Exception as exc:
+        logger.error(f"Error getting movement report: {exc}", exc_info=exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    return MovementReport(
+        user_id=user_id,
+        start_time=start_time,
+        end_time=end_time,
+        distance=row.distance,
+        points_count=row.points_count,
+        active_days=row.active_days,
+        bounds=_bounds(row)
+    )
+
+
+def _encode_cursor(timestamp: datetime, key: int | UUID) -> str:
+    """Opaque keyset pagination cursor: the sort key of the last row of a page"""
+    return base64.urlsafe_b64encode(orjson.dumps([timestamp, key])).decode()
+
+
+def _decode_cursor(cursor: str, key_type: type[int] | type[UUID]) -> tuple[datetime, int | UUID]:
+    """Sort key of a cursor with the key converted to ``key_type``, raises HTTP 400 if it is malformed"""
+    try:
+        timestamp, key = orjson.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(timestamp), key_type(key)
+    except (ValueError, TypeError, AttributeError) as exc:  # UUID() raises AttributeError for numbers
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from exc
+
+
+def _search_area(
+    bbox: str | None,
+    longitude: float | None,
+    latitude: float | None,
+    radius: float | None,
+    start_time: datetime,
+    end_time: datetime
+) -> dict:
+    """Area filter of a spatial search, either ``bbox`` or a circle, raises HTTP 400 if it is invalid"""
+    if start_time >= end_time:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_time must be before end_time")
+    circle = (longitude, latitude, radius)
+    if bbox is not None and all(value is None for value in circle):
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox.split(','))
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="bbox must be min_lon,min_lat,max_lon,max_lat"
+            ) from exc
+        if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="bbox is out of range")
+        return {'bbox': (min_lon, min_lat, max_lon, max_lat)}
+    if bbox is None and all(value is not None for value in circle):
+        if not (-180 <= longitude <= 180 and -90 <= latitude <= 90):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Center is out of range")
+        return {'center': (longitude, latitude), 'radius': radius}
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Either bbox or longitude, latitude and radius must be provided"
+    )
+
+
+@router.get(
+    '/users/{user_id}/points',
+    response_model=TrackPointsPage,
+    tags=['location'],
+    summary="Search track points of a user within an area and a time range"
+)
+async def search_track_points(
+    user_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    bbox: str | None = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    longitude: float | None = None,
+    latitude: float | None = None,
+    radius: float | None = Query(None, gt=0, description="In meters, around longitude/latitude"),
+    cursor: str | None = None,
+    limit: int = Query(1000, ge=1, le=SEARCH_MAX_POINTS),
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """
+    Points ordered by time, in pages of ``limit``; ``next_cursor`` of a page fetches the next one.
+
+    The time range is required, so only the chunks of the range are searched.
+    """
+    area = _search_area(bbox, longitude, latitude, radius, start_time, end_time)
+    after = None
+    if cursor is not None:
+        after = _decode_cursor(cursor, int)
+    try:
+        # One extra row tells whether there is a next page
+        rows = await repo.find_track_points(user_id, start_time, end_time, after=after, limit=limit + 1, **area)
+    except Exception as exc:
+        logger.error(f"Error searching track points: {exc}", exc_info=exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    next_cursor = _encode_cursor(rows[limit - 1].timestamp, rows[limit - 1].id) if len(rows) > limit else None
+    return TrackPointsPage(
+        points=[TrackPointRead.model_validate(row._mapping) for row in rows[:limit]],
+        next_cursor=next_cursor
+    )
+
+
+@router.get(
+    '/sessions/search',
+    response_model=SessionPassagesPage,
+    tags=['location'],
+    summary="Search sessions that passed through an area within a time range"
+)
+async def search_sessions(
+    start_time: datetime,
+    end_time: datetime,
+    bbox: str | None = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    longitude: float | None = None,
+    latitude: float | None = None,
+    radius: float | None = Query(None, gt=0, description="In meters, around longitude/latitude"),
+    user_id: int | None = None,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=SEARCH_MAX_SESSIONS),
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Sessions ordered by the time of their first point inside the area, paginated like the point search."""
+    area = _search_area(bbox, longitude, latitude, radius, start_time, end_time)
+    after = None
+    if cursor is not None:
+        after = _decode_cursor(cursor, UUID)
+    try:
+        rows = await repo.find_session_passages(
+            start_time, end_time, user_id=user_id, after=after, limit=limit + 1, **area
+        )
+    except Exception as exc:
+        logger.error(f"Error searching sessions: {exc}", exc_info=exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    next_cursor = _encode_cursor(rows[limit - 1].entered_at, rows[limit - 1].session_id) if len(rows) > limit else None
+    return SessionPassagesPage(
+        sessions=[SessionPassage.model_validate(row._mapping) for row in rows[:limit]],
+        next_cursor=next_cursor
+    )
+
+
+@router.post(
+    '/users/{user_id}/positions',
+    response_model=PositionsResponse,
+    tags=['location'],
+    summary="Get positions of a user at several moments (where was I at time T)"
+)
+async def get_positions(
+    user_id: int,
+    request: PositionsRequest,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """
+    Positions are interpolated between the neighbouring points of each timestamp.
+
+    The points around all timestamps are loaded by a single query and interpolated with NumPy,
+    instead of a query per timestamp.
+    """
+    if len(request.timestamps) > POSITIONS_MAX_TIMESTAMPS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {POSITIONS_MAX_TIMESTAMPS} timestamps can be requested at once"
+        )
+    if not (0 < request.max_gap <= POSITIONS_MAX_GAP):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"max_gap must be within (0, {POSITIONS_MAX_GAP}] seconds"
+        )
+    timestamps = [
+        timestamp if timestamp.tzinfo is not None else timestamp.replace(tzinfo=UTC)
+        for timestamp in request.timestamps
+    ]
+    times = np.array([timestamp.timestamp() for timestamp in timestamps], dtype=np.float64)
+    windows = [
+        (datetime.fromtimestamp(start, UTC), datetime.fromtimestamp(end, UTC))
+        for start, end in time_windows(times, request.max_gap).tolist()
+    ]
+    try:
+        track = await repo.get_user_track_arrays(user_id, windows) if windows else TrackArrays.from_partitions([])
+    except Exception as exc:
+        logger.error(f"Error loading user track: {exc}", exc_info=exc)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    estimates = interpolate_positions(track, times, max_gap=request.max_gap)
+    positions = [
+        PositionEstimate(
+            timestamp=timestamp,
+            longitude=lon if method else None,
+            latitude=lat if method else None,
+            uncertainty=uncertainty if method else None,
+            method=method or None
+        )
+        for timestamp, lon, lat, uncertainty, method in zip(
+            timestamps,
+            estimates.lon.tolist(),
+            estimates.lat.tolist(),
+            estimates.uncertainty.tolist(),
+            estimates.method.tolist(),
+            strict=True
+        )
+    ]
+    return PositionsResponse(user_id=user_id, positions=positions)
+
+
+def _point_properties(row: Row) -> dict:
+    """Properties of an exported track point, UUIDs and datetimes are serialized by orjson"""
+    return {
+        'id': row.id,
+        'user_id': row.user_id,
+        'session_id': row.session_id,
+        'timestamp': row.timestamp,
+        'accuracy': row.accuracy,
+        'elevation': row.elevation,
+        'is_waypoint': row.is_waypoint,
+        'note': row.note,
+    }
+
+
+def _ndjson_partition(rows: list[Row]) -> bytes:
+    """One JSON object per line"""
+    return b''.join(
+        orjson.dumps({**_point_properties(row), 'latitude': row.latitude, 'longitude': row.longitude}) + b'\n'
+        for row in rows
+    )
+
+
+def _geojson_features(rows: list[Row]) -> bytes:
+    """Comma-separated GeoJSON features, without the enclosing FeatureCollection"""
+    return b','.join(
+        orjson.dumps({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [row.longitude, row.latitude]},
+            'properties': _point_properties(row),
+        })
+        for row in rows
+    )
+
+
+async def _export_track_points(
+    session_factory: async_sessionmaker,
+    export_format: str,
+    **filters
+) -> AsyncIterator[bytes]:
+    """
+    Yields the export body partition by partition.
+
+    The generator opens its own database session: it outlives the request dependencies
+    while the response is being streamed.
+    """
+    async with session_factory() as db:
+        repo = TimescaleDBRepository(db)
+        partitions = repo.stream_track_points(partition_size=EXPORT_PARTITION_SIZE, **filters)
+        if export_format == 'ndjson':
+            async for rows in partitions:
+                yield _ndjson_partition(rows)
+            return
+
+        yield b'{"type":"FeatureCollection","features":['
+        separator = b''
+        async for rows in partitions:
+            if rows:
+                yield separator + _geojson_features(rows)
+                separator = b','
+        yield b']}'
+
+
+@router.get(
+    '/tracks/export',
+    tags=['location'],
+    summary="Stream track points of a session or of a user within a time range"
+)
+async def export_track_points(
+    session_id: UUID | None = None,
+    user_id: int | None = None,
+    start_time: datetime | None = None,
+    end_time: datetime | None = None,
+    export_format: Literal['ndjson', 'geojson'] = Query('ndjson', alias='format'),
+    session_factory: async_sessionmaker = Depends(get_session_factory)  # noqa B008
+):
+    """
+    Export track points as NDJSON or as a GeoJSON FeatureCollection.
+
+    Points are read through a server-side cursor and streamed as they arrive, so memory stays
+    constant regardless of the track length.
+    """
+    if session_id is None and user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either session_id or user_id must be provided"
+        )
+    body = _export_track_points(
+        session_factory,
+        export_format,
+        session_id=session_id,
+        user_id=user_id,
+        start_time=start_time,
+        end_time=end_time
+    )
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[export_format])
+
 
 # Роуты
 # @router.post("/users/start", status_code=201)
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from metrics import CONTENT_TYPE, registry
+
+
+router = APIRouter()
+
+
+@router.get('/metrics', include_in_schema=False)
+async def get_metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
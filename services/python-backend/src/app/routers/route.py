@@ -0,0 +1,73 @@
+import logging
+from uuid import UUID
+
+from db.database import get_repository
+from db.timescaledb_repository import TimescaleDBRepository
+from fastapi import APIRouter, Depends, HTTPException, status
+from schemas import RouteCreate, RouteRead
+from tracking.route_builder import route_builder
+from tracking.trail_locks import trail_locks
+
+
+logger = logging.getLogger(f"uvicorn.{__file__}")
+router = APIRouter(prefix='/routes')
+
+
+@router.post(
+    '/',
+    response_model=RouteRead,
+    status_code=status.HTTP_201_CREATED,
+    tags=['route'],
+    summary="Save the route of a session"
+)
+async def create_route(
+    request: RouteCreate,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Save a route; later points of the session are appended to it incrementally."""
+    session_id = str(request.session_id)
+    try:
+        # The trail lock keeps ingest of the session out, so every point is either stored before
+        # ``before`` or pending after it and gets into the path exactly once
+        async with trail_locks.hold([session_id]), route_builder.rebuilding(session_id) as before:
+            row = await repo.create_route(request, before)
+    except Exception as exc:
+        logger.error(f"Error creating route: {exc}", exc_info=exc)
+        await repo.db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    return RouteRead.model_validate(row, from_attributes=True)
+
+
+@router.post(
+    '/{route_id}/rebuild',
+    response_model=RouteRead,
+    tags=['route'],
+    summary="Rebuild the route path from all points of its session (repair operation)"
+)
+async def rebuild_route(
+    route_id: UUID,
+    repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
+):
+    """Full O(n) rebuild of path and simplified path, only needed to repair a route."""
+    try:
+        session_id = await repo.get_route_session_id(route_id)
+        row = None
+        if session_id is not None:
+            key = str(session_id)
+            async with trail_locks.hold([key]), route_builder.rebuilding(key) as before:
+                row = await repo.rebuild_route_path(route_id, before)
+    except Exception as exc:
+        logger.error(f"Error rebuilding route: {exc}", exc_info=exc)
+        await repo.db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        ) from exc
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+    return RouteRead.model_validate(row, from_attributes=True)
@@ -23,22 +23,19 @@ router = APIRouter(prefix='/users')
     response_model=UserCreateResponse,
     status_code=status.HTTP_201_CREATED,
     tags=['user'],
-    summary="Create new user (registration). If user already exists, returns existing user."
+    summary="Create new user (registration). If user already exists, refreshes and returns existing user."
 )
 async def create_user(
     request: UserCreateRequest,
     repo: TimescaleDBRepository = Depends(get_repository)  # noqa B008
 ):
-    """Create new user (registration). If user already exists, returns existing user."""
+    """Create new user (registration). If user already exists, refreshes its profile and returns it."""
     try:
-        existing_user = await repo.get_user(request.user.id)
-        if existing_user is not None:
-            return UserCreateResponse(user=existing_user, created=False)
-        new_user = await repo.create_user(request.user)
-        return UserCreateResponse(user=new_user, created=True)
+        user, created = await repo.upsert_user(request.user)
+        return UserCreateResponse(user=user, created=created)
     except Exception as exc:
         logger.error(f"Error creating user: {exc}", exc_info=exc)
-        repo.db.rollback()
+        await repo.db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
@@ -91,7 +88,7 @@ async def update_user(
         ) from exc
     except Exception as exc:
         logger.error(f"Error updating user: {exc}", exc_info=exc)
-        repo.db.rollback()
+        await repo.db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
@@ -120,7 +117,7 @@ async def delete_user(
         ) from exc
     except Exception as exc:
         logger.error(f"Error deleting user: {exc}", exc_info=exc)
-        repo.db.rollback()
+        await repo.db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
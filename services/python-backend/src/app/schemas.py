@@ -1,11 +1,14 @@
-from datetime import datetime
+from datetime import UTC, datetime
+from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class TelegramUser(BaseModel):
     """Schema for creating a new user (registration)."""
 
+    model_config = ConfigDict(from_attributes=True)  # Built from ORM ``User`` objects in responses
+
     id: int  # Telegram user_id
     username: str | None = None
     first_name: str
@@ -74,6 +77,7 @@ class LocationCreate(BaseModel):
     """Schema for submitting a new location point."""
 
     user_id: int
+    date_time: datetime | None = None  # Time of the fix, server time is used if omitted
     latitude: float
     longitude: float
     accuracy: float
@@ -83,6 +87,14 @@ class LocationCreate(BaseModel):
     raw_data: dict | None = None
     session_id: str | None = None
 
+    @field_validator('date_time')
+    @classmethod
+    def assume_utc(cls, value: datetime | None) -> datetime | None:
+        """Timestamps without a timezone are taken as UTC, tracking state compares them with aware ones"""
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=UTC)
+        return value
+
 
 class LocationRead(BaseModel):
     """Schema for reading a location point."""
@@ -98,3 +110,242 @@ class LocationRead(BaseModel):
     is_waypoint: bool
     session_id: str | None = None
     raw_data: dict | None = None
+
+
+class TrackPointsCreateRequest(BaseModel):
+    """Schema for submitting a batch of location points (possibly of several users)."""
+
+    points: list[LocationCreate]
+    metadata: dict | None = None
+
+
+class TrackPointError(BaseModel):
+    """Schema describing why a point of the batch was rejected."""
+
+    index: int  # Position of the point in the submitted batch
+    reason: str
+
+
+class GeofenceEventRead(BaseModel):
+    """Schema for a geo zone enter/exit event."""
+
+    user_id: int
+    zone_id: int
+    zone_name: str
+    event: str  # enter/exit
+    timestamp: datetime
+    notify: bool
+
+
+class TrackPointsCreateResponse(BaseModel):
+    """Schema for the result of a batch location submission."""
+
+    accepted: int
+    rejected: int
+    dropped: int = 0  # Duplicates and stationary jitter, not stored
+    errors: list[TrackPointError] = []
+    events: list[GeofenceEventRead] = []
+
+
+class SessionSummary(BaseModel):
+    """Schema for reading precomputed session statistics."""
+
+    id: UUID
+    user_id: int
+    start_time: datetime
+    end_time: datetime | None = None
+    total_distance: float  # In meters
+    points_count: int
+    bounds: list[float] | None = None  # [min_lon, min_lat, max_lon, max_lat]
+    transport_type: str | None = None  # Dominant transport mode
+
+
+class TransportSegmentRead(BaseModel):
+    """Schema for reading a part of a session travelled with one transport mode."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    mode: str  # stationary/walking/cycling/driving
+    start_time: datetime
+    end_time: datetime
+    distance: float  # In meters
+    points_count: int
+
+
+class MovementRollup(BaseModel):
+    """Schema for one hourly/daily bucket of a user's movement."""
+
+    bucket: datetime
+    points_count: int
+    distance: float  # In meters
+    bounds: list[float] | None = None  # [min_lon, min_lat, max_lon, max_lat]
+
+
+class MovementRollupsResponse(BaseModel):
+    """Schema for reading movement rollups of a user."""
+
+    user_id: int
+    resolution: str
+    rollups: list[MovementRollup]
+
+
+class MovementReport(BaseModel):
+    """Schema for a movement report of a user over a period."""
+
+    user_id: int
+    start_time: datetime
+    end_time: datetime
+    distance: float  # In meters
+    points_count: int
+    active_days: int
+    bounds: list[float] | None = None  # [min_lon, min_lat, max_lon, max_lat]
+
+
+class TrackStop(BaseModel):
+    """Schema for a stop detected in a track."""
+
+    start_time: datetime
+    end_time: datetime
+    duration: float  # In seconds
+    longitude: float  # Mean position of the stop
+    latitude: float
+
+
+class TrackSegments(BaseModel):
+    """Schema for per-segment metrics, segment i leads from point i to point i + 1."""
+
+    distances: list[float]  # In meters
+    speeds: list[float]  # In m/s
+    bearings: list[float]  # In degrees clockwise from north
+    accelerations: list[float]  # In m/s²
+
+
+class SessionAnalytics(BaseModel):
+    """Schema for analytics computed over all points of a session."""
+
+    session_id: UUID
+    points_count: int
+    total_distance: float  # In meters
+    duration: float  # In seconds
+    moving_time: float  # In seconds, excluding stops
+    average_speed: float  # In m/s, over the moving time
+    max_speed: float  # In m/s
+    stops: list[TrackStop]
+    segments: TrackSegments | None = None
+
+
+class TrackPointRead(BaseModel):
+    """Schema for reading a track point found by a spatial-temporal search."""
+
+    id: int
+    session_id: UUID | None = None
+    timestamp: datetime
+    longitude: float
+    latitude: float
+    accuracy: float
+    elevation: float | None = None
+    is_waypoint: bool
+    note: str | None = None
+
+
+class TrackPointsPage(BaseModel):
+    """Schema for a page of track points ordered by time."""
+
+    points: list[TrackPointRead]
+    next_cursor: str | None = None  # Passed as ``cursor`` to get the next page, None on the last page
+
+
+class SessionPassage(BaseModel):
+    """Schema for a session that passed through an area."""
+
+    session_id: UUID
+    user_id: int
+    start_time: datetime
+    end_time: datetime | None = None
+    transport_type: str | None = None
+    entered_at: datetime  # First point of the session inside the area
+    left_at: datetime  # Last point of the session inside the area
+    points_count: int  # Points inside the area
+
+
+class SessionPassagesPage(BaseModel):
+    """Schema for a page of sessions ordered by the time they entered the area."""
+
+    sessions: list[SessionPassage]
+    next_cursor: str | None = None
+
+
+class PositionsRequest(BaseModel):
+    """Schema for looking up the positions of a user at several moments."""
+
+    timestamps: list[datetime]  # Without a timezone, UTC is assumed
+    max_gap: float = 600.0  # In seconds, points farther in time are not used
+
+
+class PositionEstimate(BaseModel):
+    """Schema for the position of a user at a moment, coordinates are None when it is unknown."""
+
+    timestamp: datetime
+    longitude: float | None = None
+    latitude: float | None = None
+    uncertainty: float | None = None  # In meters, from the accuracy of the points and the time to them
+    method: str | None = None  # exact/interpolated/nearest
+
+
+class PositionsResponse(BaseModel):
+    """Schema for positions of a user, in the order of the requested timestamps."""
+
+    user_id: int
+    positions: list[PositionEstimate]
+
+
+class GeoZoneCreate(BaseModel):
+    """Schema for creating a geo zone: a polygon or a circle (center and radius)."""
+
+    user_id: int
+    name: str
+    zone_type: str = 'custom'  # home/work/favorite/custom
+    coordinates: list[tuple[float, float]] | None = None  # Polygon ring as (lon, lat) pairs
+    center: tuple[float, float] | None = None  # (lon, lat) of a circular zone
+    radius: float | None = Field(None, gt=0)  # In meters, for circular zones
+    notify_on_enter: bool = True
+
+    @field_validator('coordinates')
+    @classmethod
+    def check_ring(cls, value: list[tuple[float, float]] | None) -> list[tuple[float, float]] | None:
+        """A ring like [a, b, a] is long enough but encloses no area"""
+        if value is not None and len(set(value)) < 3:
+            raise ValueError("A polygon needs at least 3 distinct points")
+        return value
+
+
+class GeoZoneRead(BaseModel):
+    """Schema for reading a geo zone."""
+
+    id: int
+    user_id: int
+    name: str
+    zone_type: str
+    notify_on_enter: bool
+    radius: float | None = None
+    coordinates: list[tuple[float, float]]  # Exterior ring as (lon, lat) pairs
+
+
+class RouteCreate(BaseModel):
+    """Schema for saving the route of a session."""
+
+    session_id: UUID
+    name: str
+    tags: dict | None = None  # {'scenic': True, 'public': False}
+
+
+class RouteRead(BaseModel):
+    """Schema for reading a route summary."""
+
+    id: UUID
+    user_id: int
+    session_id: UUID
+    name: str
+    tags: dict | None = None
+    points_count: int
+    simplified_points_count: int
@@ -0,0 +1 @@
+"""Track processing package: in-memory state and algorithms applied to ingested points."""
@@ -0,0 +1,199 @@
+from dataclasses import dataclass
+
+import numpy as np
+from tracking.geo import EARTH_RADIUS
+
+
+@dataclass(slots=True)
+class TrackArrays:
+    """Track points of a session as contiguous columns, ordered by time"""
+
+    timestamps: np.ndarray  # Unix time in seconds
+    lon: np.ndarray
+    lat: np.ndarray
+    accuracy: np.ndarray  # In meters
+    elevation: np.ndarray  # In meters, NaN when unknown
+
+    @classmethod
+    def from_partitions(cls, partitions: list[np.ndarray]) -> "TrackArrays":
+        """Builds the columns from (n, 5) float64 blocks of timestamp, lon, lat, accuracy, elevation"""
+        data = np.concatenate(partitions) if partitions else np.empty((0, 5))
+        return cls(*(np.ascontiguousarray(data[:, i]) for i in range(5)))
+
+    def __len__(self) -> int:
+        """Number of points"""
+        return len(self.timestamps)
+
+
+@dataclass(slots=True)
+class TrackAnalytics:
+    """Per-segment metrics of a track, segment ``i`` leads from point ``i`` to point ``i + 1``"""
+
+    distances: np.ndarray  # In meters
+    durations: np.ndarray  # In seconds
+    speeds: np.ndarray  # In m/s, 0 for segments without a time difference
+    bearings: np.ndarray  # In degrees clockwise from north, [0, 360)
+    accelerations: np.ndarray  # In m/s², change of speed from the previous segment (0 for the first one)
+    stops: np.ndarray  # (k, 2) point indices: first and last point of each stop
+
+
+def haversine_np(lon1: np.ndarray, lat1: np.ndarray, lon2: np.ndarray, lat2: np.ndarray) -> np.ndarray:
+    """Vectorized great-circle distance in meters"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lon2 - lon1)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bearing_np(lon1: np.ndarray, lat1: np.ndarray, lon2: np.ndarray, lat2: np.ndarray) -> np.ndarray:
+    """Vectorized initial bearing in degrees clockwise from north"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    d_lambda = np.radians(lon2 - lon1)
+    y = np.sin(d_lambda) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(d_lambda)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def find_stops(speeds: np.ndarray, durations: np.ndarray, stop_speed: float, min_stop_duration: float) -> np.ndarray:
+    """
+    Runs of consecutive slow segments lasting at least ``min_stop_duration`` seconds.
+
+    Returns
+    -------
+        np.ndarray: (k, 2) array with the first and the last point index of each stop.
+
+    """
+    slow = np.concatenate(([0], (speeds < stop_speed).astype(np.int8), [0]))
+    edges = np.diff(slow)
+    starts = np.flatnonzero(edges == 1)  # First slow segment of each run
+    ends = np.flatnonzero(edges == -1)  # One past the last slow segment
+    elapsed = np.concatenate(([0.0], np.cumsum(durations)))
+    keep = (elapsed[ends] - elapsed[starts]) >= min_stop_duration
+    # Segment run [start, end) covers points start..end
+    return np.column_stack((starts[keep], ends[keep])).astype(np.int64)
+
+
+def analyze_track(track: TrackArrays, stop_speed: float = 0.5, min_stop_duration: float = 120.0) -> TrackAnalytics:
+    """
+    Computes distance, speed, bearing, acceleration and stops of a track without Python loops.
+
+    Args:
+    ----
+        track (TrackArrays): Time-ordered points.
+        stop_speed (float): Segments slower than this (m/s) count as standing still.
+        min_stop_duration (float): Minimal duration of a stop in seconds.
+
+    """
+    lon1, lon2 = track.lon[:-1], track.lon[1:]
+    lat1, lat2 = track.lat[:-1], track.lat[1:]
+    distances = haversine_np(lon1, lat1, lon2, lat2)
+    durations = np.diff(track.timestamps)
+
+    speeds = np.divide(distances, durations, out=np.zeros_like(distances), where=durations > 0)
+    bearings = bearing_np(lon1, lat1, lon2, lat2)
+
+    accelerations = np.zeros_like(speeds)
+    if len(speeds) > 1:
+        # Time between the midpoints of neighbouring segments
+        dt = (durations[:-1] + durations[1:]) / 2
+        np.divide(np.diff(speeds), dt, out=accelerations[1:], where=dt > 0)
+
+    stops = find_stops(speeds, durations, stop_speed, min_stop_duration)
+    return TrackAnalytics(distances, durations, speeds, bearings, accelerations, stops)
+
+
+@dataclass(slots=True)
+class PositionEstimates:
+    """Positions of a track at query times, NaN where no point is close enough in time"""
+
+    lon: np.ndarray
+    lat: np.ndarray
+    uncertainty: np.ndarray  # In meters
+    method: np.ndarray  # 'exact', 'interpolated', 'nearest' or '' when unknown
+
+
+def time_windows(times: np.ndarray, margin: float) -> np.ndarray:
+    """
+    Time windows covering ``margin`` seconds around every query time, overlapping windows merged.
+
+    Returns
+    -------
+        np.ndarray: (k, 2) array with the start and the end of each window, ordered by time.
+
+    """
+    times = np.sort(times)
+    if len(times) == 0:
+        return np.empty((0, 2))
+    breaks = np.flatnonzero(np.diff(times) > 2 * margin)
+    starts = times[np.concatenate(([0], breaks + 1))] - margin
+    ends = times[np.concatenate((breaks, [len(times) - 1]))] + margin
+    return np.column_stack((starts, ends))
+
+
+def interpolate_positions(
+    track: TrackArrays,
+    times: np.ndarray,
+    max_gap: float = 600.0,
+    drift_speed: float = 1.5
+) -> PositionEstimates:
+    """
+    Positions at the query times, interpolated linearly between the neighbouring points.
+
+    A time between two points that are both at most ``max_gap`` seconds away is interpolated,
+    otherwise the nearest point within ``max_gap`` is taken as is. The uncertainty is the
+    accuracy of the neighbours (interpolated) plus ``drift_speed`` (m/s) times the time to the
+    nearest point: the longer the track is unobserved, the farther the user may have deviated.
+
+    Args:
+    ----
+        track (TrackArrays): Time-ordered points.
+        times (np.ndarray): Query times as Unix time in seconds, in any order.
+        max_gap (float): Maximal time in seconds between a query time and a point used for it.
+        drift_speed (float): Assumed speed of unobserved movement in m/s.
+
+    """
+    n = len(track)
+    count = len(times)
+    lon = np.full(count, np.nan)
+    lat = np.full(count, np.nan)
+    uncertainty = np.full(count, np.nan)
+    method = np.full(count, '', dtype=object)
+    if n == 0:
+        return PositionEstimates(lon, lat, uncertainty, method)
+
+    after = np.searchsorted(track.timestamps, times, side='right')  # First point later than the query time
+    before = after - 1
+    prev = np.clip(before, 0, n - 1)
+    next_ = np.clip(after, 0, n - 1)
+    dt_prev = np.where(before >= 0, times - track.timestamps[prev], np.inf)
+    dt_next = np.where(after < n, track.timestamps[next_] - times, np.inf)
+
+    exact = dt_prev == 0
+    between = ~exact & (dt_prev <= max_gap) & (dt_next <= max_gap)
+    nearest = ~exact & ~between & (np.minimum(dt_prev, dt_next) <= max_gap)
+
+    lon[exact] = track.lon[prev[exact]]
+    lat[exact] = track.lat[prev[exact]]
+    uncertainty[exact] = track.accuracy[prev[exact]]
+    method[exact] = 'exact'
+
+    i, j = prev[between], next_[between]
+    fraction = dt_prev[between] / (dt_prev[between] + dt_next[between])
+    d_lon = (track.lon[j] - track.lon[i] + 180.0) % 360.0 - 180.0  # Shortest way across the antimeridian
+    lon[between] = (track.lon[i] + fraction * d_lon + 180.0) % 360.0 - 180.0
+    lat[between] = track.lat[i] + fraction * (track.lat[j] - track.lat[i])
+    uncertainty[between] = (
+        (1 - fraction) * track.accuracy[i] + fraction * track.accuracy[j]
+        + drift_speed * np.minimum(dt_prev[between], dt_next[between])
+    )
+    method[between] = 'interpolated'
+
+    closest = np.where(dt_prev <= dt_next, prev, next_)[nearest]
+    lon[nearest] = track.lon[closest]
+    lat[nearest] = track.lat[closest]
+    uncertainty[nearest] = track.accuracy[closest] + drift_speed * np.minimum(dt_prev, dt_next)[nearest]
+    method[nearest] = 'nearest'
+    return PositionEstimates(lon, lat, uncertainty, method)
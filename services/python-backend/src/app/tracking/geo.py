@@ -0,0 +1,55 @@
+import math
+
+from schemas import LocationCreate
+
+
+EARTH_RADIUS = 6_371_008.8  # Mean Earth radius in meters
+
+BoundingBox = tuple[float, float, float, float]  # (min_lon, min_lat, max_lon, max_lat)
+
+
+def haversine(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    """Great-circle distance between two WGS84 points in meters"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bearing(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    """Initial bearing from the first point to the second in degrees clockwise from north"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_lambda = math.radians(lon2 - lon1)
+    y = math.sin(d_lambda) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(d_lambda)
+    return math.degrees(math.atan2(y, x)) % 360.0
+
+
+def bounding_box(lon: float, lat: float, radius: float) -> BoundingBox:
+    """
+    Bounding box enclosing a circle of ``radius`` meters around a point.
+
+    The box is never smaller than the circle: it spans all longitudes near the poles and when it
+    would cross the antimeridian.
+    """
+    d_lat = math.degrees(radius / EARTH_RADIUS)
+    min_lat = max(-90.0, lat - d_lat)
+    max_lat = min(90.0, lat + d_lat)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat <= 1e-9:
+        return -180.0, min_lat, 180.0, max_lat
+    d_lon = d_lat / cos_lat
+    if lon - d_lon < -180.0 or lon + d_lon > 180.0:
+        return -180.0, min_lat, 180.0, max_lat
+    return lon - d_lon, min_lat, lon + d_lon, max_lat
+
+
+def position(point: LocationCreate) -> tuple[float, float]:
+    """(lon, lat) for derived data: the smoothed coordinate if the point passed ``tracking.kalman``"""
+    smoothed = point.raw_data.get('smoothed') if point.raw_data else None
+    if smoothed is None:
+        return point.longitude, point.latitude
+    return smoothed['longitude'], smoothed['latitude']
@@ -0,0 +1,196 @@
+import math
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import shapely
+from shapely.geometry.base import BaseGeometry
+from sqlalchemy import Row
+
+
+@dataclass(slots=True, frozen=True)
+class GeofenceEvent:
+    """Transition of a user into or out of a geo zone"""
+
+    user_id: int
+    zone_id: int
+    zone_name: str
+    event: str  # enter/exit
+    timestamp: datetime
+    notify: bool
+
+
+@dataclass(slots=True)
+class _Zone:
+    """Geo zone prepared for point-in-polygon tests"""
+
+    id: int
+    name: str
+    notify_on_enter: bool
+    geometry: BaseGeometry
+    bbox: tuple[float, float, float, float]  # min_lon, min_lat, max_lon, max_lat
+    cells: list[tuple[int, int]] = field(default_factory=list)
+
+
+class _UserZoneIndex:
+    """
+    Uniform grid over one user's zones.
+
+    Every zone is registered in the grid cells its bbox covers, so a point only tests the
+    zones of its own cell. Zones spanning too many cells are kept in a separate list and
+    filtered by bbox. Adding or removing a zone touches only that zone's cells.
+    """
+
+    MAX_CELLS_PER_ZONE = 256
+
+    def __init__(self, cell_size: float):
+        """Initialize an empty index"""
+        self.cell_size = cell_size
+        self.zones: dict[int, _Zone] = {}
+        self._cells: dict[tuple[int, int], list[_Zone]] = {}
+        self._large_zones: list[_Zone] = []
+        self.loaded_at = time.monotonic()
+        self.used_at = self.loaded_at
+
+    def _cell(self, lon: float, lat: float) -> tuple[int, int]:
+        return math.floor(lon / self.cell_size), math.floor(lat / self.cell_size)
+
+    def add(self, zone: _Zone):
+        """Registers a zone (replacing a zone with the same id)"""
+        self.remove(zone.id)
+        self.zones[zone.id] = zone
+        min_x, min_y = self._cell(zone.bbox[0], zone.bbox[1])
+        max_x, max_y = self._cell(zone.bbox[2], zone.bbox[3])
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > self.MAX_CELLS_PER_ZONE:
+            self._large_zones.append(zone)
+            return
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                self._cells.setdefault((x, y), []).append(zone)
+                zone.cells.append((x, y))
+
+    def remove(self, zone_id: int) -> bool:
+        """Unregisters a zone, returns False if it was not indexed"""
+        zone = self.zones.pop(zone_id, None)
+        if zone is None:
+            return False
+        if not zone.cells:
+            self._large_zones.remove(zone)
+        for cell in zone.cells:
+            cell_zones = self._cells[cell]
+            cell_zones.remove(zone)
+            if not cell_zones:
+                del self._cells[cell]
+        zone.cells.clear()
+        return True
+
+    def containing(self, lon: float, lat: float) -> list[_Zone]:
+        """Zones that contain the point"""
+        candidates = self._cells.get(self._cell(lon, lat), [])
+        if self._large_zones:
+            candidates = candidates + self._large_zones
+        return [
+            zone for zone in candidates
+            if zone.bbox[0] <= lon <= zone.bbox[2]
+            and zone.bbox[1] <= lat <= zone.bbox[3]
+            and shapely.contains_xy(zone.geometry, lon, lat)
+        ]
+
+
+class GeofenceEngine:
+    """
+    In-memory evaluation of geo zones for every ingested point.
+
+    Zones of a user are loaded once into a per-user grid of prepared polygons, each point is then
+    checked without touching the database. The engine tracks inside/outside state per
+    (user, zone) and emits enter/exit events on transitions. Zone changes made through the API
+    update the index incrementally; indexes are also reloaded after ``max_age`` seconds so
+    changes made by other workers are picked up.
+    """
+
+    def __init__(self, cell_size: float = 0.01, max_age: float = 300.0, idle_ttl: float = 3600.0):
+        """Initialize the engine, ``cell_size`` is in degrees (0.01 is about 1 km)"""
+        self.cell_size = cell_size
+        self.max_age = max_age
+        self.idle_ttl = idle_ttl
+        self._indexes: dict[int, _UserZoneIndex] = {}
+        self._inside: dict[int, set[int]] = {}  # user_id -> ids of zones the user is inside
+
+    def users_to_load(self, user_ids: set[int]) -> set[int]:
+        """Users whose zones are not loaded yet or are too old"""
+        expired_before = time.monotonic() - self.max_age
+        return {
+            user_id for user_id in user_ids
+            if (index := self._indexes.get(user_id)) is None or index.loaded_at < expired_before
+        }
+
+    def load_user(self, user_id: int, zones: list[tuple[int, str, bool, BaseGeometry]]):
+        """Replaces the index of a user with zones given as (id, name, notify_on_enter, geometry)"""
+        index = _UserZoneIndex(self.cell_size)
+        for zone_id, name, notify_on_enter, geometry in zones:
+            index.add(self._prepare(zone_id, name, notify_on_enter, geometry))
+        self._indexes[user_id] = index
+        # Forget state of zones that no longer exist
+        inside = self._inside.get(user_id)
+        if inside:
+            inside.intersection_update(index.zones)
+
+    def load_rows(self, user_ids: set[int], rows: Sequence[Row]):
+        """Loads users from ``get_geo_zones`` rows, users without rows get an empty index"""
+        zones: dict[int, list] = {user_id: [] for user_id in user_ids}
+        for row in rows:
+            zones[row.user_id].append((row.id, row.name, row.notify_on_enter, shapely.from_wkb(row.wkb)))
+        for user_id, user_zones in zones.items():
+            self.load_user(user_id, user_zones)
+
+    def upsert_zone(self, user_id: int, zone_id: int, name: str, notify_on_enter: bool, geometry: BaseGeometry):
+        """Adds or replaces one zone of a loaded user"""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.add(self._prepare(zone_id, name, notify_on_enter, geometry))
+
+    def remove_zone(self, user_id: int, zone_id: int):
+        """Removes one zone and its inside/outside state"""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.remove(zone_id)
+        self._inside.get(user_id, set()).discard(zone_id)
+
+    def evaluate(self, user_id: int, lon: float, lat: float, timestamp: datetime) -> list[GeofenceEvent]:
+        """Checks one point of a loaded user and returns enter/exit transitions"""
+        index = self._indexes.get(user_id)
+        if index is None:
+            return []
+        index.used_at = time.monotonic()
+        zones = index.containing(lon, lat)
+        previous = self._inside.get(user_id, set())
+        if not zones and not previous:
+            return []
+
+        current = {zone.id for zone in zones}
+        events = [
+            GeofenceEvent(user_id, zone.id, zone.name, 'enter', timestamp, zone.notify_on_enter)
+            for zone in zones if zone.id not in previous
+        ]
+        for zone_id in previous - current:
+            zone = index.zones.get(zone_id)
+            if zone is not None:
+                events.append(GeofenceEvent(user_id, zone_id, zone.name, 'exit', timestamp, zone.notify_on_enter))
+        self._inside[user_id] = current
+        return events
+
+    def evict_idle(self):
+        """Drops indexes and state of users without points for ``idle_ttl`` seconds"""
+        expired_before = time.monotonic() - self.idle_ttl
+        for user_id in [user_id for user_id, index in self._indexes.items() if index.used_at < expired_before]:
+            del self._indexes[user_id]
+            self._inside.pop(user_id, None)
+
+    @staticmethod
+    def _prepare(zone_id: int, name: str, notify_on_enter: bool, geometry: BaseGeometry) -> _Zone:
+        shapely.prepare(geometry)
+        return _Zone(zone_id, name, notify_on_enter, geometry, geometry.bounds)
+
+
+geofence_engine = GeofenceEngine()
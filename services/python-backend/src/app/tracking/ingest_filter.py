@@ -0,0 +1,95 @@
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from schemas import LocationCreate
+from tracking.geo import haversine
+
+
+INGEST_MIN_DISTANCE = float(os.getenv('INGEST_MIN_DISTANCE', 5))  # In meters, used when accuracy is unknown
+INGEST_MAX_RADIUS = float(os.getenv('INGEST_MAX_RADIUS', 50))  # In meters, caps the accuracy radius
+INGEST_MIN_INTERVAL = float(os.getenv('INGEST_MIN_INTERVAL', 60))  # In seconds, 0 disables the filter
+
+
+@dataclass(slots=True)
+class FilterBatch:
+    """Result of filtering a batch of points, applied to the filter once the kept points are stored"""
+
+    kept: list[LocationCreate]
+    dropped: int = 0
+    duplicates: int = 0  # Part of ``dropped``: same position and time as an already kept point
+    last_kept: dict[str, tuple[float, float, datetime]] = field(default_factory=dict)
+
+
+class IngestFilter:
+    """
+    Suppression of jitter and duplicates of stationary users.
+
+    Telegram live location resends an unchanged position every few seconds. A point is dropped when
+    it lies within the accuracy radius (at least ``min_distance``, at most ``max_radius``) of the
+    last kept point of its trail and less than ``min_interval`` seconds after it, so an idle user
+    still leaves one point per interval. Exact duplicates are always dropped; waypoints and late
+    (out of order) points are always kept.
+    """
+
+    def __init__(self, min_distance: float, max_radius: float, min_interval: float, idle_ttl: float = 3600.0):
+        """Initialize the filter"""
+        self.min_distance = min_distance
+        self.max_radius = max_radius
+        self.min_interval = min_interval
+        self.idle_ttl = idle_ttl
+        self._last_kept: dict[str, tuple[float, float, datetime]] = {}
+        self._touched_at: dict[str, float] = {}
+        # Counters since start
+        self.received = 0
+        self.dropped = 0
+        self.duplicates = 0
+
+    def select(self, points: list[LocationCreate]) -> FilterBatch:
+        """
+        Splits a time-ordered batch into kept and dropped points.
+
+        The filter itself is not modified, see ``apply``: if storing the batch fails, resent points
+        must not be dropped as duplicates of points that were never written.
+        """
+        batch = FilterBatch(kept=[])
+        for point in points:
+            key = point.session_id or f'user:{point.user_id}'
+            last = batch.last_kept.get(key) or self._last_kept.get(key)
+            if last is not None and not point.is_waypoint and point.date_time >= last[2]:
+                lon, lat, last_time = last
+                if point.date_time == last_time and point.longitude == lon and point.latitude == lat:
+                    batch.dropped += 1
+                    batch.duplicates += 1
+                    continue
+                if (point.date_time - last_time).total_seconds() < self.min_interval:
+                    # Accuracy 0 means the device did not report it
+                    radius = min(max(point.accuracy, self.min_distance), self.max_radius)
+                    if haversine(lon, lat, point.longitude, point.latitude) <= radius:
+                        batch.dropped += 1
+                        continue
+            if last is None or point.date_time >= last[2]:
+                batch.last_kept[key] = (point.longitude, point.latitude, point.date_time)
+            batch.kept.append(point)
+        return batch
+
+    def apply(self, batch: FilterBatch):
+        """Accounts a filtered batch after its kept points have been stored"""
+        now = time.monotonic()
+        self._last_kept.update(batch.last_kept)
+        for key in batch.last_kept:
+            self._touched_at[key] = now
+        self.received += len(batch.kept) + batch.dropped
+        self.dropped += batch.dropped
+        self.duplicates += batch.duplicates
+
+    def evict_idle(self):
+        """Forgets trails without points for ``idle_ttl`` seconds"""
+        expired_before = time.monotonic() - self.idle_ttl
+        for key in [key for key, touched_at in self._touched_at.items() if touched_at < expired_before]:
+            del self._touched_at[key]
+            del self._last_kept[key]
+
+
+ingest_filter = IngestFilter(INGEST_MIN_DISTANCE, INGEST_MAX_RADIUS, INGEST_MIN_INTERVAL)
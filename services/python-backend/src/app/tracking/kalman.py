@@ -0,0 +1,189 @@
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from schemas import LocationCreate
+from tracking.geo import EARTH_RADIUS, haversine
+
+
+@dataclass(slots=True)
+class _AxisState:
+    """Position offset and velocity along one axis (east or north) with their covariance"""
+
+    velocity: float = 0.0  # In m/s
+    p_xx: float = 0.0  # Position variance, m²
+    p_xv: float = 0.0
+    p_vv: float = 0.0  # Velocity variance, (m/s)²
+
+    def step(self, offset: float, dt: float, measurement_var: float, process_noise: float) -> float:
+        """
+        Predicts ``dt`` seconds ahead from position 0 and corrects with a measured ``offset``.
+
+        Returns
+        -------
+            float: Filtered position offset in meters.
+
+        """
+        # Predict: constant velocity, white-noise acceleration
+        position = self.velocity * dt
+        p_xx = self.p_xx + 2 * dt * self.p_xv + dt * dt * self.p_vv + process_noise * dt ** 3 / 3
+        p_xv = self.p_xv + dt * self.p_vv + process_noise * dt * dt / 2
+        p_vv = self.p_vv + process_noise * dt
+        # Update
+        innovation = offset - position
+        s = p_xx + measurement_var
+        k_x = p_xx / s
+        k_v = p_xv / s
+        position += k_x * innovation
+        self.velocity += k_v * innovation
+        self.p_xx = (1 - k_x) * p_xx
+        self.p_xv = (1 - k_x) * p_xv
+        self.p_vv = p_vv - k_v * p_xv
+        return position
+
+
+@dataclass(slots=True)
+class _TrailState:
+    """Filter state of one trail, a fixed handful of floats"""
+
+    lon: float  # Filtered position
+    lat: float
+    time: datetime
+    east: _AxisState
+    north: _AxisState
+    rejected_in_row: int = 0
+
+    def copy(self) -> "_TrailState":
+        """Independent copy, batches must not modify the stored state"""
+        return _TrailState(
+            self.lon, self.lat, self.time,
+            _AxisState(self.east.velocity, self.east.p_xx, self.east.p_xv, self.east.p_vv),
+            _AxisState(self.north.velocity, self.north.p_xx, self.north.p_xv, self.north.p_vv),
+            self.rejected_in_row
+        )
+
+
+@dataclass(slots=True)
+class KalmanBatch:
+    """Result of smoothing a batch of points, applied to the filter once the points are stored"""
+
+    kept: list[LocationCreate]
+    outliers: list[tuple[LocationCreate, float]] = field(default_factory=list)  # (point, implied speed in m/s)
+    states: dict[str, _TrailState] = field(default_factory=dict)
+
+
+class KalmanSmoother:
+    """
+    Accuracy-weighted smoothing and outlier rejection of incoming points.
+
+    Every trail (session, or user for points outside of sessions) has a constant-velocity Kalman
+    filter, run independently on the east and north axes around the last filtered position.
+    The measurement variance is the reported accuracy squared, so imprecise fixes move the estimate
+    less. A point that would require moving faster than ``max_speed`` from the filtered position
+    (after subtracting its accuracy) is rejected; after ``reset_after`` rejections in a row the
+    filter restarts from the new position, since the track really jumped (e.g. after a flight).
+
+    The smoothed coordinate is stored in ``raw_data['smoothed']`` next to the raw one, and derived
+    data (statistics, routes, transport modes, geofences) is computed from it, see ``tracking.geo.position``.
+    """
+
+    def __init__(
+        self,
+        process_noise: float = 0.5,
+        default_accuracy: float = 20.0,
+        max_speed: float = 70.0,
+        reset_after: int = 3,
+        idle_ttl: float = 3600.0
+    ):
+        """Initialize the smoother, ``process_noise`` is the acceleration spectral density in m²/s³"""
+        self.process_noise = process_noise
+        self.default_accuracy = default_accuracy  # In meters, for points reported with accuracy 0
+        self.max_speed = max_speed  # In m/s, 70 is about 250 km/h
+        self.reset_after = reset_after
+        self.idle_ttl = idle_ttl
+        self._states: dict[str, _TrailState] = {}
+        self._touched_at: dict[str, float] = {}
+
+    def measure(self, points: list[LocationCreate]) -> KalmanBatch:
+        """
+        Smooths a time-ordered batch and separates outliers.
+
+        Smoothed coordinates are written to the points' ``raw_data``; the filter state is only
+        updated by ``apply``.
+        """
+        batch = KalmanBatch(kept=[])
+        for point in points:
+            key = point.session_id or f'user:{point.user_id}'
+            state = batch.states.get(key)
+            if state is None and (stored := self._states.get(key)) is not None:
+                state = batch.states[key] = stored.copy()
+            accuracy = point.accuracy if point.accuracy > 0 else self.default_accuracy
+
+            if state is None:
+                batch.states[key] = self._initial_state(point, accuracy)
+                self._set_smoothed(point, point.longitude, point.latitude)
+            elif point.date_time < state.time:
+                # Late points are stored as is and do not move the filter
+                self._set_smoothed(point, point.longitude, point.latitude)
+            else:
+                dt = (point.date_time - state.time).total_seconds()
+                jump = haversine(state.lon, state.lat, point.longitude, point.latitude) - accuracy
+                speed = jump / max(dt, 1.0)
+                if speed > self.max_speed and not point.is_waypoint:
+                    state.rejected_in_row += 1
+                    if state.rejected_in_row < self.reset_after:
+                        batch.outliers.append((point, speed))
+                        continue
+                    batch.states[key] = self._initial_state(point, accuracy)
+                    self._set_smoothed(point, point.longitude, point.latitude)
+                else:
+                    self._smooth(state, point, dt, accuracy)
+            batch.kept.append(point)
+        return batch
+
+    def apply(self, batch: KalmanBatch):
+        """Stores filter states of a batch after its points have been stored"""
+        now = time.monotonic()
+        self._states.update(batch.states)
+        for key in batch.states:
+            self._touched_at[key] = now
+
+    def evict_idle(self):
+        """Forgets trails without points for ``idle_ttl`` seconds"""
+        expired_before = time.monotonic() - self.idle_ttl
+        for key in [key for key, touched_at in self._touched_at.items() if touched_at < expired_before]:
+            del self._touched_at[key]
+            del self._states[key]
+
+    def _smooth(self, state: _TrailState, point: LocationCreate, dt: float, accuracy: float):
+        # Local tangent plane around the last filtered position
+        meters_per_rad_lon = EARTH_RADIUS * math.cos(math.radians(state.lat))
+        east = math.radians(point.longitude - state.lon) * meters_per_rad_lon
+        north = math.radians(point.latitude - state.lat) * EARTH_RADIUS
+        variance = accuracy * accuracy
+        east = state.east.step(east, dt, variance, self.process_noise)
+        north = state.north.step(north, dt, variance, self.process_noise)
+        if meters_per_rad_lon > 0:
+            state.lon += math.degrees(east / meters_per_rad_lon)
+        state.lat += math.degrees(north / EARTH_RADIUS)
+        state.time = point.date_time
+        state.rejected_in_row = 0
+        self._set_smoothed(point, state.lon, state.lat)
+
+    @staticmethod
+    def _initial_state(point: LocationCreate, accuracy: float) -> _TrailState:
+        variance = accuracy * accuracy
+        velocity_variance = 100.0  # Unknown speed, (10 m/s)²
+        return _TrailState(
+            point.longitude, point.latitude, point.date_time,
+            _AxisState(p_xx=variance, p_vv=velocity_variance),
+            _AxisState(p_xx=variance, p_vv=velocity_variance)
+        )
+
+    @staticmethod
+    def _set_smoothed(point: LocationCreate, lon: float, lat: float):
+        point.raw_data = {**(point.raw_data or {}), 'smoothed': {'longitude': lon, 'latitude': lat}}
+
+
+kalman_smoother = KalmanSmoother()
@@ -0,0 +1,39 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from tracking.geofence import geofence_engine
+from tracking.ingest_filter import ingest_filter
+from tracking.kalman import kalman_smoother
+from tracking.route_builder import flush_routes, route_builder
+from tracking.session_stats import flush_session_stats, session_stats
+from tracking.transport_mode import flush_transport_segments, transport_classifier
+
+
+async def run_maintenance(session_factory: async_sessionmaker, interval: float, stop: asyncio.Event):
+    """
+    Background task for the in-memory tracking state.
+
+    Every ``interval`` seconds flushes pending session statistics, route appends and transport
+    segments and evicts state of idle users and sessions, which keeps memory bounded in a
+    long-running worker. Returns once ``stop`` is set; the task is not cancelled, so a flush in
+    progress completes instead of losing the deltas it has drained.
+    """
+    while True:
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+            return
+        except TimeoutError:
+            pass
+        await flush_session_stats(session_stats, session_factory)
+        await flush_routes(route_builder, session_factory)
+        await flush_transport_segments(transport_classifier, session_factory)
+        geofence_engine.evict_idle()
+        ingest_filter.evict_idle()
+        kalman_smoother.evict_idle()
+
+
+async def shutdown_maintenance(session_factory: async_sessionmaker):
+    """Final flush of the in-memory state on shutdown"""
+    await flush_session_stats(session_stats, session_factory)
+    await flush_routes(route_builder, session_factory)
+    await flush_transport_segments(transport_classifier, session_factory)
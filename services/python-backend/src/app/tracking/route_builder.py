@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import math
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from schemas import LocationCreate
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from tracking.geo import position
+
+
+logger = logging.getLogger(f"uvicorn.{__file__}")
+
+Coordinate = tuple[float, float]  # (lon, lat)
+
+
+def _segment_distance(point: Coordinate, start: Coordinate, end: Coordinate) -> float:
+    """Planar distance from a point to a segment, in degrees like ST_Simplify"""
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(point[0] - start[0], point[1] - start[1])
+    t = max(0.0, min(1.0, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / length_sq))
+    return math.hypot(point[0] - start[0] - t * dx, point[1] - start[1] - t * dy)
+
+
+class StreamingSimplifier:
+    """
+    Opening-window line simplification of a stream of points.
+
+    Points since the last emitted vertex (the anchor) are kept in a window. When a new point makes
+    any window point deviate from the anchor->point segment by more than ``tolerance``, the previous
+    point becomes a vertex of the simplified line. The window is capped at ``max_window`` points,
+    so the work per point is bounded no matter how long the track is.
+    """
+
+    __slots__ = ('anchor', 'max_window', 'tolerance', 'window')
+
+    def __init__(self, tolerance: float, max_window: int):
+        """Initialize the simplifier"""
+        self.tolerance = tolerance
+        self.max_window = max_window
+        self.anchor: Coordinate | None = None
+        self.window: list[Coordinate] = []
+
+    def add(self, point: Coordinate) -> Coordinate | None:
+        """Adds a point, returns a newly emitted vertex of the simplified line if any"""
+        if self.anchor is None:
+            # Fresh state: the point continues the already stored simplified line
+            self.anchor = point
+            return None
+        for window_point in self.window:
+            if _segment_distance(window_point, self.anchor, point) > self.tolerance:
+                return self._emit(point)
+        self.window.append(point)
+        if len(self.window) >= self.max_window:
+            vertex = self.window[-1]
+            self.anchor = vertex
+            self.window = []
+            return vertex
+        return None
+
+    def _emit(self, point: Coordinate) -> Coordinate:
+        vertex = self.window[-1]
+        self.anchor = vertex
+        self.window = [point]
+        return vertex
+
+
+@dataclass(slots=True)
+class RouteAppend:
+    """Points to append to the routes of one session since the last flush"""
+
+    points: list[Coordinate] = field(default_factory=list)  # Appended to ``path``
+    vertices: list[Coordinate] = field(default_factory=list)  # Appended to ``simplified_path``
+    since: datetime | None = None  # Time of the first point in ``points``
+
+
+class RouteBuilder:
+    """
+    Incremental construction of ``Route.path`` and ``Route.simplified_path``.
+
+    New points of a session are appended to the stored lines of its routes in batches instead of
+    rebuilding them from all track points. ``simplified_path`` holds the vertices emitted by a
+    streaming simplifier; the current end of the route is the last point of ``path``.
+    A full rebuild is only done explicitly, see ``TimescaleDBRepository.rebuild_route_path``;
+    it must run inside ``rebuilding`` so that it does not duplicate the pending points.
+    """
+
+    def __init__(self, tolerance: float = 0.0001, max_window: int = 64, idle_ttl: float = 3600.0):
+        """Initialize the builder, ``tolerance`` is in degrees as in the former ST_Simplify call"""
+        self.tolerance = tolerance
+        self.max_window = max_window
+        self.idle_ttl = idle_ttl
+        self._simplifiers: dict[str, StreamingSimplifier] = {}
+        self._last_times: dict[str, datetime] = {}
+        self._touched_at: dict[str, float] = {}
+        self._pending: dict[str, RouteAppend] = {}
+        self._flush_lock = asyncio.Lock()
+
+    def observe(self, points: list[LocationCreate]):
+        """Accounts stored, time-ordered points; late points are not appended to the lines"""
+        now = time.monotonic()
+        for point in points:
+            key = point.session_id
+            if key is None:
+                continue
+            last_time = self._last_times.get(key)
+            if last_time is not None and point.date_time < last_time:
+                continue
+            self._last_times[key] = point.date_time
+            self._touched_at[key] = now
+
+            simplifier = self._simplifiers.get(key)
+            if simplifier is None:
+                simplifier = self._simplifiers[key] = StreamingSimplifier(self.tolerance, self.max_window)
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = RouteAppend(since=point.date_time)
+            coordinate = position(point)
+            pending.points.append(coordinate)
+            vertex = simplifier.add(coordinate)
+            if vertex is not None:
+                pending.vertices.append(vertex)
+
+    def drain(self) -> dict[str, RouteAppend]:
+        """Takes all pending appends and forgets sessions idle for longer than ``idle_ttl``"""
+        pending, self._pending = self._pending, {}
+        expired_before = time.monotonic() - self.idle_ttl
+        for key in [key for key, touched_at in self._touched_at.items() if touched_at < expired_before]:
+            del self._touched_at[key]
+            self._last_times.pop(key, None)
+            self._simplifiers.pop(key, None)
+        return pending
+
+    def restore(self, pending: dict[str, RouteAppend]):
+        """Returns appends of a failed flush back, in front of the newer ones"""
+        for key, append in pending.items():
+            current = self._pending.get(key)
+            if current is not None:
+                # ``since`` of the restored append is the earlier one
+                append.points.extend(current.points)
+                append.vertices.extend(current.vertices)
+            self._pending[key] = append
+
+
+    @asynccontextmanager
+    async def rebuilding(self, session_id: str) -> AsyncIterator[datetime | None]:
+        """
+        Context of a full rebuild of the routes of a session, waits for a flush in progress.
+
+        Yields the time of the first pending point of the session: the rebuild must take only
+        the points before it, the later ones are appended by the next flush. No flush runs until
+        the context is left, so the bound stays valid for the whole rebuild.
+        """
+        async with self._flush_lock:
+            pending = self._pending.get(session_id)
+            yield pending.since if pending is not None else None
+
+    @asynccontextmanager
+    async def flushing(self) -> AsyncIterator[dict[str, RouteAppend]]:
+        """Drains the pending appends for a flush that does not overlap with a rebuild"""
+        async with self._flush_lock:
+            yield self.drain()
+
+
+async def flush_routes(builder: RouteBuilder, session_factory: async_sessionmaker):
+    """Appends pending points to the stored routes in one batched UPDATE"""
+    async with builder.flushing() as pending:
+        if not pending:
+            return
+        # Imported here: the repository module imports RouteAppend from this module
+        from db.timescaledb_repository import TimescaleDBRepository
+
+        try:
+            async with session_factory() as db:
+                await TimescaleDBRepository(db).append_route_points(pending)
+        except Exception as exc:
+            logger.error(f"Error appending points to routes of {len(pending)} sessions: {exc}", exc_info=exc)
+            builder.restore(pending)
+
+
+route_builder = RouteBuilder()
@@ -0,0 +1,147 @@
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from schemas import LocationCreate
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from tracking.geo import haversine, position
+
+
+logger = logging.getLogger(f"uvicorn.{__file__}")
+
+
+@dataclass(slots=True)
+class SessionStats:
+    """Statistics of one session accumulated since the last flush"""
+
+    distance: float = 0.0  # In meters
+    points_count: int = 0
+    min_lon: float = math.inf
+    min_lat: float = math.inf
+    max_lon: float = -math.inf
+    max_lat: float = -math.inf
+
+    def add_point(self, lon: float, lat: float, distance: float):
+        """Accounts one point and the segment leading to it"""
+        self.distance += distance
+        self.points_count += 1
+        self.min_lon = min(self.min_lon, lon)
+        self.min_lat = min(self.min_lat, lat)
+        self.max_lon = max(self.max_lon, lon)
+        self.max_lat = max(self.max_lat, lat)
+
+    def merge(self, other: "SessionStats"):
+        """Adds statistics of another batch"""
+        self.distance += other.distance
+        self.points_count += other.points_count
+        self.min_lon = min(self.min_lon, other.min_lon)
+        self.min_lat = min(self.min_lat, other.min_lat)
+        self.max_lon = max(self.max_lon, other.max_lon)
+        self.max_lat = max(self.max_lat, other.max_lat)
+
+
+@dataclass(slots=True)
+class StatsBatch:
+    """Result of measuring a batch of points, applied to the tracker once the points are stored"""
+
+    distances: list[float]  # Segment length leading to each point of the batch
+    stats: dict[str, SessionStats] = field(default_factory=dict)
+    last_points: dict[str, tuple[float, float, datetime]] = field(default_factory=dict)
+
+
+class SessionStatsTracker:
+    """
+    Incremental maintenance of ``Session.total_distance``, ``points_count`` and ``bounds``.
+
+    Also provides the per-point ``TrackPoint.segment_distance`` used by the movement rollups.
+
+    For every active session only the last point and the deltas since the last flush are held
+    in memory. Deltas are flushed in batches as ``total = total + delta`` updates, so the hypertable
+    is never rescanned and several workers can flush the same session safely.
+    The last point is not persisted: after a restart the first segment of a session is not counted.
+    """
+
+    def __init__(self, idle_ttl: float = 3600.0):
+        """Initialize the tracker"""
+        self.idle_ttl = idle_ttl  # Seconds after which the last point of an idle session is forgotten
+        self._last_points: dict[str, tuple[float, float, datetime]] = {}
+        self._touched_at: dict[str, float] = {}
+        self._pending: dict[str, SessionStats] = {}
+
+    def measure(self, points: list[LocationCreate]) -> StatsBatch:
+        """
+        Computes segment distances and per-session deltas of a time-ordered batch.
+
+        The tracker itself is not modified, see ``apply``.
+        """
+        batch = StatsBatch(distances=[])
+        for point in points:
+            # Points outside of a session still form a per-user trail for segment distances
+            key = point.session_id or f'user:{point.user_id}'
+            previous = batch.last_points.get(key) or self._last_points.get(key)
+            lon, lat = position(point)
+            distance = 0.0
+            if previous is None or point.date_time >= previous[2]:
+                if previous is not None:
+                    distance = haversine(previous[0], previous[1], lon, lat)
+                batch.last_points[key] = (lon, lat, point.date_time)
+            batch.distances.append(distance)
+            if point.session_id is not None:
+                # Late (out of order) points extend the bounds but not the distance
+                batch.stats.setdefault(key, SessionStats()).add_point(lon, lat, distance)
+        return batch
+
+    def apply(self, batch: StatsBatch):
+        """Accounts a measured batch after its points have been stored"""
+        now = time.monotonic()
+        self._last_points.update(batch.last_points)
+        for key in batch.last_points:
+            self._touched_at[key] = now
+        for key, stats in batch.stats.items():
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = stats
+            else:
+                pending.merge(stats)
+
+    def pending(self, session_id: str) -> SessionStats | None:
+        """Deltas of a session that are not flushed yet"""
+        return self._pending.get(session_id)
+
+    def drain(self) -> dict[str, SessionStats]:
+        """Takes all pending deltas and forgets sessions idle for longer than ``idle_ttl``"""
+        pending, self._pending = self._pending, {}
+        expired_before = time.monotonic() - self.idle_ttl
+        for key in [key for key, touched_at in self._touched_at.items() if touched_at < expired_before]:
+            del self._touched_at[key]
+            self._last_points.pop(key, None)
+        return pending
+
+    def restore(self, pending: dict[str, SessionStats]):
+        """Returns deltas of a failed flush back to the tracker"""
+        for key, stats in pending.items():
+            current = self._pending.get(key)
+            if current is not None:
+                stats.merge(current)
+            self._pending[key] = stats
+
+
+async def flush_session_stats(tracker: SessionStatsTracker, session_factory: async_sessionmaker):
+    """Writes pending session statistics in one batched UPDATE"""
+    pending = tracker.drain()
+    if not pending:
+        return
+    # Imported here: the repository module imports SessionStats from this module
+    from db.timescaledb_repository import TimescaleDBRepository
+
+    try:
+        async with session_factory() as db:
+            await TimescaleDBRepository(db).apply_session_stats(pending)
+    except Exception as exc:
+        logger.error(f"Error flushing statistics of {len(pending)} sessions: {exc}", exc_info=exc)
+        tracker.restore(pending)
+
+
+session_stats = SessionStatsTracker()
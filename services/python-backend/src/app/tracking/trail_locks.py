@@ -0,0 +1,49 @@
+import asyncio
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+
+
+class TrailLocks:
+    """
+    Serializes ingest of batches sharing a trail.
+
+    In-memory tracking state (Kalman filters, ingest filter, session statistics) is measured before
+    a batch is stored and applied after it. Two batches of one trail must not interleave between
+    the two, or both measure against the same prior state and the later apply overwrites the other.
+    Route rebuilds hold the lock of their session too, see ``RouteBuilder.rebuilding``.
+    A lock exists only while a batch holds or waits for it, so memory is bounded by running requests.
+    """
+
+    def __init__(self):
+        """Initialize without locks"""
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._users: dict[str, int] = {}  # Batches holding or waiting for each lock
+
+    @asynccontextmanager
+    async def hold(self, keys: Iterable[str]) -> AsyncIterator[None]:
+        """Holds the locks of all trails of a batch, taken in one global order so batches cannot deadlock"""
+        counted = []
+        held = []
+        try:
+            for key in sorted(set(keys)):
+                lock = self._locks.setdefault(key, asyncio.Lock())
+                self._users[key] = self._users.get(key, 0) + 1
+                counted.append(key)
+                await lock.acquire()
+                held.append(lock)
+            yield
+        finally:
+            for lock in held:
+                lock.release()
+            for key in counted:
+                self._users[key] -= 1
+                if not self._users[key]:
+                    del self._users[key]
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        """Number of trails locked or waited for"""
+        return len(self._locks)
+
+
+trail_locks = TrailLocks()
@@ -0,0 +1,249 @@
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+
+from schemas import LocationCreate
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from tracking.geo import bearing, haversine, position
+
+
+logger = logging.getLogger(f"uvicorn.{__file__}")
+
+TRANSPORT_MODES = ('stationary', 'walking', 'cycling', 'driving')
+
+
+@dataclass(slots=True)
+class TransportSegmentState:
+    """Part of a trail travelled with one transport mode, persisted as ``TransportSegment``"""
+
+    id: uuid.UUID
+    user_id: int
+    session_id: str | None
+    mode: str
+    start_time: datetime
+    end_time: datetime
+    distance: float = 0.0  # In meters
+    points_count: int = 0
+
+
+class _TrailWindow:
+    """
+    Features of the last points of one trail.
+
+    Samples leave the window by age or count; the sums are updated on append and on expiry and
+    the peak speed is kept by a monotonic deque, so every point costs O(1) amortized.
+    """
+
+    __slots__ = (
+        'accel_sum', 'candidate', 'candidate_count', 'last_bearing', 'last_point', 'last_speed', 'mode',
+        'peaks', 'samples', 'segment', 'seq', 'speed_sum', 'turn_sum', 'unassigned', 'user_id',
+    )
+
+    def __init__(self, user_id: int, first_point: tuple[float, float, datetime]):
+        """Initialize an empty window"""
+        self.user_id = user_id
+        self.last_point = first_point
+        self.last_speed: float | None = None
+        self.last_bearing: float | None = None
+        self.samples: deque[tuple[int, float, float, float, float]] = deque()  # seq, time, speed, accel, turn
+        self.peaks: deque[tuple[int, float]] = deque()  # (seq, speed), speeds decreasing
+        self.seq = 0
+        self.speed_sum = 0.0
+        self.accel_sum = 0.0
+        self.turn_sum = 0.0
+        self.mode: str | None = None
+        self.candidate: str | None = None
+        self.candidate_count = 0
+        self.segment: TransportSegmentState | None = None
+        # Points seen before the first classification: (start_time, distance, points_count)
+        self.unassigned: tuple[datetime, float, int] = (first_point[2], 0.0, 1)
+
+    def push(self, speed: float, accel: float, turn_rate: float, timestamp: datetime, window: float, size: int):
+        """Adds a sample and expires the ones older than ``window`` seconds or beyond ``size``"""
+        self.seq += 1
+        self.samples.append((self.seq, timestamp.timestamp(), speed, accel, turn_rate))
+        self.speed_sum += speed
+        self.accel_sum += accel
+        self.turn_sum += turn_rate
+        while self.peaks and self.peaks[-1][1] <= speed:
+            self.peaks.pop()
+        self.peaks.append((self.seq, speed))
+
+        oldest_allowed = self.samples[-1][1] - window
+        while len(self.samples) > size or self.samples[0][1] < oldest_allowed:
+            _, _, old_speed, old_accel, old_turn = self.samples.popleft()
+            self.speed_sum -= old_speed
+            self.accel_sum -= old_accel
+            self.turn_sum -= old_turn
+        first_seq = self.samples[0][0]
+        while self.peaks[0][0] < first_seq:
+            self.peaks.popleft()
+
+    def features(self) -> tuple[float, float, float, float]:
+        """Mean speed, peak speed, mean |acceleration| and mean turn rate of the window"""
+        count = len(self.samples)
+        return (
+            max(self.speed_sum / count, 0.0),
+            self.peaks[0][1],
+            max(self.accel_sum / count, 0.0),
+            max(self.turn_sum / count, 0.0),
+        )
+
+
+class TransportModeClassifier:
+    """
+    Streaming detection of the transport mode of every trail.
+
+    Each point adds speed, acceleration and heading-change samples to a sliding window of its trail
+    (session, or user for points outside of sessions) which is classified by speed bands; the mode
+    switches only after ``switch_after`` consecutive points agree, so single noisy windows do not
+    split the track. Consecutive points of one mode form a segment. Segments changed since the last
+    flush are upserted to ``transport_segments``, the dominant mode by distance becomes
+    ``Session.transport_type``.
+    """
+
+    # Speed bands in m/s
+    STATIONARY_SPEED = 0.4
+    WALKING_SPEED = 2.0
+    WALKING_PEAK = 3.5
+    CYCLING_SPEED = 7.0
+    CYCLING_PEAK = 11.0
+    CYCLING_ACCELERATION = 1.0  # Mean |acceleration| in m/s² above which a slow trail is motorized (stop and go)
+    WALKING_TURN_RATE = 15.0  # Mean heading change in deg/s, pedestrians meander
+    MIN_TURN_DISTANCE = 3.0  # Shorter moves are GPS jitter, their heading is meaningless
+
+    def __init__(
+        self,
+        window: float = 120.0,
+        window_size: int = 64,
+        min_samples: int = 3,
+        switch_after: int = 3,
+        idle_ttl: float = 3600.0
+    ):
+        """Initialize the classifier, ``window`` is in seconds"""
+        self.window = window
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self.switch_after = switch_after
+        self.idle_ttl = idle_ttl
+        self._trails: dict[str, _TrailWindow] = {}
+        self._touched_at: dict[str, float] = {}
+        self._dirty: dict[uuid.UUID, TransportSegmentState] = {}
+
+    def classify(self, mean_speed: float, peak_speed: float, mean_accel: float, turn_rate: float) -> str:
+        """Transport mode of a window"""
+        if mean_speed < self.STATIONARY_SPEED:
+            return 'stationary'
+        if mean_speed < self.WALKING_SPEED and (peak_speed < self.WALKING_PEAK or turn_rate > self.WALKING_TURN_RATE):
+            return 'walking'
+        if mean_speed < self.CYCLING_SPEED and peak_speed < self.CYCLING_PEAK and mean_accel < self.CYCLING_ACCELERATION:
+            return 'cycling'
+        return 'driving'
+
+    def observe(self, points: list[LocationCreate]):
+        """Accounts stored, time-ordered points; late points are ignored"""
+        now = time.monotonic()
+        for point in points:
+            key = point.session_id or f'user:{point.user_id}'
+            self._touched_at[key] = now
+            trail = self._trails.get(key)
+            if trail is None:
+                self._trails[key] = _TrailWindow(point.user_id, (*position(point), point.date_time))
+                continue
+            self._add_point(trail, point)
+
+    def _add_point(self, trail: _TrailWindow, point: LocationCreate):
+        lon, lat, last_time = trail.last_point
+        dt = (point.date_time - last_time).total_seconds()
+        if dt < 0:
+            return
+        new_lon, new_lat = position(point)
+        distance = haversine(lon, lat, new_lon, new_lat)
+        trail.last_point = (new_lon, new_lat, point.date_time)
+        if dt > 0:
+            speed = distance / dt
+            accel = abs(speed - trail.last_speed) / dt if trail.last_speed is not None else 0.0
+            turn_rate = 0.0
+            if distance >= self.MIN_TURN_DISTANCE:
+                heading = bearing(lon, lat, new_lon, new_lat)
+                if trail.last_bearing is not None:
+                    turn = abs(heading - trail.last_bearing) % 360.0
+                    turn_rate = min(turn, 360.0 - turn) / dt
+                trail.last_bearing = heading
+            trail.last_speed = speed
+            trail.push(speed, accel, turn_rate, point.date_time, self.window, self.window_size)
+
+        if len(trail.samples) >= self.min_samples:
+            self._update_mode(trail, point, self.classify(*trail.features()))
+        if trail.segment is None:
+            start_time, unassigned_distance, unassigned_count = trail.unassigned
+            trail.unassigned = (start_time, unassigned_distance + distance, unassigned_count + 1)
+            return
+        segment = trail.segment
+        segment.end_time = point.date_time
+        segment.distance += distance
+        segment.points_count += 1
+        self._dirty[segment.id] = segment
+
+    def _update_mode(self, trail: _TrailWindow, point: LocationCreate, mode: str):
+        if trail.mode is None:
+            # First classification, the segment also covers the points seen before it
+            start_time, distance, points_count = trail.unassigned
+            trail.mode = mode
+            trail.segment = TransportSegmentState(
+                uuid.uuid4(), trail.user_id, point.session_id, mode, start_time, start_time, distance, points_count
+            )
+            return
+        if mode == trail.mode:
+            trail.candidate = None
+            trail.candidate_count = 0
+            return
+        if mode != trail.candidate:
+            trail.candidate = mode
+            trail.candidate_count = 0
+        trail.candidate_count += 1
+        if trail.candidate_count >= self.switch_after:
+            previous = trail.segment
+            trail.mode = mode
+            trail.candidate = None
+            trail.candidate_count = 0
+            # The new segment starts where the previous one ends, so segments cover the trail without gaps
+            trail.segment = TransportSegmentState(
+                uuid.uuid4(), trail.user_id, point.session_id, mode, previous.end_time, previous.end_time
+            )
+
+    def drain(self) -> list[TransportSegmentState]:
+        """Takes segments changed since the last flush and forgets trails idle for longer than ``idle_ttl``"""
+        dirty, self._dirty = self._dirty, {}
+        expired_before = time.monotonic() - self.idle_ttl
+        for key in [key for key, touched_at in self._touched_at.items() if touched_at < expired_before]:
+            del self._touched_at[key]
+            del self._trails[key]
+        return list(dirty.values())
+
+    def restore(self, segments: list[TransportSegmentState]):
+        """Marks segments of a failed flush as changed again; upserts are idempotent"""
+        for segment in segments:
+            self._dirty.setdefault(segment.id, segment)
+
+
+async def flush_transport_segments(classifier: TransportModeClassifier, session_factory: async_sessionmaker):
+    """Upserts changed transport segments and the dominant mode of their sessions"""
+    segments = classifier.drain()
+    if not segments:
+        return
+    # Imported here: the repository module imports TransportSegmentState from this module
+    from db.timescaledb_repository import TimescaleDBRepository
+
+    try:
+        async with session_factory() as db:
+            await TimescaleDBRepository(db).save_transport_segments(segments)
+    except Exception as exc:
+        logger.error(f"Error saving {len(segments)} transport segments: {exc}", exc_info=exc)
+        classifier.restore(segments)
+
+
+transport_classifier = TransportModeClassifier()
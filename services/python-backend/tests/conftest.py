@@ -0,0 +1,5 @@
+import os
+
+
+# Tests log to the console only, set before ``logger`` reads it on import of the app
+os.environ.setdefault('LOG_FILE', '')
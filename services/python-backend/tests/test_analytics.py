@@ -0,0 +1,180 @@
+from datetime import UTC, datetime
+
+import numpy as np
+import pytest
+from benchmarks import analyze_track_python, synthetic_track
+from db.database import get_repository
+from fastapi.testclient import TestClient
+from main import app
+from tracking.analytics import (
+    TrackArrays,
+    analyze_track,
+    find_stops,
+    interpolate_positions,
+    time_windows,
+)
+
+
+def make_track(timestamps: list[float], lon: list[float], lat: list[float]) -> TrackArrays:
+    size = len(timestamps)
+    return TrackArrays(
+        np.array(timestamps, dtype=np.float64),
+        np.array(lon, dtype=np.float64),
+        np.array(lat, dtype=np.float64),
+        np.full(size, 5.0),
+        np.full(size, np.nan)
+    )
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_analyze_track_matches_python_baseline(seed):
+    track = synthetic_track(5_000, seed=seed)
+    expected = analyze_track_python(track)
+    result = analyze_track(track)
+
+    for field in ('distances', 'durations', 'speeds', 'accelerations'):
+        np.testing.assert_allclose(getattr(result, field), getattr(expected, field), rtol=1e-9, atol=1e-9)
+    # Bearings wrap at 360, compare the angular difference
+    difference = (result.bearings - expected.bearings + 180) % 360 - 180
+    np.testing.assert_allclose(difference, 0, atol=1e-6)
+    np.testing.assert_array_equal(result.stops, expected.stops)
+    assert len(result.stops) > 0
+
+
+def test_repeated_timestamps_give_zero_speed():
+    track = make_track([0, 10, 10, 20], [37.6, 37.601, 37.602, 37.603], [55.7, 55.7, 55.7, 55.7])
+    result = analyze_track(track)
+
+    assert result.speeds[1] == 0
+    assert np.all(np.isfinite(result.accelerations))
+    np.testing.assert_allclose(result.speeds, analyze_track_python(track).speeds)
+
+
+@pytest.mark.parametrize('size', [0, 1, 2])
+def test_short_tracks(size):
+    track = synthetic_track(size)
+    result = analyze_track(track)
+    expected = analyze_track_python(track)
+
+    assert len(result.distances) == max(size - 1, 0)
+    np.testing.assert_array_equal(result.accelerations, expected.accelerations)
+    assert result.stops.shape == expected.stops.shape == (0, 2)
+
+
+def test_find_stops_keeps_long_runs_only():
+    speeds = np.array([2.0, 0.1, 0.1, 3.0, 0.2, 0.2, 0.2])
+    durations = np.array([10.0, 60.0, 59.0, 10.0, 50.0, 50.0, 50.0])
+
+    # 119 s of the first run fall short, the trailing run lasts 150 s up to the last point
+    np.testing.assert_array_equal(find_stops(speeds, durations, 0.5, 120.0), [[4, 7]])
+    np.testing.assert_array_equal(find_stops(speeds, durations, 0.5, 100.0), [[1, 3], [4, 7]])
+
+
+def interpolate_python(track: TrackArrays, time: float, max_gap: float, drift_speed: float) -> tuple:
+    """Position at one time by scanning the track: (lon, lat, uncertainty, method)"""
+    points = list(zip(track.timestamps.tolist(), track.lon.tolist(), track.lat.tolist(), track.accuracy.tolist(), strict=True))
+    before = [point for point in points if point[0] <= time]
+    after = [point for point in points if point[0] > time]
+    prev = before[-1] if before else None
+    next_ = after[0] if after else None
+    if prev is not None and prev[0] == time:
+        return prev[1], prev[2], prev[3], 'exact'
+    dt_prev = time - prev[0] if prev else np.inf
+    dt_next = next_[0] - time if next_ else np.inf
+    if dt_prev <= max_gap and dt_next <= max_gap:
+        fraction = dt_prev / (dt_prev + dt_next)
+        return (
+            prev[1] + fraction * (next_[1] - prev[1]),
+            prev[2] + fraction * (next_[2] - prev[2]),
+            (1 - fraction) * prev[3] + fraction * next_[3] + drift_speed * min(dt_prev, dt_next),
+            'interpolated'
+        )
+    if min(dt_prev, dt_next) <= max_gap:
+        closest = prev if dt_prev <= dt_next else next_
+        return closest[1], closest[2], closest[3] + drift_speed * min(dt_prev, dt_next), 'nearest'
+    return np.nan, np.nan, np.nan, ''
+
+
+def test_interpolation_matches_python_baseline():
+    rng = np.random.default_rng(3)
+    track = synthetic_track(300)
+    # Gaps longer than max_gap in the middle of the track
+    track.timestamps[150:] += 2000
+    times = np.concatenate((
+        rng.uniform(track.timestamps[0] - 900, track.timestamps[-1] + 900, 500),
+        track.timestamps[::10],
+    ))
+    estimates = interpolate_positions(track, times, max_gap=600.0, drift_speed=1.5)
+
+    for k, time in enumerate(times.tolist()):
+        lon, lat, uncertainty, method = interpolate_python(track, time, 600.0, 1.5)
+        assert estimates.method[k] == method
+        np.testing.assert_allclose(
+            [estimates.lon[k], estimates.lat[k], estimates.uncertainty[k]], [lon, lat, uncertainty], rtol=1e-12
+        )
+    assert set(estimates.method) == {'exact', 'interpolated', 'nearest', ''}
+
+
+def test_interpolation_across_the_antimeridian():
+    track = TrackArrays(
+        np.array([0.0, 100.0]), np.array([179.9, -179.9]), np.array([0.0, 0.0]), np.array([5.0, 5.0]), np.full(2, np.nan)
+    )
+    estimates = interpolate_positions(track, np.array([25.0, 50.0]))
+
+    np.testing.assert_allclose(np.abs(estimates.lon), [179.95, 180.0])
+    assert list(estimates.method) == ['interpolated', 'interpolated']
+
+
+def test_interpolation_of_an_empty_track():
+    estimates = interpolate_positions(TrackArrays.from_partitions([]), np.array([1.0, 2.0]))
+
+    assert np.isnan(estimates.lon).all()
+    assert list(estimates.method) == ['', '']
+
+
+def test_time_windows_merge_overlaps():
+    windows = time_windows(np.array([1000.0, 0.0, 150.0, 2000.0, 1100.0]), margin=100.0)
+
+    np.testing.assert_array_equal(windows, [[-100, 250], [900, 1200], [1900, 2100]])
+    assert time_windows(np.array([]), margin=100.0).shape == (0, 2)
+
+
+class FakeRepository:
+    def __init__(self, track: TrackArrays):
+        self.track = track
+        self.windows = []
+
+    async def get_user_track_arrays(self, user_id, windows):
+        self.windows.append(windows)
+        return self.track
+
+
+def test_positions_endpoint():
+    start = datetime(2024, 1, 1, tzinfo=UTC).timestamp()
+    track = TrackArrays(
+        np.array([start, start + 60]), np.array([37.6, 37.7]), np.array([55.7, 55.8]), np.array([5.0, 15.0]),
+        np.full(2, np.nan)
+    )
+    repository = FakeRepository(track)
+    app.dependency_overrides[get_repository] = lambda: repository
+    try:
+        response = TestClient(app).post('/location/users/1/positions', json={
+            'timestamps': ['2024-01-01T00:00:30', '2024-01-01T00:00:00+00:00', '2024-01-02T00:00:00Z'],
+            'max_gap': 300,
+        })
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    middle, exact, unknown = response.json()['positions']
+    assert middle['timestamp'] == '2024-01-01T00:00:30Z'  # Naive timestamps are taken as UTC
+    assert middle['method'] == 'interpolated'
+    assert middle['longitude'] == pytest.approx(37.65)
+    assert middle['uncertainty'] == pytest.approx(10.0 + 1.5 * 30)
+    assert (exact['method'], exact['latitude']) == ('exact', 55.7)
+    assert unknown == {
+        'timestamp': '2024-01-02T00:00:00Z', 'longitude': None, 'latitude': None, 'uncertainty': None, 'method': None
+    }
+    # One query for all timestamps, windows around the far timestamp kept apart
+    assert len(repository.windows) == 1
+    assert len(repository.windows[0]) == 2
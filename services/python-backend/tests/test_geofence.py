@@ -0,0 +1,106 @@
+from datetime import UTC, datetime
+
+import pytest
+import shapely
+from db.database import get_repository
+from fastapi.testclient import TestClient
+from main import app
+from tracking.geofence import GeofenceEngine, _UserZoneIndex
+
+
+NOW = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def square(lon: float, lat: float, size: float) -> shapely.Polygon:
+    return shapely.box(lon, lat, lon + size, lat + size)
+
+
+@pytest.fixture
+def engine() -> GeofenceEngine:
+    engine = GeofenceEngine(cell_size=0.01)
+    engine.load_user(1, [(10, 'home', True, square(37.0, 55.0, 0.005)), (11, 'park', False, square(37.004, 55.0, 0.01))])
+    return engine
+
+
+def events(engine: GeofenceEngine, lon: float, lat: float) -> list[tuple[int, str]]:
+    return [(event.zone_id, event.event) for event in engine.evaluate(1, lon, lat, NOW)]
+
+
+def test_enter_and_exit_are_emitted_once(engine):
+    assert events(engine, 37.001, 55.001) == [(10, 'enter')]
+    assert events(engine, 37.002, 55.002) == []
+    assert sorted(events(engine, 37.0045, 55.001)) == [(11, 'enter')]  # In both zones
+    assert events(engine, 37.01, 55.001) == [(10, 'exit')]
+    assert events(engine, 38.0, 56.0) == [(11, 'exit')]
+    assert events(engine, 38.0, 56.0) == []
+
+
+def test_events_carry_the_notify_flag(engine):
+    enter = engine.evaluate(1, 37.01, 55.001, NOW)[0]
+    assert (enter.zone_name, enter.notify, enter.timestamp) == ('park', False, NOW)
+
+
+def test_unloaded_user_has_no_events(engine):
+    assert engine.evaluate(2, 37.001, 55.001, NOW) == []
+    assert engine.users_to_load({1, 2}) == {2}
+
+
+def test_removed_zone_emits_no_exit(engine):
+    events(engine, 37.001, 55.001)
+    engine.remove_zone(1, 10)
+    assert events(engine, 38.0, 56.0) == []
+    assert events(engine, 37.001, 55.001) == []
+
+
+def test_upserted_zone_replaces_the_old_geometry(engine):
+    engine.upsert_zone(1, 10, 'home', True, square(40.0, 50.0, 0.005))
+    assert events(engine, 37.001, 55.001) == []
+    assert events(engine, 40.001, 50.001) == [(10, 'enter')]
+
+
+def test_zone_spanning_many_cells_is_found_without_the_grid():
+    index = _UserZoneIndex(cell_size=0.01)
+    large = GeofenceEngine._prepare(1, 'city', True, square(37.0, 55.0, 1.0))
+    small = GeofenceEngine._prepare(2, 'home', True, square(37.5, 55.5, 0.001))
+    index.add(large)
+    index.add(small)
+
+    assert large.cells == []
+    assert {zone.id for zone in index.containing(37.5005, 55.5005)} == {1, 2}
+    assert [zone.id for zone in index.containing(37.9, 55.9)] == [1]
+    assert index.remove(1)
+    assert index.containing(37.9, 55.9) == []
+    assert not index.remove(1)
+
+
+def test_zone_on_cell_borders_is_registered_in_every_cell():
+    index = _UserZoneIndex(cell_size=0.01)
+    zone = GeofenceEngine._prepare(1, 'border', True, square(37.005, 55.005, 0.01))
+    index.add(zone)
+    assert len(zone.cells) == 4
+    assert [found.id for found in index.containing(37.014, 55.014)] == [1]
+    index.remove(1)
+    assert index._cells == {}
+
+
+class FailingRepository:
+    async def create_geo_zone(self, zone):
+        raise AssertionError("Invalid zones must not reach the database")
+
+
+@pytest.mark.parametrize(
+    'zone',
+    [
+        {'coordinates': [[37.0, 55.0], [37.1, 55.0], [37.0, 55.0]]},
+        {'coordinates': [[37.0, 55.0], [37.1, 55.0]]},
+        {'center': [37.0, 55.0], 'radius': -10},
+        {'center': [37.0, 55.0], 'radius': 0},
+    ]
+)
+def test_invalid_zones_are_rejected_before_the_database(zone):
+    app.dependency_overrides[get_repository] = FailingRepository
+    try:
+        response = TestClient(app).post('/geozones/', json={'user_id': 1, 'name': 'zone', **zone})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 422
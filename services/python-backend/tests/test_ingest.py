@@ -0,0 +1,136 @@
+from datetime import UTC, datetime, timedelta
+from uuid import UUID, uuid4
+
+import pytest
+from db.database import get_repository
+from fastapi.testclient import TestClient
+from main import app
+from routers.location import validate_point
+from schemas import LocationCreate
+
+
+SESSION_ID = '00000000-0000-0000-0000-000000000005'
+
+
+def make_point(**fields) -> LocationCreate:
+    return LocationCreate(**{'user_id': 1, 'latitude': 55.75, 'longitude': 37.62, 'accuracy': 5.0, **fields})
+
+
+class FakeDB:
+    async def rollback(self):
+        pass
+
+
+class FakeRepository:
+    """Records the batches that would be inserted"""
+
+    def __init__(self):
+        self.db = FakeDB()
+        self.batches = []
+        self.sessions = {UUID(SESSION_ID)}
+        self.session_lookups = []
+
+    async def create_track_points(self, points, segment_distances=None):
+        self.batches.append(list(points))
+        return len(points)
+
+    async def find_session_ids(self, session_ids):
+        self.session_lookups.append(session_ids)
+        return session_ids & self.sessions
+
+    async def get_geo_zones(self, user_ids):
+        return []
+
+
+@pytest.fixture
+def repository():
+    repository = FakeRepository()
+    app.dependency_overrides[get_repository] = lambda: repository
+    yield repository
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize(
+    ('fields', 'reason'),
+    [
+        ({'latitude': 91.0}, "latitude must be within [-90, 90]"),
+        ({'latitude': float('nan')}, "latitude must be within [-90, 90]"),
+        ({'longitude': -180.5}, "longitude must be within [-180, 180]"),
+        ({'accuracy': -1.0}, "accuracy must be a non-negative number"),
+        ({'accuracy': float('inf')}, "accuracy must be a non-negative number"),
+        ({'session_id': 'not-a-uuid'}, "session_id must be a valid UUID"),
+    ]
+)
+def test_validate_point_rejects(fields, reason):
+    assert validate_point(make_point(**fields)) == reason
+
+
+def test_validate_point_accepts_bounds():
+    assert validate_point(make_point(latitude=-90.0, longitude=180.0, accuracy=0.0)) is None
+
+
+def test_batch_is_stored_with_one_insert(repository):
+    start_time = datetime(2024, 1, 1, tzinfo=UTC)
+    points = [
+        {
+            'user_id': 101,
+            'date_time': (start_time + timedelta(seconds=i)).isoformat(),
+            'latitude': 55.0 + i * 0.00005,
+            'longitude': 37.0,
+            'accuracy': 5.0,
+        }
+        for i in range(5)
+    ]
+    points.insert(2, {**points[0], 'latitude': 100.0})
+
+    response = TestClient(app).post('/location/tracks', json={'points': points})
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body['accepted'] == 5
+    assert body['rejected'] == 1
+    assert body['errors'] == [{'index': 2, 'reason': "latitude must be within [-90, 90]"}]
+    assert len(repository.batches) == 1
+    stored = repository.batches[0]
+    assert [point.date_time for point in stored] == sorted(point.date_time for point in stored)
+
+
+def test_naive_timestamps_are_taken_as_utc(repository):
+    points = [
+        {'user_id': 102, 'date_time': '2024-01-01T00:00:00', 'latitude': 55.0, 'longitude': 37.0, 'accuracy': 5.0},
+        {'user_id': 102, 'latitude': 55.001, 'longitude': 37.0, 'accuracy': 5.0},  # Server time, aware
+        {'user_id': 102, 'date_time': '2024-01-01T00:00:10', 'latitude': 55.0005, 'longitude': 37.0, 'accuracy': 5.0},
+    ]
+
+    response = TestClient(app).post('/location/tracks', json={'points': points})
+
+    assert response.status_code == 201
+    assert response.json()['rejected'] == 0
+    assert all(point.date_time.tzinfo is not None for point in repository.batches[0])
+
+
+def test_location_create_assumes_utc():
+    point = make_point(date_time='2024-01-01T03:00:00')
+    assert point.date_time == datetime(2024, 1, 1, 3, tzinfo=UTC)
+
+
+def test_points_of_unknown_sessions_are_rejected_individually(repository):
+    unknown = str(uuid4())
+    points = [
+        {'user_id': 103, 'session_id': session_id, 'date_time': f'2024-01-01T00:00:0{i}Z', 'latitude': 55.0 + i * 1e-4,
+         'longitude': 37.0, 'accuracy': 5.0}
+        for i, session_id in enumerate([SESSION_ID, unknown, SESSION_ID.upper(), None, unknown])
+    ]
+
+    response = TestClient(app).post('/location/tracks', json={'points': points})
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body['accepted'] == 3
+    assert body['errors'] == [
+        {'index': 1, 'reason': f"Session {unknown} does not exist"},
+        {'index': 4, 'reason': f"Session {unknown} does not exist"},
+    ]
+    # Distinct sessions of the batch are checked with one lookup
+    assert repository.session_lookups == [{UUID(SESSION_ID), UUID(unknown)}]
+    assert {point.session_id for point in repository.batches[0]} == {SESSION_ID, None}
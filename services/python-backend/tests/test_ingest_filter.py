@@ -0,0 +1,88 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from schemas import LocationCreate
+from tracking.ingest_filter import IngestFilter
+
+
+START_TIME = datetime(2024, 1, 1, tzinfo=UTC)
+METERS_PER_DEGREE_LAT = 111_195.0
+
+
+def make_point(seconds: float, north: float = 0.0, accuracy: float = 10.0, **fields) -> LocationCreate:
+    """Point ``north`` meters north of the origin"""
+    return LocationCreate(**{
+        'user_id': 1,
+        'date_time': START_TIME + timedelta(seconds=seconds),
+        'latitude': 55.7 + north / METERS_PER_DEGREE_LAT,
+        'longitude': 37.6,
+        'accuracy': accuracy,
+        **fields
+    })
+
+
+@pytest.fixture
+def ingest_filter():
+    return IngestFilter(min_distance=5.0, max_radius=50.0, min_interval=60.0)
+
+
+def test_exact_duplicates_are_dropped(ingest_filter):
+    batch = ingest_filter.select([make_point(0), make_point(0), make_point(0, accuracy=0.0)])
+
+    assert batch.kept == [make_point(0)]
+    assert batch.dropped == batch.duplicates == 2
+
+
+@pytest.mark.parametrize(('seconds', 'north', 'accuracy', 'kept'), [
+    (10, 8.0, 10.0, False),  # Within the accuracy radius
+    (10, 12.0, 10.0, True),  # Beyond it
+    (10, 4.0, 0.0, False),  # Unknown accuracy, min_distance applies
+    (10, 6.0, 0.0, True),
+    (10, 60.0, 500.0, True),  # Radius capped at max_radius
+    (60, 1.0, 10.0, True),  # One point per interval while idle
+])
+def test_jitter_within_accuracy_is_dropped(ingest_filter, seconds, north, accuracy, kept):
+    batch = ingest_filter.select([make_point(0), make_point(seconds, north, accuracy)])
+
+    assert len(batch.kept) == 1 + kept
+    assert batch.dropped == (not kept)
+    assert batch.duplicates == 0
+
+
+def test_waypoints_and_late_points_are_kept(ingest_filter):
+    batch = ingest_filter.select([
+        make_point(100), make_point(110, is_waypoint=True), make_point(50), make_point(120), make_point(100)
+    ])
+
+    kept = [(point.date_time - START_TIME).total_seconds() for point in batch.kept]
+    assert kept == [100, 110, 50, 100]  # 120 is jitter after the waypoint
+    # Late points do not move the last kept point back
+    assert batch.last_kept['user:1'][2] == START_TIME + timedelta(seconds=110)
+
+
+def test_trails_are_filtered_separately(ingest_filter):
+    batch = ingest_filter.select([make_point(0), make_point(0, session_id='session'), make_point(0, user_id=2)])
+
+    assert len(batch.kept) == 3
+    assert set(batch.last_kept) == {'user:1', 'session', 'user:2'}
+
+
+def test_select_does_not_modify_the_filter(ingest_filter):
+    points = [make_point(0), make_point(10)]
+    batch = ingest_filter.select(points)
+
+    # A failed insert resends the same points, they must not count as duplicates
+    assert ingest_filter.select(points).kept == batch.kept
+    ingest_filter.apply(batch)
+    resent = ingest_filter.select(points)
+    assert resent.kept == []
+    assert resent.duplicates == 1
+    assert (ingest_filter.received, ingest_filter.dropped, ingest_filter.duplicates) == (2, 1, 0)
+
+
+def test_idle_trails_are_evicted():
+    ingest_filter = IngestFilter(min_distance=5.0, max_radius=50.0, min_interval=60.0, idle_ttl=0.0)
+    ingest_filter.apply(ingest_filter.select([make_point(0)]))
+    ingest_filter.evict_idle()
+
+    assert ingest_filter.select([make_point(0)]).kept == [make_point(0)]
@@ -0,0 +1,109 @@
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+import pytest
+from schemas import LocationCreate
+from tracking.geo import haversine
+from tracking.kalman import KalmanSmoother, _AxisState
+
+
+START_TIME = datetime(2024, 1, 1, tzinfo=UTC)
+METERS_PER_DEGREE_LAT = 111_195.0
+
+
+def make_point(seconds: float, north: float = 0.0, accuracy: float = 10.0, **fields) -> LocationCreate:
+    """Point ``north`` meters north of the origin"""
+    return LocationCreate(**{
+        'user_id': 1,
+        'date_time': START_TIME + timedelta(seconds=seconds),
+        'latitude': 55.7 + north / METERS_PER_DEGREE_LAT,
+        'longitude': 37.6,
+        'accuracy': accuracy,
+        **fields
+    })
+
+
+def smoothed(point: LocationCreate) -> tuple[float, float]:
+    return point.raw_data['smoothed']['longitude'], point.raw_data['smoothed']['latitude']
+
+
+def test_axis_step_matches_matrix_form():
+    rng = np.random.default_rng(0)
+    axis = _AxisState(velocity=1.0, p_xx=100.0, p_vv=100.0)
+    x = np.array([0.0, 1.0])
+    p = np.diag([100.0, 100.0])
+    h = np.array([[1.0, 0.0]])
+    q, r = 0.5, 25.0
+    for _ in range(50):
+        dt = float(rng.uniform(1, 30))
+        offset = float(rng.normal(x[1] * dt, 10))
+        position = axis.step(offset, dt, r, q)
+
+        f = np.array([[1.0, dt], [0.0, 1.0]])
+        process = q * np.array([[dt ** 3 / 3, dt ** 2 / 2], [dt ** 2 / 2, dt]])
+        x = f @ np.array([0.0, x[1]])  # Every step starts from position 0
+        p = f @ p @ f.T + process
+        k = p @ h.T / (h @ p @ h.T + r)
+        x = x + (k * (offset - h @ x)).ravel()
+        p = (np.eye(2) - k @ h) @ p
+
+        assert position == pytest.approx(x[0])
+        assert axis.velocity == pytest.approx(x[1])
+        assert (axis.p_xx, axis.p_xv, axis.p_vv) == pytest.approx((p[0, 0], p[0, 1], p[1, 1]))
+
+
+def test_noise_is_reduced():
+    rng = np.random.default_rng(1)
+    points = [make_point(i * 5, north=1.4 * i * 5 + rng.normal(0, 10), accuracy=10.0) for i in range(200)]
+    KalmanSmoother().measure(points)
+
+    raw_error = [abs(point.latitude - (55.7 + 7 * i / METERS_PER_DEGREE_LAT)) for i, point in enumerate(points)]
+    smoothed_error = [abs(smoothed(point)[1] - (55.7 + 7 * i / METERS_PER_DEGREE_LAT)) for i, point in enumerate(points)]
+    assert np.mean(smoothed_error[20:]) < 0.9 * np.mean(raw_error[20:])
+
+
+def test_imprecise_fixes_move_the_estimate_less():
+    jumps = []
+    for accuracy in (5.0, 100.0):
+        smoother = KalmanSmoother()
+        smoother.apply(smoother.measure([make_point(i * 10, accuracy=5.0) for i in range(10)]))
+        point = make_point(100, north=50.0, accuracy=accuracy)
+        smoother.measure([point])
+        jumps.append(haversine(37.6, 55.7, *smoothed(point)))
+
+    assert jumps[1] < jumps[0] < 50.0
+
+
+def test_outliers_are_rejected_until_reset():
+    smoother = KalmanSmoother(max_speed=70.0, reset_after=3)
+    track = [make_point(i * 10) for i in range(5)]
+    far = [make_point(50 + i * 10, north=100_000.0) for i in range(3)]
+    batch = smoother.measure([*track, *far])
+
+    assert [point for point, _ in batch.outliers] == far[:2]
+    assert batch.outliers[0][1] > 70.0
+    # The third jump in a row restarts the filter from the new position
+    assert batch.kept == [*track, far[2]]
+    assert smoothed(far[2]) == (far[2].longitude, far[2].latitude)
+    assert batch.states['user:1'].rejected_in_row == 0
+
+
+def test_waypoints_and_late_points_are_never_rejected():
+    smoother = KalmanSmoother()
+    waypoint = make_point(10, north=100_000.0, is_waypoint=True)
+    late = make_point(-100, north=100_000.0)
+    batch = smoother.measure([make_point(0), waypoint, late])
+
+    assert batch.outliers == []
+    assert len(batch.kept) == 3
+    assert smoothed(late) == (late.longitude, late.latitude)
+
+
+def test_measure_does_not_modify_the_filter():
+    smoother = KalmanSmoother()
+    smoother.apply(smoother.measure([make_point(0)]))
+    state = smoother._states['user:1']
+    snapshot = (state.lon, state.lat, state.time, state.east.p_xx, state.north.velocity)
+
+    smoother.measure([make_point(10, north=20.0)])
+    assert (state.lon, state.lat, state.time, state.east.p_xx, state.north.velocity) == snapshot
@@ -0,0 +1,43 @@
+import logging
+from pathlib import Path
+
+import log_handlers
+import logger
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+
+def test_application_loggers_are_rate_limited(monkeypatch):
+    # Uvicorn configures its loggers before the app is imported and does not propagate them to the root
+    uvicorn_handler = ListHandler()
+    monkeypatch.setattr(logging.getLogger('uvicorn'), 'handlers', [uvicorn_handler])
+    monkeypatch.setattr(logging.getLogger('uvicorn'), 'propagate', False)
+    monkeypatch.setattr(logging.getLogger(), 'handlers', [])
+    monkeypatch.setattr(logger, '_listeners', [])
+    monkeypatch.setattr(logger, 'LOG_RATE_INTERVAL', 3600.0)
+    logger.setup_logger()
+    try:
+        app_logger = logging.getLogger(f"uvicorn.{__file__}")
+        for i in range(3 * logger.LOG_RATE_LIMIT):
+            app_logger.warning("Point %d dropped", i)
+        for i in range(3 * logger.LOG_RATE_LIMIT):
+            app_logger.warning(f"Point {i} rejected")  # Formatted before the call, limited by call site
+        app_logger.warning("Another message")
+    finally:
+        logger.stop_logging()
+
+    messages = [record.getMessage() for record in uvicorn_handler.records]
+    assert len(messages) == 2 * logger.LOG_RATE_LIMIT + 1
+    assert messages[-1] == "Another message"
+
+
+def test_log_handlers_copies_are_identical():
+    bot_copy = Path(__file__).parents[2] / 'telegram-bot' / 'src' / 'bot' / 'utils' / 'log_handlers.py'
+    assert Path(log_handlers.__file__).read_text() == bot_copy.read_text()
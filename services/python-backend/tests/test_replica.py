@@ -0,0 +1,71 @@
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from db.replica import ReplicaMonitor, routing_session
+from sqlalchemy import create_engine, event, literal, select
+
+
+class LagResult:
+    def __init__(self, row):
+        self.row = row
+
+    def one(self):
+        return self.row
+
+
+class LagEngine:
+    """Engine answering the lag query with ``row``"""
+
+    def __init__(self, row):
+        self.row = row
+        self.sync_engine = create_engine('sqlite://')
+
+    @asynccontextmanager
+    async def connect(self):
+        yield self
+
+    async def execute(self, stmt):
+        return LagResult(self.row)
+
+
+@pytest.mark.parametrize(('row', 'available'), [
+    ((True, 0.5), True),
+    ((True, 30.0), False),  # Lags too much
+    ((True, None), False),  # Nothing replayed yet, the lag is unknown
+    ((False, None), False),  # Not a standby
+])
+def test_replica_availability(row, available):
+    monitor = ReplicaMonitor(LagEngine(row), max_lag=5.0)
+    asyncio.run(monitor.check())
+    assert monitor.available is available
+    assert monitor.lag == (row[1] if row[0] else None)
+
+
+def test_read_losing_the_replica_connection_is_repeated_on_the_primary():
+    primary = create_engine('sqlite://')
+    replica = create_engine('sqlite://')
+    replica_down = False
+
+    @event.listens_for(replica, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if replica_down:
+            raise sqlite3.OperationalError("server closed the connection unexpectedly")
+
+    @event.listens_for(replica, 'handle_error')
+    def handle_error(context):
+        context.is_disconnect = True
+
+    monitor = ReplicaMonitor(SimpleNamespace(sync_engine=replica), max_lag=5.0)
+    monitor.available = True
+    session_class = routing_session(SimpleNamespace(sync_engine=primary), monitor)
+
+    with session_class() as session:
+        assert session.execute(select(literal(1))).scalar() == 1
+        replica_down = True
+        assert session.scalar(select(literal(2))) == 2
+        assert not monitor.available
+        assert session.info['pinned']
+        session.commit()
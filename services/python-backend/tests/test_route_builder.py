@@ -0,0 +1,180 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+from uuid import uuid4
+
+import numpy as np
+import shapely
+from db.database import get_repository
+from db.timescaledb_repository import TimescaleDBRepository
+from fastapi.testclient import TestClient
+from main import app
+from schemas import LocationCreate
+from sqlalchemy.dialects import postgresql
+from tracking.route_builder import RouteAppend, RouteBuilder, StreamingSimplifier, _segment_distance, route_builder
+
+
+SESSION_ID = '00000000-0000-0000-0000-000000000002'
+START_TIME = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def simplify(points: list[tuple[float, float]], tolerance: float = 0.0001, max_window: int = 64) -> list:
+    simplifier = StreamingSimplifier(tolerance, max_window)
+    vertices = [points[0]]
+    for point in points:
+        vertex = simplifier.add(point)
+        if vertex is not None:
+            vertices.append(vertex)
+    return [*vertices, points[-1]]
+
+
+def make_point(seconds: float, lon: float, lat: float) -> LocationCreate:
+    return LocationCreate(
+        user_id=1,
+        date_time=START_TIME + timedelta(seconds=seconds),
+        latitude=lat,
+        longitude=lon,
+        accuracy=5.0,
+        session_id=SESSION_ID
+    )
+
+
+def test_segment_distance():
+    assert _segment_distance((0.5, 1.0), (0.0, 0.0), (1.0, 0.0)) == 1.0
+    assert _segment_distance((2.0, 0.0), (0.0, 0.0), (1.0, 0.0)) == 1.0  # Beyond the end
+    assert _segment_distance((3.0, 4.0), (0.0, 0.0), (0.0, 0.0)) == 5.0  # Degenerate segment
+
+
+def test_straight_line_has_no_inner_vertices():
+    points = [(37.0 + i * 0.0001, 55.0) for i in range(50)]
+    assert simplify(points) == [points[0], points[-1]]
+
+
+def test_corner_becomes_a_vertex():
+    points = [(37.0 + i * 0.0001, 55.0) for i in range(10)] + [(37.0009, 55.0 + i * 0.0001) for i in range(1, 10)]
+    vertices = simplify(points)
+    assert len(vertices) == 3
+    assert shapely.LineString(vertices).distance(shapely.Point(37.0009, 55.0)) <= 0.0001 + 1e-12
+
+
+def test_simplified_line_stays_within_tolerance():
+    rng = np.random.default_rng(1)
+    points = [tuple(point) for point in (np.cumsum(rng.normal(0, 0.00005, (2000, 2)), axis=0) + 37.0).tolist()]
+    tolerance = 0.0001
+
+    vertices = simplify(points, tolerance)
+
+    assert len(vertices) < len(points) / 2
+    line = shapely.LineString(vertices)
+    distances = shapely.distance(shapely.points(points), line)
+    assert distances.max() <= tolerance + 1e-12
+
+
+def test_window_is_capped():
+    points = [(37.0 + i * 0.0001, 55.0) for i in range(20)]
+    simplifier = StreamingSimplifier(0.0001, max_window=8)
+    emitted = [vertex for point in points if (vertex := simplifier.add(point)) is not None]
+    assert emitted == [points[8], points[16]]
+    assert len(simplifier.window) < 8
+
+
+def test_builder_skips_late_points_and_restores_in_order():
+    builder = RouteBuilder(tolerance=0.0001)
+    builder.observe([make_point(0, 37.0, 55.0), make_point(10, 37.0001, 55.0)])
+    failed = builder.drain()
+    builder.observe([make_point(5, 38.0, 56.0), make_point(20, 37.0002, 55.0)])
+
+    builder.restore(failed)
+
+    pending = builder.drain()[SESSION_ID]
+    assert pending.points == [(37.0, 55.0), (37.0001, 55.0), (37.0002, 55.0)]
+    assert builder.drain() == {}
+
+
+class RecordingDB:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(stmt)
+        return self
+
+    def scalar_one_or_none(self):
+        return None
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+def test_routes_without_a_path_are_appended_to():
+    db = RecordingDB()
+    asyncio.run(TimescaleDBRepository(db).append_route_points({SESSION_ID: RouteAppend(points=[(37.0, 55.0)])}))
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    assert 'IS NOT NULL' not in sql
+    assert 'ST_MakeLine(ARRAY[geo.routes.path' in sql
+
+
+def test_route_of_a_missing_session_is_not_found():
+    db = RecordingDB()
+    app.dependency_overrides[get_repository] = lambda: TimescaleDBRepository(db)
+    try:
+        response = TestClient(app).post('/routes/', json={'session_id': str(uuid4()), 'name': 'Walk'})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 404
+    assert len(db.statements) == 1  # Only the INSERT ... SELECT, no rebuild
+
+
+class RouteDB(RecordingDB):
+    route_id = uuid4()
+
+    def scalar_one_or_none(self):
+        return self.route_id
+
+    def one_or_none(self):
+        return {
+            'id': self.route_id, 'user_id': 1, 'session_id': SESSION_ID, 'name': 'Walk', 'tags': {},
+            'points_count': 2, 'simplified_points_count': 2,
+        }
+
+
+def test_route_created_while_appends_are_pending_takes_only_older_points():
+    db = RouteDB()
+    route_builder.observe([make_point(0, 37.0, 55.0), make_point(10, 37.0001, 55.0)])
+    app.dependency_overrides[get_repository] = lambda: TimescaleDBRepository(db)
+    try:
+        response = TestClient(app).post('/routes/', json={'session_id': SESSION_ID, 'name': 'Walk'})
+        pending = route_builder.drain()
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 201
+    rebuild = db.statements[1].compile(dialect=postgresql.dialect())
+    assert 'geo.track_points.timestamp <' in str(rebuild)
+    assert START_TIME in rebuild.params.values()
+    # The pending points are still appended by the next flush, but only once
+    assert pending[SESSION_ID].points == [(37.0, 55.0), (37.0001, 55.0)]
+
+
+def test_flush_waits_for_a_rebuild():
+    async def scenario():
+        builder = RouteBuilder()
+        builder.observe([make_point(0, 37.0, 55.0)])
+        flushed = []
+
+        async def flush():
+            async with builder.flushing() as pending:
+                flushed.append(pending)
+
+        async with builder.rebuilding(SESSION_ID) as before:
+            task = asyncio.create_task(flush())
+            await asyncio.sleep(0)
+            assert not flushed
+        await task
+        return before, flushed
+
+    before, flushed = asyncio.run(scenario())
+    assert before == START_TIME
+    assert list(flushed[0]) == [SESSION_ID]
@@ -0,0 +1,109 @@
+import base64
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+import orjson
+import pytest
+from db.database import get_repository
+from fastapi.testclient import TestClient
+from main import app
+
+
+START_TIME = datetime(2024, 1, 1, tzinfo=UTC)
+SEARCH = {
+    'start_time': START_TIME.isoformat(),
+    'end_time': (START_TIME + timedelta(days=1)).isoformat(),
+    'bbox': '37.5,55.6,37.7,55.8'
+}
+
+
+def make_row(**fields) -> SimpleNamespace:
+    return SimpleNamespace(**fields, _mapping=fields)
+
+
+class FakeRepository:
+    """Returns prepared rows and records the keyset of every search"""
+
+    def __init__(self):
+        self.db = SimpleNamespace()
+        self.calls = []
+        self.points = [
+            make_row(
+                id=i, timestamp=START_TIME + timedelta(minutes=i), longitude=37.6, latitude=55.7, accuracy=5.0,
+                is_waypoint=False
+            )
+            for i in range(3)
+        ]
+        self.sessions = [
+            make_row(
+                session_id=uuid4(), user_id=1, start_time=START_TIME, entered_at=START_TIME + timedelta(minutes=i),
+                left_at=START_TIME + timedelta(minutes=i + 1), points_count=10
+            )
+            for i in range(3)
+        ]
+
+    async def find_track_points(self, user_id, start_time, end_time, after=None, limit=1000, **area):
+        self.calls.append(after)
+        return self.points[:limit]
+
+    async def find_session_passages(self, start_time, end_time, user_id=None, after=None, limit=100, **area):
+        self.calls.append(after)
+        return self.sessions[:limit]
+
+
+@pytest.fixture
+def repository():
+    repository = FakeRepository()
+    app.dependency_overrides[get_repository] = lambda: repository
+    yield repository
+    app.dependency_overrides.clear()
+
+
+def encode(value) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(value)).decode()
+
+
+def test_points_cursor_round_trip(repository):
+    client = TestClient(app)
+    page = client.get('/location/users/1/points', params={**SEARCH, 'limit': 2}).json()
+    assert [point['id'] for point in page['points']] == [0, 1]
+
+    client.get('/location/users/1/points', params={**SEARCH, 'limit': 2, 'cursor': page['next_cursor']})
+    assert repository.calls == [None, (START_TIME + timedelta(minutes=1), 1)]
+
+
+def test_sessions_cursor_round_trip(repository):
+    client = TestClient(app)
+    page = client.get('/location/sessions/search', params={**SEARCH, 'limit': 2}).json()
+
+    client.get('/location/sessions/search', params={**SEARCH, 'limit': 2, 'cursor': page['next_cursor']})
+    timestamp, session_id = repository.calls[1]
+    assert timestamp == START_TIME + timedelta(minutes=1)
+    assert session_id == repository.sessions[1].session_id
+    assert isinstance(session_id, UUID)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    encode({'a': 1}),
+    encode([START_TIME.isoformat()]),
+    encode(['yesterday', 1]),
+    encode([START_TIME.isoformat(), 'abc']),
+    encode([START_TIME.isoformat(), None]),
+    encode([START_TIME.isoformat(), [1]]),
+])
+@pytest.mark.parametrize('path', ['/location/users/1/points', '/location/sessions/search'])
+def test_malformed_cursor_is_rejected(repository, path, cursor):
+    response = TestClient(app).get(path, params={**SEARCH, 'cursor': cursor})
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == "Invalid cursor"
+    assert repository.calls == []
+
+
+def test_numeric_session_cursor_is_rejected(repository):
+    cursor = encode([START_TIME.isoformat(), 12345])
+    response = TestClient(app).get('/location/sessions/search', params={**SEARCH, 'cursor': cursor})
+
+    assert response.status_code == 400
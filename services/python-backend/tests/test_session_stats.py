@@ -0,0 +1,112 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from schemas import LocationCreate
+from tracking import maintenance
+from tracking.geo import haversine
+from tracking.session_stats import SessionStats, SessionStatsTracker
+
+
+SESSION_ID = '00000000-0000-0000-0000-000000000001'
+START_TIME = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def make_point(seconds: float, lat: float, lon: float = 37.0, session_id: str | None = SESSION_ID) -> LocationCreate:
+    return LocationCreate(
+        user_id=1,
+        date_time=START_TIME + timedelta(seconds=seconds),
+        latitude=lat,
+        longitude=lon,
+        accuracy=5.0,
+        session_id=session_id
+    )
+
+
+def test_distances_and_bounds_of_a_batch():
+    tracker = SessionStatsTracker()
+    points = [make_point(0, 55.0), make_point(10, 55.001), make_point(20, 55.002, lon=37.001)]
+
+    batch = tracker.measure(points)
+
+    assert batch.distances[0] == 0.0
+    assert batch.distances[1] == pytest.approx(haversine(37.0, 55.0, 37.0, 55.001))
+    assert batch.distances[2] == pytest.approx(haversine(37.0, 55.001, 37.001, 55.002))
+    stats = batch.stats[SESSION_ID]
+    assert stats.points_count == 3
+    assert stats.distance == pytest.approx(sum(batch.distances))
+    assert (stats.min_lon, stats.min_lat, stats.max_lon, stats.max_lat) == (37.0, 55.0, 37.001, 55.002)
+
+
+def test_measure_does_not_modify_the_tracker():
+    tracker = SessionStatsTracker()
+    tracker.measure([make_point(0, 55.0)])
+    assert tracker.pending(SESSION_ID) is None
+    assert tracker.measure([make_point(10, 55.001)]).distances == [0.0]
+
+
+def test_next_batch_continues_from_the_last_point():
+    tracker = SessionStatsTracker()
+    tracker.apply(tracker.measure([make_point(0, 55.0)]))
+    batch = tracker.measure([make_point(10, 55.001)])
+    assert batch.distances[0] == pytest.approx(haversine(37.0, 55.0, 37.0, 55.001))
+
+
+def test_late_point_extends_bounds_but_not_distance():
+    tracker = SessionStatsTracker()
+    tracker.apply(tracker.measure([make_point(10, 55.0)]))
+    batch = tracker.measure([make_point(0, 54.9)])
+    assert batch.distances == [0.0]
+    assert batch.stats[SESSION_ID].min_lat == 54.9
+    assert batch.last_points == {}
+
+
+def test_points_outside_sessions_have_distances_but_no_stats():
+    tracker = SessionStatsTracker()
+    batch = tracker.measure([make_point(0, 55.0, session_id=None), make_point(10, 55.001, session_id=None)])
+    assert batch.distances[1] > 0
+    assert batch.stats == {}
+
+
+def test_restore_merges_with_newer_deltas():
+    tracker = SessionStatsTracker()
+    tracker.apply(tracker.measure([make_point(0, 55.0), make_point(10, 55.001)]))
+    drained = tracker.drain()
+    tracker.apply(tracker.measure([make_point(20, 55.002)]))
+
+    tracker.restore(drained)
+
+    pending = tracker.pending(SESSION_ID)
+    assert pending.points_count == 3
+    assert pending.max_lat == 55.002
+
+
+def test_stop_lets_a_running_flush_finish(monkeypatch):
+    flushed = []
+
+    async def slow_flush(tracker, session_factory):
+        await asyncio.sleep(0.05)
+        flushed.append(tracker)
+
+    async def no_flush(*args):
+        pass
+
+    monkeypatch.setattr(maintenance, 'flush_session_stats', slow_flush)
+    monkeypatch.setattr(maintenance, 'flush_routes', no_flush)
+    monkeypatch.setattr(maintenance, 'flush_transport_segments', no_flush)
+
+    async def run():
+        stop = asyncio.Event()
+        task = asyncio.create_task(maintenance.run_maintenance(None, 0.01, stop))
+        await asyncio.sleep(0.02)  # The first flush is in progress
+        stop.set()
+        await task
+
+    asyncio.run(run())
+    assert len(flushed) == 1
+
+
+def test_session_stats_merge_of_empty_stats():
+    stats = SessionStats()
+    stats.merge(SessionStats(distance=5.0, points_count=1, min_lon=1, min_lat=2, max_lon=1, max_lat=2))
+    assert (stats.distance, stats.points_count, stats.min_lon, stats.max_lat) == (5.0, 1, 1, 2)
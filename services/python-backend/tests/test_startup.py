@@ -0,0 +1,79 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import main
+import pytest
+from db import database
+from db.database import pool_options
+from db.orm_models import GeoZone, Route, TrackPoint
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+
+class FailingEngine:
+    echo = False
+
+    def begin(self):
+        raise OSError("Connection refused")
+
+
+def test_schema_echo_is_restored_on_failure(monkeypatch):
+    engine = FailingEngine()
+    monkeypatch.setattr(database, 'engine', engine)
+
+    with pytest.raises(OSError):
+        asyncio.run(database._apply_schema())
+    assert engine.echo is False
+
+
+def test_startup_without_connection_attempts(monkeypatch):
+    monkeypatch.setattr(main, 'MAX_DB_CONNECTION_RETRIES', 0)
+
+    # Runs the whole lifespan: startup and shutdown
+    with TestClient(main.app):
+        pass
+
+
+@pytest.mark.parametrize(('max_connections', 'workers', 'options'), [
+    (0, 4, {}),
+    (80, 1, {'pool_size': 40, 'max_overflow': 40}),
+    (80, 3, {'pool_size': 13, 'max_overflow': 13}),
+    (5, 2, {'pool_size': 1, 'max_overflow': 1}),
+])
+def test_pool_options_stay_within_the_budget(max_connections, workers, options):
+    assert pool_options(max_connections, workers) == options
+    assert workers * sum(options.values()) <= max_connections
+
+
+@pytest.mark.parametrize(('max_connections', 'workers'), [(1, 1), (10, 6), (80, 41)])
+def test_pool_options_fail_below_two_connections_per_worker(max_connections, workers):
+    with pytest.raises(ValueError, match='at least 2'):
+        pool_options(max_connections, workers)
+
+
+class RecordingEngine:
+    def __init__(self):
+        self.statements = []
+
+    @asynccontextmanager
+    async def begin(self):
+        yield self
+
+    async def execute(self, statement):
+        self.statements.append(' '.join(str(statement.compile(dialect=postgresql.dialect())).split()))
+
+
+def test_existing_tables_are_migrated():
+    engine = RecordingEngine()
+
+    async def migrate():
+        for model in (TrackPoint, GeoZone, Route):
+            await model.migrate_columns(engine)
+
+    asyncio.run(migrate())
+    sql = '\n'.join(engine.statements)
+    assert 'ALTER TABLE geo.track_points ALTER COLUMN session_id DROP NOT NULL' in sql
+    assert 'ALTER TABLE geo.track_points ALTER COLUMN note DROP NOT NULL' in sql
+    assert 'ALTER TABLE geo.track_points DROP CONSTRAINT IF EXISTS track_points_user_id_fkey' in sql
+    assert 'ALTER TABLE geo.geo_zones ALTER COLUMN radius DROP NOT NULL' in sql
+    assert 'CREATE INDEX IF NOT EXISTS ix_geo_routes_session_id ON geo.routes (session_id)' in sql
@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+import pytest
+from db.database import get_repository
+from main import app
+from tracking.trail_locks import TrailLocks
+
+
+def test_batches_of_a_trail_are_serialized():
+    locks = TrailLocks()
+    order = []
+
+    async def batch(name, keys, delay):
+        async with locks.hold(keys):
+            order.append(f'{name} start')
+            await asyncio.sleep(delay)
+            order.append(f'{name} end')
+
+    async def run():
+        await asyncio.gather(
+            batch('a', ['s1', 's2'], 0.02), batch('b', ['s2'], 0.0), batch('c', ['s3'], 0.0)
+        )
+
+    asyncio.run(run())
+    # b waits for a, c does not share a trail with it
+    assert order == ['a start', 'c start', 'c end', 'a end', 'b start', 'b end']
+    assert len(locks) == 0
+
+
+def test_locks_are_dropped_when_a_waiter_is_cancelled():
+    locks = TrailLocks()
+
+    async def run():
+        async with locks.hold(['s1']):
+            waiter = asyncio.create_task(locks.hold(['s1']).__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert len(locks) == 1
+
+    asyncio.run(run())
+    assert len(locks) == 0
+
+
+class SlowRepository:
+    """Stores batches after a delay, so concurrent requests overlap during the write"""
+
+    def __init__(self):
+        self.db = None
+        self.distances = []
+
+    async def create_track_points(self, points, segment_distances=None):
+        await asyncio.sleep(0.02)
+        self.distances.append(segment_distances)
+        return len(points)
+
+    async def get_geo_zones(self, user_ids):
+        return []
+
+
+def test_concurrent_batches_measure_against_each_other():
+    repository = SlowRepository()
+    app.dependency_overrides[get_repository] = lambda: repository
+
+    def batch(start: int) -> dict:
+        return {'points': [
+            {'user_id': 104, 'date_time': f'2024-01-01T00:00:{start + i:02d}Z', 'latitude': 55.0 + (start + i) * 1e-4,
+             'longitude': 37.0, 'accuracy': 5.0}
+            for i in range(3)
+        ]}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await asyncio.gather(
+                client.post('/location/tracks', json=batch(0)), client.post('/location/tracks', json=batch(3))
+            )
+
+    try:
+        responses = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert [response.status_code for response in responses] == [201, 201]
+    first, second = repository.distances
+    assert first[0] == 0.0
+    # The second batch continues from the last point of the first one instead of starting anew
+    assert second[0] > 5  # About 11 m north, smoothed
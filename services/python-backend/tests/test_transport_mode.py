@@ -0,0 +1,118 @@
+import math
+from datetime import UTC, datetime, timedelta
+from itertools import pairwise
+
+import numpy as np
+import pytest
+from schemas import LocationCreate
+from tracking.geo import EARTH_RADIUS, haversine
+from tracking.transport_mode import TransportModeClassifier, _TrailWindow
+
+
+SESSION_ID = '00000000-0000-0000-0000-000000000003'
+START_TIME = datetime(2024, 1, 1, tzinfo=UTC)
+METERS_PER_DEGREE = EARTH_RADIUS * math.pi / 180
+
+
+def straight_trail(speeds: list[float], dt: float = 10.0) -> list[LocationCreate]:
+    """Points heading north, the i-th step is travelled at ``speeds[i]`` m/s"""
+    points, lat = [], 55.7
+    for i, speed in enumerate([0.0, *speeds]):
+        lat += speed * dt / METERS_PER_DEGREE
+        points.append(LocationCreate(
+            user_id=1,
+            date_time=START_TIME + timedelta(seconds=i * dt),
+            latitude=lat,
+            longitude=37.6,
+            accuracy=5.0,
+            session_id=SESSION_ID
+        ))
+    return points
+
+
+@pytest.mark.parametrize(('features', 'mode'), [
+    ((0.1, 0.5, 0.0, 0.0), 'stationary'),
+    ((1.4, 2.0, 0.1, 2.0), 'walking'),
+    ((1.8, 5.0, 0.2, 30.0), 'walking'),  # Fast peak, but meandering
+    ((1.8, 5.0, 0.2, 2.0), 'cycling'),
+    ((5.0, 8.0, 0.3, 1.0), 'cycling'),
+    ((5.0, 8.0, 1.5, 1.0), 'driving'),  # Stop and go in traffic
+    ((6.0, 14.0, 0.3, 1.0), 'driving'),
+    ((15.0, 20.0, 0.5, 0.0), 'driving'),
+])
+def test_classify_speed_bands(features, mode):
+    assert TransportModeClassifier().classify(*features) == mode
+
+
+def test_window_features_match_brute_force():
+    rng = np.random.default_rng(0)
+    trail = _TrailWindow(1, (37.6, 55.7, START_TIME))
+    samples = []
+    timestamp = START_TIME
+    for _ in range(500):
+        timestamp += timedelta(seconds=float(rng.uniform(1, 20)))
+        sample = (timestamp.timestamp(), *rng.uniform(0, 10, 3))
+        trail.push(*sample[1:], timestamp, window=120.0, size=16)
+        samples.append(sample)
+        window = [s for s in samples[-16:] if s[0] >= timestamp.timestamp() - 120.0]
+
+        mean_speed, peak_speed, mean_accel, turn_rate = trail.features()
+        assert len(trail.samples) == len(window)
+        assert peak_speed == max(s[1] for s in window)
+        assert mean_speed == pytest.approx(np.mean([s[1] for s in window]))
+        assert mean_accel == pytest.approx(np.mean([s[2] for s in window]))
+        assert turn_rate == pytest.approx(np.mean([s[3] for s in window]))
+
+
+def test_segments_cover_the_trail():
+    points = straight_trail([1.4] * 20 + [15.0] * 20)
+    classifier = TransportModeClassifier()
+    classifier.observe(points)
+    segments = sorted(classifier.drain(), key=lambda segment: segment.start_time)
+
+    assert segments[0].mode == 'walking'
+    assert segments[-1].mode == 'driving'
+    assert segments[0].start_time == points[0].date_time
+    assert segments[-1].end_time == points[-1].date_time
+    for previous, segment in pairwise(segments):
+        assert segment.start_time == previous.end_time
+        assert segment.mode != previous.mode
+    assert sum(segment.points_count for segment in segments) == len(points)
+    total = sum(haversine(a.longitude, a.latitude, b.longitude, b.latitude) for a, b in pairwise(points))
+    assert sum(segment.distance for segment in segments) == pytest.approx(total)
+
+
+@pytest.mark.parametrize(('fast_points', 'modes'), [
+    (2, ['walking']),
+    (3, ['walking', 'driving', 'walking']),
+])
+def test_mode_switches_after_consecutive_points(fast_points, modes):
+    # A single-sample window classifies every point on its own
+    classifier = TransportModeClassifier(window_size=1, min_samples=1, switch_after=3)
+    classifier.observe(straight_trail([1.4] * 5 + [15.0] * fast_points + [1.4] * 5))
+    segments = sorted(classifier.drain(), key=lambda segment: segment.start_time)
+
+    assert [segment.mode for segment in segments] == modes
+
+
+def test_late_points_are_ignored():
+    points = straight_trail([1.4] * 10)
+    classifier = TransportModeClassifier()
+    classifier.observe(points)
+    classifier.observe([points[3]])
+
+    (segment,) = classifier.drain()
+    assert segment.points_count == len(points)
+    assert segment.end_time == points[-1].date_time
+
+
+def test_drain_restore_and_idle_trails():
+    classifier = TransportModeClassifier(idle_ttl=0.0)
+    classifier.observe(straight_trail([1.4] * 10))
+    segments = classifier.drain()
+
+    assert len(segments) == 1
+    assert classifier.drain() == []
+    assert classifier._trails == {}  # Idle for longer than idle_ttl
+    classifier.restore(segments)
+    assert classifier.drain() == segments
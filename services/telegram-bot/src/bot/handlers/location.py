@@ -3,20 +3,12 @@ import logging
 from aiogram import Dispatcher, F, Router
 from aiogram.filters import Command
 from aiogram.types import KeyboardButton, Message, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from services.location_buffer import LocationBuffer
 
 
-router = Router()
-logger = logging.Logger("LOCATION")
-
 router = Router()
 logger = logging.getLogger("LOCATION")
 
-# Включаем логирование в консоль
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-
 
 @router.message(Command("track_me"))
 async def start_tracking(message: Message):
@@ -39,19 +31,21 @@ async def start_tracking(message: Message):
 
 
 @router.message(F.location)
-async def handle_initial_location(message: Message):
+async def handle_initial_location(message: Message, location_buffer: LocationBuffer):
     """Обработка первого запроса на трансляцию"""
     await message.answer(
         "Трансляция координат начата!",
         reply_markup=ReplyKeyboardRemove()
     )
     await log_location(message)
+    location_buffer.put(message)
 
 
 @router.edited_message(F.location)
-async def handle_live_update(message: Message):
+async def handle_live_update(message: Message, location_buffer: LocationBuffer):
     """Обработка обновлений live-локации"""
     await log_location(message)
+    location_buffer.put(message)
 
 
 async def log_location(message: Message):
@@ -62,7 +56,7 @@ async def log_location(message: Message):
         loc.latitude,
         loc.longitude,
         loc.horizontal_accuracy or "N/A",
-        "Live" if hasattr(message, 'edit_date') else "Static"
+        "Live" if message.edit_date is not None else "Static"
     )
 
 
@@ -3,11 +3,17 @@ import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 from config import Config
 from handlers import register_handlers
 from middlewares.base import setup_middlewares
+from services.classification_service import ClassificationService
+from services.location_buffer import LocationBuffer
+from services.postgres_storage import PostgresStorage
+from services.webhook_server import WebhookServer
 from utils.logger import setup_logger
 
 
@@ -29,14 +35,22 @@ async def main():
         return
 
     # Инициализация бота и диспетчера
+    session = None
+    if config.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
     bot = Bot(
         token=config.BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
 
-    # Используем MemoryStorage для состояний
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    # Состояния в Postgres, если он настроен (несколько процессов бота), иначе в памяти процесса
+    if config.FSM_DATABASE_URL:
+        storage = PostgresStorage(config)
+        await storage.start()
+    else:
+        storage = MemoryStorage()
+    dp = Dispatcher(storage=storage)  # Хранилище закрывается диспетчером при остановке
 
     # Настройка middleware
     setup_middlewares(dp)
@@ -44,12 +58,27 @@ async def main():
     # Регистрация всех хендлеров
     register_handlers(dp)
 
+    # Буфер live-локаций, доступен в хендлерах как аргумент location_buffer
+    location_buffer = LocationBuffer(config)
+    await location_buffer.start()
+    dp["location_buffer"] = location_buffer
+
+    # Сервис классификации с общим пулом соединений
+    classification_service = ClassificationService(config)
+    await classification_service.start()
+    dp["classification_service"] = classification_service
+
     try:
-        logger.info("Bot started successfully!")
-        await dp.start_polling(bot)
+        logger.info(f"Bot started successfully in {config.BOT_MODE} mode!")
+        if config.BOT_MODE == "webhook":
+            await WebhookServer(bot, dp, config).serve()
+        else:
+            await dp.start_polling(bot)
     except Exception as e:
         logger.error(f"Error starting bot: {e}")
     finally:
+        await location_buffer.close()
+        await classification_service.close()
         await bot.session.close()
 
 
@@ -1,27 +1,53 @@
 import asyncio
 from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
 from typing import Any
 
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 
 
+@dataclass(slots=True)
+class _AlbumGroup:
+    """Messages of one media group collected so far"""
+
+    ready: asyncio.Future
+    started_at: float
+    deadline: float  # Loop time when the group is considered complete
+    messages: list[Message] = field(default_factory=list)
+    timer: asyncio.TimerHandle | None = None
+
+
 class AlbumMiddleware(BaseMiddleware):
-    """Middleware for collecting and processing media group (album) messages in Aiogram."""
+    """
+    Middleware for collecting and processing media group (album) messages in Aiogram.
 
-    def __init__(self, latency: int | float = 0.1):
+    The first message of a group waits for the rest, later messages are only added to it and
+    return at once. Every message moves the group's deadline ``latency`` seconds ahead, and a single
+    timer per group fires when the deadline passes, so an album of any size costs one waiting
+    handler and one timer. A group is dispatched early once it has ``max_size`` messages or is
+    ``max_age`` seconds old.
+    """
+
+    def __init__(self, latency: int | float = 0.1, max_size: int = 10, max_age: int | float = 2.0):
         """
         Initialize the AlbumMiddleware.
 
         Args:
         ----
             latency (int | float, optional): Time in seconds to wait for collecting album messages. Defaults to 0.1.
+            max_size (int, optional): Number of messages that completes an album at once. Defaults to 10,
+                the Telegram limit.
+            max_age (int | float, optional): Maximum time in seconds to wait for an album since its first message.
+                Defaults to 2.0.
 
         """
         self.latency = latency
-        self.album_data: dict[str, dict[str, list[Message]]] = {}
+        self.max_size = max_size
+        self.max_age = max_age
+        self.album_data: dict[str, _AlbumGroup] = {}
 
-    def collect_album_messages(self, event: Message):
+    def collect_album_messages(self, event: Message) -> _AlbumGroup | None:
         """
         Collects messages that belong to the same media group (album).
 
@@ -31,16 +57,41 @@ class AlbumMiddleware(BaseMiddleware):
 
         Returns:
         -------
-            int: The total number of messages collected for the media group so far.
+            _AlbumGroup | None: The new group if the event is the first message of its media group, else None.
 
         """
-        # Check if media_group_id exists in album_data
-        if event.media_group_id not in self.album_data:
-            self.album_data[event.media_group_id] = {'messages': []}
-
-        self.album_data[event.media_group_id]['messages'].append(event)
-
-        return len(self.album_data[event.media_group_id]['messages'])
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        group = self.album_data.get(event.media_group_id)
+        created = group is None
+        if created:
+            group = self.album_data[event.media_group_id] = _AlbumGroup(loop.create_future(), now, now)
+
+        group.messages.append(event)
+        group.deadline = min(now + self.latency, group.started_at + self.max_age)
+        if len(group.messages) >= self.max_size:
+            self._complete(group)
+        elif group.timer is None:
+            group.timer = loop.call_at(group.deadline, self._on_timer, group)
+
+        return group if created else None
+
+    def _on_timer(self, group: _AlbumGroup) -> None:
+        """Completes the group or, if messages arrived meanwhile, re-arms the timer for the new deadline."""
+        loop = asyncio.get_running_loop()
+        if loop.time() < group.deadline:
+            group.timer = loop.call_at(group.deadline, self._on_timer, group)
+        else:
+            group.timer = None
+            self._complete(group)
+
+    @staticmethod
+    def _complete(group: _AlbumGroup) -> None:
+        if group.timer is not None:
+            group.timer.cancel()
+            group.timer = None
+        if not group.ready.done():
+            group.ready.set_result(None)
 
     async def __call__(
         self,
@@ -67,26 +118,22 @@ class AlbumMiddleware(BaseMiddleware):
         if event.media_group_id is None:
             return await handler(event, data)
 
-        # Collect message of the same media group
-        total_before = self.collect_album_messages(event)
-        print(f"total_before: {total_before}")
-
-        #Wait for a specified
-        await asyncio.sleep(self.latency)
-
-        total_after = len(self.album_data[event.media_group_id]['messages'])
+        # Collect message of the same media group, only its first message waits for the rest
+        group = self.collect_album_messages(event)
+        if group is None:
+            return None
 
-        # If new messages were added during the latency, exit
-        if total_before != total_after:
-            return
+        try:
+            await group.ready
+            # Later messages start a new group
+            del self.album_data[event.media_group_id]
 
-        # Sort the album messages by message_id and add to data
-        album_messages = self.album_data[event.media_group_id]['messages']
-        album_messages.sort(key=lambda m: m.message_id)
-        data['album'] = album_messages
+            # Sort the album messages by message_id and add to data
+            data['album'] = sorted(group.messages, key=lambda m: m.message_id)
 
-        # Call the original event handler
-        await handler(event,  data)
-
-        # Remove the media group from tracking to free up memory
-        del self.album_data[event.media_group_id]
+            # Call the original event handler
+            return await handler(event, data)
+        finally:
+            self._complete(group)
+            if self.album_data.get(event.media_group_id) is group:
+                del self.album_data[event.media_group_id]
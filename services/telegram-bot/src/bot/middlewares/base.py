@@ -1,11 +1,17 @@
+import asyncio
 import logging
+import math
 import time
+from collections import OrderedDict
 from typing import Any, Awaitable, Callable, Dict
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
 
+logger = logging.getLogger(__name__)
+
+
 class LoggingMiddleware(BaseMiddleware):
     """Middleware для логирования запросов"""
     
@@ -21,14 +27,14 @@ class LoggingMiddleware(BaseMiddleware):
             username = event.from_user.username or "Unknown"
             text = event.text or "No text"
             
-            logging.info(f"Message from {username}({user_id}): {text}")
+            logger.info("Message from %s(%d): %s", username, user_id, text)
             
         elif isinstance(event, CallbackQuery):
             user_id = event.from_user.id
             username = event.from_user.username or "Unknown"
             callback_data = event.data or "No data"
             
-            logging.info(f"Callback from {username}({user_id}): {callback_data}")
+            logger.info("Callback from %s(%d): %s", username, user_id, callback_data)
         
         # Засекаем время выполнения
         start_time = time.time()
@@ -36,57 +42,137 @@ class LoggingMiddleware(BaseMiddleware):
         try:
             result = await handler(event, data)
             execution_time = time.time() - start_time
-            logging.info(f"Handler executed in {execution_time:.2f}s")
+            logger.info("Handler executed in %.2fs", execution_time)
             return result
         except Exception as e:
             execution_time = time.time() - start_time
-            logging.error(f"Handler error after {execution_time:.2f}s: {e}")
+            logger.error("Handler error after %.2fs: %s", execution_time, e)
             raise
 
 
+class _Bucket:
+    """Token bucket of one user"""
+
+    __slots__ = ('media_group', 'pending', 'tokens', 'updated_at', 'warned_at')
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated_at = now
+        self.warned_at = -math.inf
+        self.media_group: tuple[str, bool] | None = None  # (media_group_id, allowed) of the last album
+        self.pending: tuple[Callable, Message, dict[str, Any]] | None = None  # Latest throttled location
+
+
 class ThrottlingMiddleware(BaseMiddleware):
     """
-    Middleware to limit the frequency of user requests (anti-flood).
-    - For single messages: applies throttling per user.
-    - For media groups (albums): throttling is applied only to the first message of the group; all messages in the group are allowed without delay.
+    Middleware to limit the frequency of user requests (anti-flood), a token bucket per user.
+
+    - A user gets one token every ``rate_limit`` seconds, up to ``burst`` tokens; every event costs one token.
+    - For media groups (albums): the whole group costs one token, its messages share the decision of the first one.
+    - Throttled locations (live-location edits) are not answered: the latest one is delivered when a token is available.
+    - The flood warning is sent at most once per ``warning_cooldown`` seconds.
+    Buckets are kept in LRU order and evicted once they would be full again anyway, so memory stays bounded
+    and every event costs O(1).
     """
-    
-    def __init__(self, rate_limit: float = 0.5):
-        self.rate_limit = rate_limit
-        self.last_request = {}
+
+    def __init__(self, rate_limit: float = 0.5, burst: int = 3, warning_cooldown: float = 10.0):
+        """Initialize the limiter, ``rate_limit`` is the number of seconds per token"""
+        self.rate = 1 / rate_limit  # Tokens per second
+        self.burst = burst
+        self.warning_cooldown = warning_cooldown
+        self.ttl = max(burst * rate_limit, warning_cooldown)
+        self.buckets: OrderedDict[int, _Bucket] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
         super().__init__()
-    
+
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
         event: Message | CallbackQuery,
         data: Dict[str, Any]
     ) -> Any:
+        if event.from_user is None:
+            return await handler(event, data)
         user_id = event.from_user.id
-        current_time = time.time()
+        now = time.monotonic()
+        self._evict(now)
+        bucket = self._take_bucket(user_id, now)
+        is_location = isinstance(event, Message) and event.location is not None
+
+        # A location is waiting for a token: newer ones replace it to keep the order
+        if is_location and bucket.pending is not None:
+            bucket.pending = (handler, event, data)
+            return None
 
-        # If this is part of a media group (album), apply throttling only to the first message in the group.
+        # If this is part of a media group (album), the decision for the first message applies to the whole group.
         if isinstance(event, Message) and event.media_group_id is not None:
-            group_key = f"{user_id}:{event.media_group_id}"
-            if group_key not in self.last_request:
-                self.last_request[group_key] = current_time
-            # Allow all messages in the group without additional throttling
+            if bucket.media_group is not None and bucket.media_group[0] == event.media_group_id:
+                return await handler(event, data) if bucket.media_group[1] else None
+            allowed = bucket.tokens >= 1
+            bucket.media_group = (event.media_group_id, allowed)
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
             return await handler(event, data)
 
-        # Standard throttling for single (non-group) messages
-        if user_id in self.last_request:
-            time_passed = current_time - self.last_request[user_id]
-            if time_passed < self.rate_limit:
-                await event.answer("⚠️ Слишком много запросов. Подождите немного.")
-                return
-        
-        self.last_request[user_id] = current_time
-        return await handler(event, data)
+        if is_location:
+            self._coalesce(bucket, handler, event, data)
+            return None
+        if now - bucket.warned_at >= self.warning_cooldown:
+            bucket.warned_at = now
+            await event.answer("⚠️ Слишком много запросов. Подождите немного.")
+        return None
+
+    def _take_bucket(self, user_id: int, now: float) -> _Bucket:
+        """Bucket of a user refilled up to now."""
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            bucket = self.buckets[user_id] = _Bucket(self.burst, now)
+            return bucket
+        self.buckets.move_to_end(user_id)
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate)
+        bucket.updated_at = now
+        return bucket
+
+    def _evict(self, now: float) -> None:
+        """Drops buckets untouched for ``ttl`` seconds, the oldest are at the front."""
+        while self.buckets:
+            bucket = next(iter(self.buckets.values()))
+            if now - bucket.updated_at < self.ttl or bucket.pending is not None:
+                break
+            self.buckets.popitem(last=False)
+
+    def _coalesce(self, bucket: _Bucket, handler: Callable, event: Message, data: dict[str, Any]) -> None:
+        """Keeps the location and schedules its delivery for the moment the next token is available."""
+        bucket.pending = (handler, event, data)
+        delay = (1 - bucket.tokens) / self.rate
+        asyncio.get_running_loop().call_later(delay, self._deliver, event.from_user.id, bucket)
+
+    def _deliver(self, user_id: int, bucket: _Bucket) -> None:
+        """Passes the latest coalesced location on to the handler."""
+        handler, event, data = bucket.pending
+        bucket.pending = None
+        now = time.monotonic()
+        bucket.tokens = max(0.0, min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate) - 1)
+        bucket.updated_at = now
+        if user_id in self.buckets:
+            self.buckets.move_to_end(user_id)
+        task = asyncio.create_task(handler(event, data))
+        self._tasks.add(task)
+        task.add_done_callback(self._on_delivered)
+
+    def _on_delivered(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Coalesced location handler error: %s", task.exception())
 
 
 def setup_middlewares(dp):
     """Настройка всех middleware"""
+    # Сообщения и правки (live-локации) расходуют общий лимит пользователя
+    message_throttling = ThrottlingMiddleware()
     dp.message.middleware(LoggingMiddleware())
-    dp.message.middleware(ThrottlingMiddleware())
+    dp.message.middleware(message_throttling)
+    dp.edited_message.middleware(message_throttling)
     dp.callback_query.middleware(LoggingMiddleware())
-    dp.callback_query.middleware(ThrottlingMiddleware()) 
\ No newline at end of file
+    dp.callback_query.middleware(ThrottlingMiddleware())
@@ -1,106 +1,166 @@
-import logging
-import aiohttp
 import asyncio
-from typing import List, Dict, Any
+import logging
+from collections.abc import AsyncIterator
 from io import BytesIO
+from typing import Any
 
+import aiohttp
+from aiogram import Bot
 from config import Config
+from utils.file_validator import SIGNATURE_LENGTH, detect_image_format
+
 
 logger = logging.getLogger(__name__)
 
+# Файл для отправки: BytesIO или асинхронный поток чанков
+FileData = BytesIO | AsyncIterator[bytes]
+
 
 class ClassificationService:
-    """Сервис для работы с API классификации"""
-    
-    def __init__(self):
-        self.base_url = Config.BACKEND_URL
-        self.timeout = aiohttp.ClientTimeout(total=Config.API_TIMEOUT)
-    
-    async def classify_single_image(self, file_data: BytesIO, filename: str) -> Dict[str, Any]:
+    """
+    Сервис для работы с API классификации
+
+    Владеет долгоживущей сессией aiohttp с пулом соединений: TCP/DNS не
+    устанавливаются заново на каждый запрос. Жизненный цикл - start()/close()
+    в main.py. Количество одновременных запросов ограничено семафором.
+    """
+
+    def __init__(self, config: Config):
+        """Инициализация сервиса, сессия создается в start()"""
+        self.base_url = config.BACKEND_URL
+        self.timeout = aiohttp.ClientTimeout(total=config.API_TIMEOUT)
+        self.max_file_size = config.MAX_FILE_SIZE
+        self.chunk_size = config.DOWNLOAD_CHUNK_SIZE
+        self.connections_per_host = config.CLASSIFICATION_CONNECTIONS_PER_HOST
+        self._semaphore = asyncio.Semaphore(config.CLASSIFICATION_CONCURRENCY)
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self) -> None:
+        """Создание общей сессии с пулом соединений"""
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.connections_per_host,
+            ttl_dns_cache=300
+        )
+        self._session = aiohttp.ClientSession(timeout=self.timeout, connector=connector)
+
+    async def close(self) -> None:
+        """Закрытие сессии и всех соединений пула"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def stream_telegram_file(self, bot: Bot, file_id: str) -> tuple[AsyncIterator[bytes], str]:
+        """
+        Потоковая загрузка файла из Telegram без полной копии в памяти
+
+        Формат проверяется по magic bytes начала файла, размер - по мере чтения.
+
+        Args:
+            bot: Экземпляр бота
+            file_id: Идентификатор файла в Telegram
+
+        Returns:
+            Кортеж (поток чанков, MIME тип)
+
+        """
+        file = await bot.get_file(file_id)
+        url = bot.session.api.file_url(bot.token, file.file_path)
+        stream = bot.session.stream_content(
+            url,
+            timeout=self.timeout.total,
+            chunk_size=self.chunk_size,
+            raise_for_status=True
+        )
+
+        # Чанки бывают короче сигнатуры, читаем до SIGNATURE_LENGTH байт или до конца файла
+        first_chunk = b''
+        while len(first_chunk) < SIGNATURE_LENGTH:
+            chunk = await anext(stream, None)
+            if chunk is None:
+                break
+            first_chunk += chunk
+        image_format = detect_image_format(first_chunk)
+        if image_format is None:
+            await stream.aclose()
+            raise ValueError("Неподдерживаемый формат файла")
+        _, content_type = image_format
+
+        async def chunks() -> AsyncIterator[bytes]:
+            size = len(first_chunk)
+            yield first_chunk
+            async for chunk in stream:
+                size += len(chunk)
+                if size > self.max_file_size:
+                    raise ValueError("Файл слишком большой")
+                yield chunk
+
+        return chunks(), content_type
+
+    async def classify_single_image(
+        self,
+        file_data: FileData,
+        filename: str,
+        content_type: str = 'image/jpeg'
+    ) -> dict[str, Any]:
         """
         Классификация одного изображения
-        
+
         Args:
-            file_data: Данные файла
+            file_data: Данные файла или поток чанков
             filename: Имя файла
-            
+            content_type: MIME тип файла
+
         Returns:
             Результат классификации
+
         """
-        try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                # Подготавливаем данные для отправки
-                data = aiohttp.FormData()
-                data.add_field(
-                    'images',
-                    file_data,
-                    filename=filename,
-                    content_type='image/jpeg'
-                )
-                
-                # Отправляем запрос
-                url = f"{self.base_url}/classify_batch"
-                
-                async with session.post(url, data=data) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"API error: {response.status} - {error_text}")
-                        raise Exception(f"API error: {response.status}")
-                        
-        except asyncio.TimeoutError:
-            logger.error("Request timeout")
-            raise Exception("Превышено время ожидания ответа от сервера")
-        except aiohttp.ClientError as e:
-            logger.error(f"Network error: {e}")
-            raise Exception("Ошибка сети при обращении к серверу")
-        except Exception as e:
-            logger.error(f"Unexpected error in classification service: {e}")
-            raise
-    
-    async def classify_multiple_images(self, files: List[tuple]) -> Dict[str, Any]:
+        return await self.classify_multiple_images([(file_data, filename, content_type)])
+
+    async def classify_multiple_images(self, files: list[tuple]) -> dict[str, Any]:
         """
         Классификация нескольких изображений
-        
+
+        Файлы-потоки передаются в multipart-запрос напрямую, чанк за чанком.
+
         Args:
-            files: Список кортежей (file_data, filename)
-            
+            files: Список кортежей (file_data, filename) или (file_data, filename, content_type)
+
         Returns:
             Результат классификации
+
         """
+        # Подготавливаем данные для отправки
+        data = aiohttp.FormData()
+        for file_data, filename, *rest in files:
+            data.add_field(
+                'images',
+                file_data,
+                filename=filename,
+                content_type=rest[0] if rest else 'image/jpeg'
+            )
+
+        return await self._post(data)
+
+    async def _post(self, data: aiohttp.FormData) -> dict[str, Any]:
+        """Отправка multipart-запроса через общую сессию"""
+        if self._session is None:
+            raise RuntimeError("ClassificationService is not started")
+
+        url = f"{self.base_url}/classify_batch"
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                # Подготавливаем данные для отправки
-                data = aiohttp.FormData()
-                
-                for file_data, filename in files:
-                    data.add_field(
-                        'images',
-                        file_data,
-                        filename=filename,
-                        content_type='image/jpeg'
-                    )
-                
-                # Отправляем запрос
-                url = f"{self.base_url}/classify_batch"
-                
-                async with session.post(url, data=data) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"API error: {response.status} - {error_text}")
-                        raise Exception(f"API error: {response.status}")
-                        
-        except asyncio.TimeoutError:
+            async with self._semaphore, self._session.post(url, data=data) as response:
+                if response.status == 200:
+                    return await response.json()
+                error_text = await response.text()
+                logger.error(f"API error: {response.status} - {error_text}")
+                raise Exception(f"API error: {response.status}")
+
+        except TimeoutError as e:
             logger.error("Request timeout")
-            raise Exception("Превышено время ожидания ответа от сервера")
+            raise Exception("Превышено время ожидания ответа от сервера") from e
         except aiohttp.ClientError as e:
             logger.error(f"Network error: {e}")
-            raise Exception("Ошибка сети при обращении к серверу")
+            raise Exception("Ошибка сети при обращении к серверу") from e
         except Exception as e:
             logger.error(f"Unexpected error in classification service: {e}")
             raise
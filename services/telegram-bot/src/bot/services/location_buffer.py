@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+import aiohttp
+from aiogram.types import Message
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+
+def to_location_payload(message: Message) -> dict[str, Any]:
+    """
+    Converts a Telegram location message into a backend ``LocationCreate`` payload.
+
+    Args:
+    ----
+        message (Message): Message (or edited message) carrying ``message.location``.
+
+    Returns:
+    -------
+        dict: Payload for ``POST /location/tracks``.
+
+    """
+    loc = message.location
+    # edit_date is a unix timestamp in aiogram, date is already a datetime
+    date_time = datetime.fromtimestamp(message.edit_date, UTC) if message.edit_date else message.date
+    return {
+        'user_id': message.from_user.id,
+        'date_time': date_time.isoformat(),
+        'latitude': loc.latitude,
+        'longitude': loc.longitude,
+        'accuracy': loc.horizontal_accuracy or 0.0,  # 0 - accuracy was not reported
+        'raw_data': {
+            'chat_id': message.chat.id,
+            'message_id': message.message_id,
+            'live_period': loc.live_period,
+            'heading': loc.heading,
+            'live': message.edit_date is not None,
+        },
+    }
+
+
+class LocationBuffer:
+    """
+    Per-process write-behind queue for live-location updates.
+
+    Points are collected in a bounded queue and sent to the backend in batches, either when
+    ``batch_size`` points are collected or when ``flush_interval`` seconds pass since the first
+    point of the batch. A single pooled ``aiohttp.ClientSession`` is used for all flushes.
+    When the queue is full, the oldest point is dropped: for live locations the newest
+    position is the most valuable one.
+    """
+
+    def __init__(self, config: Config):
+        """
+        Initialize the LocationBuffer.
+
+        Args:
+        ----
+            config (Config): Bot configuration with backend URL and buffer settings.
+
+        """
+        self.url = f"{config.BACKEND_URL}/location/tracks"
+        self.timeout = aiohttp.ClientTimeout(total=config.API_TIMEOUT)
+        self.batch_size = config.LOCATION_BATCH_SIZE
+        self.flush_interval = config.LOCATION_FLUSH_INTERVAL
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=config.LOCATION_QUEUE_SIZE)
+        self._batch: list[dict[str, Any]] = []  # Batch being collected/sent right now
+        self._session: aiohttp.ClientSession | None = None
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+        # Metrics
+        self.max_queue_depth = 0
+        self.points_sent = 0
+        self.points_dropped = 0
+        self.points_failed = 0
+        self.flushes = 0
+        self.flush_time_total = 0.0
+        self.last_flush_latency = 0.0
+
+    async def start(self) -> None:
+        """Opens the pooled HTTP session and starts the background flush task."""
+        self._session = aiohttp.ClientSession(timeout=self.timeout)
+        self._task = asyncio.create_task(self._run(), name="location-buffer")
+
+    def put(self, message: Message) -> bool:
+        """
+        Enqueues the location of a message without waiting for the backend.
+
+        Returns
+        -------
+            bool: False if the buffer is closed and the point was not accepted.
+
+        """
+        if self._closed:
+            return False
+        payload = to_location_payload(message)
+        if self._queue.full():
+            self._queue.get_nowait()  # Drop the oldest point to keep memory bounded
+            self.points_dropped += 1
+        self._queue.put_nowait(payload)
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return True
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of points waiting to be sent."""
+        return self._queue.qsize()
+
+    def stats(self) -> dict[str, float]:
+        """Returns buffer metrics: queue depth, sent/dropped/failed counters and flush latency."""
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'points_sent': self.points_sent,
+            'points_dropped': self.points_dropped,
+            'points_failed': self.points_failed,
+            'flushes': self.flushes,
+            'last_flush_latency': self.last_flush_latency,
+            'avg_flush_latency': self.flush_time_total / self.flushes if self.flushes else 0.0,
+        }
+
+    async def _run(self) -> None:
+        """Collects batches by size or time and flushes them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(self._batch) < self.batch_size:
+                try:
+                    self._batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except TimeoutError:
+                    break
+            await self._flush(self._batch)
+            self._batch = []
+
+    async def _flush(self, batch: list[dict[str, Any]]) -> None:
+        """Sends one batch to the backend, failures are logged and counted."""
+        start_time = time.perf_counter()
+        try:
+            async with self._session.post(self.url, json={'points': batch}) as response:
+                if response.status >= 400:
+                    error_text = await response.text()
+                    logger.error(f"Backend rejected location batch: {response.status} - {error_text}")
+                    self.points_failed += len(batch)
+                    return
+                result = await response.json()
+                self.points_sent += result.get('accepted', len(batch))
+        except (TimeoutError, aiohttp.ClientError) as e:
+            logger.error(f"Failed to send {len(batch)} locations: {e}")
+            self.points_failed += len(batch)
+        finally:
+            self.last_flush_latency = time.perf_counter() - start_time
+            self.flush_time_total += self.last_flush_latency
+            self.flushes += 1
+            logger.debug(
+                "Location batch of %d flushed in %.3fs, queue depth %d",
+                len(batch), self.last_flush_latency, self.queue_depth
+            )
+
+    async def close(self) -> None:
+        """Stops accepting points, drains the queue to the backend and closes the session."""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        # Drain: the interrupted batch first, then everything left in the queue
+        pending = self._batch
+        self._batch = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if self._session is not None:
+            for i in range(0, len(pending), self.batch_size):
+                await self._flush(pending[i:i + self.batch_size])
+            await self._session.close()
+        logger.info(f"Location buffer closed: {self.stats()}")
@@ -0,0 +1,275 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+import asyncpg
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _Entry:
+    """Cached state and data of one storage key"""
+
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM storage in Postgres shared by several bot processes.
+
+    Reads are served from a local LRU cache, so ``state.get_state()`` hits the database only on a miss.
+    Writes update the cache at once and are flushed in the background every ``flush_interval``
+    seconds, all keys changed in between are written in one transaction (several writes to one key
+    coalesce into one row). Every flush sends ``NOTIFY`` with the changed keys, other processes drop
+    them from their caches. If the listening connection is lost, the cache is cleared and reads go
+    to the database until it is restored.
+
+    Processes see each other's writes only after the flush, up to ``flush_interval`` later, and
+    concurrent writes to one key from two processes are resolved by the last flush. Updates of one
+    chat must therefore be handled by one process (e.g. webhook updates routed by chat id), several
+    processes may share the storage only for different chats.
+    """
+
+    CHANNEL = 'fsm_storage'
+
+    def __init__(self, config: Config):
+        """
+        Initialize the PostgresStorage.
+
+        Args:
+        ----
+            config (Config): Bot configuration with the FSM database URL and cache settings.
+
+        """
+        self.dsn = config.FSM_DATABASE_URL
+        self.table = config.FSM_TABLE
+        self.flush_interval = config.FSM_FLUSH_INTERVAL
+        self.cache_size = config.FSM_CACHE_SIZE
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._origin = uuid.uuid4().hex  # Own notifications are ignored
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._inflight: set[str] = set()  # Keys being written by a running flush
+        self._fetches: dict[str, int] = {}  # Running fetches of each key
+        self._generations: dict[str, int] = {}  # Invalidations of each key while it is being fetched
+        self._pool: asyncpg.Pool | None = None
+        self._listener: asyncpg.Connection | None = None
+        self._task: asyncio.Task | None = None
+
+        # Metrics
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    async def start(self) -> None:
+        """Creates the connection pool and the table, starts listening and the flush task."""
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=4)
+        async with self._pool.acquire() as conn:
+            await conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data JSONB NOT NULL DEFAULT '{{}}',
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+                """
+            )
+        await self._listen()
+        self._task = asyncio.create_task(self._run(), name="fsm-storage-flush")
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        """Sets the state, written to the database by the next flush."""
+        entry = await self._entry(key, write=True)
+        entry.state = state.state if isinstance(state, State) else state
+        self._dirty.add(self.key_builder.build(key))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        """Gets the state, from the local cache if possible."""
+        return (await self._entry(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        """Replaces the data, written to the database by the next flush."""
+        entry = await self._entry(key, write=True)
+        entry.data = dict(data)
+        self._dirty.add(self.key_builder.build(key))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        """Gets a copy of the data, from the local cache if possible."""
+        return (await self._entry(key)).data.copy()
+
+    async def close(self) -> None:
+        """Flushes pending writes and closes the connections; called by the dispatcher on shutdown."""
+        if self._pool is None:
+            return
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._flush()
+        if self._listener is not None:
+            await self._pool.release(self._listener)
+            self._listener = None
+        await self._pool.close()
+        self._pool = None
+        logger.info(
+            f"FSM storage closed: {self.cache_hits} cache hits, {self.cache_misses} misses, "
+            f"{self.rows_written} rows written in {self.flushes} flushes"
+        )
+
+    async def _entry(self, key: StorageKey, write: bool = False) -> _Entry:
+        """
+        Cached entry of a key, loaded from the database on a miss.
+
+        A cached entry may lag behind a write of another process until its flush (see the class
+        docstring). A row whose key was invalidated while it was being fetched may predate that
+        write, so it is fetched again instead of being cached.
+        """
+        storage_key = self.key_builder.build(key)
+        entry = self._cache.get(storage_key)
+        # Without invalidations only entries with own pending writes can be trusted
+        if entry is not None and (self._listener is not None or self._pinned(storage_key)):
+            self.cache_hits += 1
+            self._cache.move_to_end(storage_key)
+            return entry
+
+        self.cache_misses += 1
+        row = await self._fetch(storage_key)
+        # Another coroutine may have changed the key while we were waiting
+        entry = self._cache.get(storage_key) if self._pinned(storage_key) else None
+        if entry is None:
+            entry = _Entry(row['state'], json.loads(row['data'])) if row is not None else _Entry()
+            if write or self._listener is not None:
+                self._cache[storage_key] = entry
+                self._evict()
+        return entry
+
+    async def _fetch(self, storage_key: str) -> asyncpg.Record | None:
+        """Reads the row of a key, again if an invalidation of the key arrived meanwhile."""
+        self._fetches[storage_key] = self._fetches.get(storage_key, 0) + 1
+        self._generations.setdefault(storage_key, 0)
+        try:
+            while True:
+                generation = self._generations[storage_key]
+                row = await self._pool.fetchrow(f"SELECT state, data FROM {self.table} WHERE key = $1", storage_key)
+                if self._generations[storage_key] == generation:
+                    return row
+        finally:
+            self._fetches[storage_key] -= 1
+            if not self._fetches[storage_key]:
+                del self._fetches[storage_key]
+                del self._generations[storage_key]
+
+    def _pinned(self, storage_key: str) -> bool:
+        """Whether the cached entry has writes not yet committed and must stay in the cache."""
+        return storage_key in self._dirty or storage_key in self._inflight
+
+    def _evict(self) -> None:
+        """Drops least recently used entries that have no pending writes."""
+        for storage_key in list(self._cache):
+            if len(self._cache) <= self.cache_size:
+                break
+            if not self._pinned(storage_key):
+                del self._cache[storage_key]
+
+    async def _run(self) -> None:
+        """Flushes pending writes every ``flush_interval`` seconds and restores a lost listener."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+            if self._listener is None:
+                await self._listen()
+
+    async def _flush(self) -> None:
+        """Writes all changed keys in one transaction and notifies the other processes."""
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        # Written keys stay in the cache until the commit, a failed flush marks them dirty again
+        self._inflight |= keys
+        upserts = []
+        deletes = []
+        for storage_key in keys:
+            entry = self._cache[storage_key]
+            if entry.state is None and not entry.data:
+                deletes.append((storage_key,))
+            else:
+                upserts.append((storage_key, entry.state, json.dumps(entry.data)))
+        try:
+            async with self._pool.acquire() as conn, conn.transaction():
+                if upserts:
+                    await conn.executemany(
+                        f"""
+                        INSERT INTO {self.table} (key, state, data) VALUES ($1, $2, $3::jsonb)
+                        ON CONFLICT (key) DO UPDATE
+                        SET state = excluded.state, data = excluded.data, updated_at = now()
+                        """,
+                        upserts
+                    )
+                if deletes:
+                    await conn.executemany(f"DELETE FROM {self.table} WHERE key = $1", deletes)
+                # Delivered on commit
+                await conn.executemany(
+                    "SELECT pg_notify($1, $2)",
+                    [(self.CHANNEL, f"{self._origin}|{storage_key}") for storage_key in keys]
+                )
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.error(f"Failed to flush {len(keys)} FSM keys: {e}")
+            self._dirty |= keys
+            return
+        except asyncio.CancelledError:
+            self._dirty |= keys
+            raise
+        finally:
+            self._inflight -= keys
+        self.flushes += 1
+        self.rows_written += len(keys)
+        self._evict()
+
+    async def _listen(self) -> None:
+        """Subscribes a dedicated connection to invalidations of other processes."""
+        try:
+            self._listener = await self._pool.acquire()
+            self._listener.add_termination_listener(self._on_listener_lost)
+            await self._listener.add_listener(self.CHANNEL, self._on_notify)
+            self._clear_cache()  # Changes made while not listening were missed
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.error(f"Failed to listen for FSM invalidations: {e}")
+            if self._listener is not None:
+                await self._pool.release(self._listener)
+                self._listener = None
+
+    def _on_notify(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        origin, storage_key = payload.split('|', 1)
+        if origin == self._origin:
+            return
+        if storage_key in self._generations:
+            self._generations[storage_key] += 1
+        if not self._pinned(storage_key):
+            self._cache.pop(storage_key, None)
+
+    def _on_listener_lost(self, connection: asyncpg.Connection) -> None:
+        logger.warning("FSM invalidation listener lost, clearing the cache")
+        self._listener = None
+        self._clear_cache()
+
+    def _clear_cache(self) -> None:
+        """Drops all cached entries without pending writes, running fetches are repeated."""
+        for storage_key in [key for key in self._cache if not self._pinned(key)]:
+            del self._cache[storage_key]
+        for storage_key in self._generations:
+            self._generations[storage_key] += 1
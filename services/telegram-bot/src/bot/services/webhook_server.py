@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import signal
+import time
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def update_shard_key(update: dict) -> int:
+    """
+    Chat (or user) id of a raw update, used to pin all updates of one chat to one worker.
+
+    Returns
+    -------
+        int: Id of the chat/user, or the update id for updates without one.
+
+    """
+    for event in update.values():
+        if not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat is not None:
+            return chat["id"]
+        user = event.get("from") or event.get("user")
+        if user is not None:
+            return user["id"]
+    return update.get("update_id", 0)
+
+
+class WebhookServer:
+    """
+    Webhook receiver with a pool of update workers.
+
+    The HTTP handler only validates the update and puts it into the queue of one of
+    ``workers`` worker tasks, which run ``dp.feed_update``. Updates of one chat always go to the
+    same worker, so they are handled in order, while different chats are handled concurrently.
+    Queues are bounded: when the queue of a worker is full the request is answered with 503
+    and Telegram delivers the update again later, which slows the incoming stream down instead
+    of growing memory. On shutdown the server stops accepting updates and the workers
+    finish the queued ones.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, config: Config):
+        """
+        Initialize the WebhookServer.
+
+        Args:
+        ----
+            bot (Bot): Bot instance passed to the handlers.
+            dp (Dispatcher): Dispatcher with registered routers and middlewares.
+            config (Config): Bot configuration with webhook settings.
+
+        """
+        self.bot = bot
+        self.dp = dp
+        self.url = config.WEBHOOK_URL
+        self.path = config.WEBHOOK_PATH
+        self.host = config.WEBHOOK_HOST
+        self.port = config.WEBHOOK_PORT
+        self.secret = config.WEBHOOK_SECRET
+        self.shutdown_timeout = config.WEBHOOK_SHUTDOWN_TIMEOUT
+        queue_size = max(1, config.WEBHOOK_QUEUE_SIZE // config.WEBHOOK_WORKERS)
+        self._queues: list[asyncio.Queue[Update]] = [
+            asyncio.Queue(maxsize=queue_size) for _ in range(config.WEBHOOK_WORKERS)
+        ]
+        self._workers: list[asyncio.Task] = []
+        self._runner: web.AppRunner | None = None
+        self._stop = asyncio.Event()
+
+        # Metrics
+        self.updates_received = 0
+        self.updates_rejected = 0
+        self.updates_processed = 0
+        self.updates_failed = 0
+        self.max_queue_depth = 0
+        self.processing_time_total = 0.0
+
+    async def serve(self) -> None:
+        """Runs the server until SIGINT/SIGTERM, then shuts down gracefully."""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stop.set)
+        await self.start()
+        try:
+            await self._stop.wait()
+        finally:
+            await self.stop()
+
+    async def start(self) -> None:
+        """Starts the workers and the HTTP server and registers the webhook."""
+        await self.dp.emit_startup(bot=self.bot, **self.dp.workflow_data)
+        self._workers = [
+            asyncio.create_task(self._work(queue), name=f"webhook-worker-{i}") for i, queue in enumerate(self._queues)
+        ]
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        self._runner = web.AppRunner(app, handle_signals=False)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Webhook server listening on {self.host}:{self.port}{self.path}")
+
+        if self.url:
+            await self.bot.set_webhook(
+                f"{self.url.rstrip('/')}{self.path}",
+                secret_token=self.secret or None,
+                allowed_updates=self.dp.resolve_used_update_types(),
+            )
+            logger.info("Webhook registered")
+
+    async def stop(self) -> None:
+        """Stops accepting updates, lets the workers finish the queued ones and runs shutdown handlers."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)), self.shutdown_timeout
+            )
+        except TimeoutError:
+            left = sum(queue.qsize() for queue in self._queues)
+            logger.warning(f"Shutdown timeout, {left} queued updates are dropped")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.dp.emit_shutdown(bot=self.bot, **self.dp.workflow_data)
+        logger.info(f"Webhook server stopped: {self.stats()}")
+
+    def stats(self) -> dict[str, float]:
+        """Returns server metrics: queue depth, received/rejected/processed/failed counters and latency."""
+        return {
+            'queue_depth': sum(queue.qsize() for queue in self._queues),
+            'max_queue_depth': self.max_queue_depth,
+            'updates_received': self.updates_received,
+            'updates_rejected': self.updates_rejected,
+            'updates_processed': self.updates_processed,
+            'updates_failed': self.updates_failed,
+            'avg_processing_time': (
+                self.processing_time_total / self.updates_processed if self.updates_processed else 0.0
+            ),
+        }
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        """Validates an incoming update and queues it for its worker."""
+        if self.secret and request.headers.get(SECRET_HEADER) != self.secret:
+            return web.Response(status=401)
+        try:
+            data = await request.json()
+            update = Update.model_validate(data, context={"bot": self.bot})
+        except ValueError:
+            return web.Response(status=400)
+
+        self.updates_received += 1
+        queue = self._queues[update_shard_key(data) % len(self._queues)]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Backpressure: Telegram retries undelivered updates
+            self.updates_rejected += 1
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        self.max_queue_depth = max(self.max_queue_depth, queue.qsize())
+        return web.Response()
+
+    async def _work(self, queue: asyncio.Queue[Update]) -> None:
+        """Handles updates of one queue one by one."""
+        while True:
+            update = await queue.get()
+            start_time = time.perf_counter()
+            try:
+                await self.dp.feed_update(self.bot, update)
+                self.updates_processed += 1
+            except Exception as e:
+                self.updates_failed += 1
+                logger.error(f"Error handling update {update.update_id}: {e}", exc_info=e)
+            finally:
+                self.processing_time_total += time.perf_counter() - start_time
+                queue.task_done()
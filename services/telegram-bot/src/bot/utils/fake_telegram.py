@@ -0,0 +1,177 @@
+"""
+Fake Telegram for load testing the webhook mode.
+
+Start the fake Bot API and point the bot to it (``TELEGRAM_API_URL=http://localhost:8081``,
+``BOT_MODE=webhook``), generate an update stream (or take recorded raw updates, one JSON object
+per line) and replay it::
+
+    python -m utils.fake_telegram serve --port 8081
+    python -m utils.fake_telegram generate --users 200 --updates 50 > updates.jsonl
+    python -m utils.fake_telegram replay updates.jsonl --webhook http://localhost:8080/webhook
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+
+FAKE_BOT_USER = {"id": 1, "is_bot": True, "first_name": "WanderLog", "username": "fake_wanderlog_bot"}
+
+
+def fake_result(method: str, params: dict, message_ids: itertools.count) -> object:
+    """Minimal valid result of a Bot API method."""
+    method = method.lower()
+    if method == "getme":
+        return FAKE_BOT_USER
+    if method == "getfile":
+        return {"file_id": params.get("file_id", ""), "file_unique_id": "fake", "file_size": 0}
+    if method.startswith("send") and method != "sendchataction":
+        chat_id = int(params.get("chat_id", 0))
+        return {
+            "message_id": next(message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": FAKE_BOT_USER,
+            "text": params.get("text", ""),
+        }
+    return True
+
+
+def create_fake_api() -> web.Application:
+    """Application answering every ``/bot<token>/<method>`` call with a successful fake result."""
+    message_ids = itertools.count(1)
+    calls: dict[str, int] = {}
+
+    async def handle(request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post()) if request.can_read_body else {}
+        calls[method] = calls.get(method, 0) + 1
+        return web.json_response({"ok": True, "result": fake_result(method, params, message_ids)})
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(calls)
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+def generate_live_locations(users: int, updates_per_user: int, interval: int = 3) -> list[dict]:
+    """
+    Synthetic stream of live-location updates: one initial location per user, then edits.
+
+    Returns
+    -------
+        list[dict]: Raw updates ordered by time, as Telegram would deliver them.
+
+    """
+    start = int(time.time())
+    updates = []
+    update_id = itertools.count(1)
+    for user_id in range(1, users + 1):
+        user = {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+        chat = {"id": user_id, "type": "private"}
+        lat = 55.75 + random.uniform(-0.1, 0.1)
+        lon = 37.62 + random.uniform(-0.1, 0.1)
+        for i in range(updates_per_user):
+            lat += random.uniform(-0.0002, 0.0002)
+            lon += random.uniform(-0.0002, 0.0002)
+            message = {
+                "message_id": 1,
+                "date": start,
+                "chat": chat,
+                "from": user,
+                "location": {"latitude": lat, "longitude": lon, "horizontal_accuracy": 10, "live_period": 3600},
+            }
+            if i == 0:
+                updates.append({"update_id": 0, "message": message})
+            else:
+                message["edit_date"] = start + i * interval
+                updates.append({"update_id": 0, "edited_message": message})
+    updates.sort(key=lambda update: (update.get("edited_message") or update["message"]).get("edit_date", start))
+    for update in updates:
+        update["update_id"] = next(update_id)
+    return updates
+
+
+async def replay(updates: list[dict], webhook: str, concurrency: int, secret: str | None) -> dict[str, float]:
+    """
+    Posts updates to a webhook with ``concurrency`` parallel requests, retrying on 503.
+
+    Returns
+    -------
+        dict: Number of updates, retries and errors, elapsed time and throughput.
+
+    """
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    queue: asyncio.Queue[dict] = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+    result = {"updates": len(updates), "retries": 0, "errors": 0}
+
+    async def sender(session: aiohttp.ClientSession) -> None:
+        while not queue.empty():
+            update = queue.get_nowait()
+            delay = 0.05
+            while True:
+                async with session.post(webhook, json=update, headers=headers) as response:
+                    if response.status != 503:
+                        if response.status >= 400:
+                            result["errors"] += 1
+                        break
+                result["retries"] += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+
+    start_time = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(sender(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+    result["elapsed"] = elapsed
+    result["updates_per_second"] = len(updates) / elapsed if elapsed else 0.0
+    return result
+
+
+def main() -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the fake Bot API")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8081)
+
+    generate_parser = commands.add_parser("generate", help="print a synthetic live-location stream")
+    generate_parser.add_argument("--users", type=int, default=100)
+    generate_parser.add_argument("--updates", type=int, default=20, help="updates per user")
+
+    replay_parser = commands.add_parser("replay", help="replay a JSON lines update stream against a webhook")
+    replay_parser.add_argument("file")
+    replay_parser.add_argument("--webhook", default="http://127.0.0.1:8080/webhook")
+    replay_parser.add_argument("--concurrency", type=int, default=50)
+    replay_parser.add_argument("--secret", default=None)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        web.run_app(create_fake_api(), host=args.host, port=args.port)
+    elif args.command == "generate":
+        for update in generate_live_locations(args.users, args.updates):
+            sys.stdout.write(json.dumps(update) + "\n")
+    else:
+        with open(args.file, encoding="utf-8") as file:
+            updates = [json.loads(line) for line in file if line.strip()]
+        result = asyncio.run(replay(updates, args.webhook, args.concurrency, args.secret))
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
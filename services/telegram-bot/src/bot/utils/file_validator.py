@@ -2,6 +2,15 @@ from aiogram.types import Document
 from config import Config
 
 
+# Сигнатуры (magic bytes) поддерживаемых форматов
+IMAGE_SIGNATURES = {
+    b'\xff\xd8\xff': ('jpeg', 'image/jpeg'),
+    b'\x89PNG\r\n\x1a\n': ('png', 'image/png'),
+}
+# Байт, достаточных для определения любого из форматов (RIFF....WEBP)
+SIGNATURE_LENGTH = 12
+
+
 def validate_image_file(document: Document) -> bool:
     """
     Проверка, что документ является изображением
@@ -42,4 +51,23 @@ def get_file_extension(filename: str) -> str:
     Returns:
         Расширение файла в нижнем регистре
     """
-    return filename.lower().split('.')[-1] if '.' in filename else '' 
\ No newline at end of file
+    return filename.lower().split('.')[-1] if '.' in filename else '' 
+
+
+def detect_image_format(header: bytes) -> tuple[str, str] | None:
+    """
+    Определение формата изображения по первым байтам файла
+
+    Args:
+        header: Начало файла, не короче SIGNATURE_LENGTH байт (если файл не короче)
+
+    Returns:
+        Кортеж (формат, MIME тип) или None, если формат не поддерживается
+
+    """
+    for signature, image_format in IMAGE_SIGNATURES.items():
+        if header.startswith(signature):
+            return image_format
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp', 'image/webp'
+    return None
@@ -0,0 +1,82 @@
+# Kept identical in services/python-backend/src/app/log_handlers.py and
+# services/telegram-bot/src/bot/utils/log_handlers.py: the services are built from separate
+# Docker contexts and share no package. Change both copies together.
+import copy
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue handler that never waits.
+
+    If the writing thread falls behind and the queue is full, records are dropped and counted
+    instead of blocking the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        """Initialize the handler"""
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        """Puts a record into the queue, drops it if the queue is full"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Copies a record for the writing thread.
+
+        Arguments of simple types are kept, the target handlers may format them on their own
+        (uvicorn's access formatter does); other arguments could change before the record is written,
+        so such messages are rendered right away.
+        """
+        args = record.args.values() if isinstance(record.args, dict) else record.args or ()
+        if all(isinstance(arg, str | int | float | None) for arg in args):
+            return copy.copy(record)
+        return super().prepare(record)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limits repeated messages (per-request, per-update or per-location logs) to ``limit`` records per ``interval``.
+
+    Records are counted by call site (file and line) and level in fixed time windows, so messages
+    formatted before the call (f-strings) are limited too and the state is bounded by the number of
+    logging calls hit per window. The first record of a call site after suppression tells how many
+    were dropped.
+    """
+
+    def __init__(self, limit: int, interval: float):
+        """Initialize the filter"""
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self._window_start = time.monotonic()
+        self._counts: dict[tuple, int] = {}
+        self._suppressed: dict[tuple, int] = {}  # Suppressed in the previous window
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Whether the record is written"""
+        if self.limit <= 0:
+            return True
+        now = time.monotonic()
+        if now - self._window_start >= self.interval:
+            self._suppressed = {key: count - self.limit for key, count in self._counts.items() if count > self.limit}
+            self._counts = {}
+            self._window_start = now
+
+        key = (record.pathname, record.lineno, record.levelno)
+        count = self._counts[key] = self._counts.get(key, 0) + 1
+        if count > self.limit:
+            return False
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = None
+        return True
@@ -1,11 +1,25 @@
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueListener
 
 from config import Config
 
+from utils.log_handlers import NonBlockingQueueHandler, RateLimitFilter
+
+
+_listeners: list[QueueListener] = []
+
+
+def stop_logging():
+    """Записывает оставшиеся сообщения и останавливает фоновый поток"""
+    while _listeners:
+        _listeners.pop().stop()
+
 
 def setup_logger():
-    """Настройка логирования для бота"""
+    """Настройка логирования для бота: запись в консоль и файл идет в фоновом потоке через очередь"""
     config = Config()
     # Создаем форматтер
     formatter = logging.Formatter(config.LOG_FORMAT)
@@ -15,20 +29,32 @@ def setup_logger():
     root_logger.setLevel(getattr(logging, config.LOG_LEVEL.upper()))
 
     # Очищаем существующие хендлеры
+    stop_logging()
     root_logger.handlers.clear()
 
     # Создаем хендлер для консоли
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    handlers: list[logging.Handler] = [console_handler]
 
     # Создаем хендлер для файла (опционально)
-    try:
-        file_handler = logging.FileHandler('bot.log', encoding='utf-8')
-        file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
-    except Exception as e:
-        print(f"Warning: Could not create file handler: {e}")
+    if config.LOG_FILE:
+        try:
+            file_handler = logging.FileHandler(config.LOG_FILE, encoding='utf-8')
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
+        except Exception as e:
+            print(f"Warning: Could not create file handler: {e}")
+
+    # Хендлеры пишут в фоновом потоке, event loop только кладет записи в очередь
+    log_queue = queue.Queue(config.LOG_QUEUE_SIZE)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(config.LOG_RATE_LIMIT, config.LOG_RATE_INTERVAL))
+    root_logger.addHandler(queue_handler)
+    listener.start()
+    _listeners.append(listener)
+    atexit.register(stop_logging)
 
     # Устанавливаем уровень для сторонних библиотек
     logging.getLogger('aiogram').setLevel(logging.INFO)
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from config import Config
+from services.classification_service import ClassificationService
+from utils.file_validator import detect_image_format
+
+
+WEBP = b'RIFF\x24\x00\x00\x00WEBPVP8 ' + b'\x00' * 20
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 20
+JPEG = b'\xff\xd8\xff\xe0' + b'\x00' * 20
+
+
+class FakeSession:
+    def __init__(self, content: bytes, chunk_size: int):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.api = SimpleNamespace(file_url=lambda token, path: f'https://files/{path}')
+
+    async def stream_content(self, url, timeout, chunk_size, raise_for_status):
+        for offset in range(0, len(self.content), self.chunk_size):
+            yield self.content[offset:offset + self.chunk_size]
+
+
+class FakeBot:
+    token = 'token'
+
+    def __init__(self, content: bytes, chunk_size: int):
+        self.session = FakeSession(content, chunk_size)
+
+    async def get_file(self, file_id):
+        return SimpleNamespace(file_path='photos/file')
+
+
+async def read_file(content: bytes, chunk_size: int) -> tuple[bytes, str]:
+    service = ClassificationService(Config())
+    chunks, content_type = await service.stream_telegram_file(FakeBot(content, chunk_size), 'file-id')
+    return b''.join([chunk async for chunk in chunks]), content_type
+
+
+@pytest.mark.parametrize(
+    ('header', 'expected'),
+    [
+        (JPEG, ('jpeg', 'image/jpeg')),
+        (PNG, ('png', 'image/png')),
+        (WEBP, ('webp', 'image/webp')),
+        (b'RIFF\x24\x00\x00\x00WAVE', None),
+        (b'GIF89a', None),
+        (b'', None),
+    ]
+)
+def test_detect_image_format(header, expected):
+    assert detect_image_format(header) == expected
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 11, 12, 64])
+def test_format_is_detected_across_short_chunks(chunk_size):
+    content, content_type = asyncio.run(read_file(WEBP, chunk_size))
+    assert content == WEBP
+    assert content_type == 'image/webp'
+
+
+def test_file_shorter_than_signature_is_rejected():
+    with pytest.raises(ValueError, match="Неподдерживаемый формат"):
+        asyncio.run(read_file(b'RIFF', 2))
@@ -0,0 +1,86 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from aiogram.fsm.storage.base import StorageKey
+from services.postgres_storage import PostgresStorage
+
+
+class FakePool:
+    """Pool whose writes block until ``release`` is set and then fail, reads come from ``rows``"""
+
+    def __init__(self):
+        self.rows = {}
+        self.on_fetch = None
+        self.fetches = 0
+        self.release = asyncio.Event()
+
+    async def fetchrow(self, query, key):
+        self.fetches += 1
+        row = self.rows.get(key)
+        if self.on_fetch is not None:
+            on_fetch, self.on_fetch = self.on_fetch, None
+            on_fetch(key)
+        return row
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def executemany(self, query, args):
+        await self.release.wait()
+        raise OSError("connection lost")
+
+
+def make_storage(cache_size: int = 1) -> PostgresStorage:
+    config = SimpleNamespace(FSM_DATABASE_URL='', FSM_TABLE='fsm', FSM_FLUSH_INTERVAL=0.5, FSM_CACHE_SIZE=cache_size)
+    storage = PostgresStorage(config)
+    storage._pool = FakePool()
+    storage._listener = object()  # Invalidations are delivered
+    return storage
+
+
+def make_key(chat_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=chat_id, user_id=chat_id)
+
+
+def test_keys_of_a_running_flush_are_not_evicted():
+    async def scenario():
+        storage = make_storage(cache_size=1)
+        await storage.set_state(make_key(1), 'first')
+        flush = asyncio.create_task(storage._flush())
+        await asyncio.sleep(0)
+        # Eviction and invalidation while the write of key 1 is in flight
+        await storage.get_state(make_key(2))
+        storage._on_notify(None, 0, storage.CHANNEL, f"other|{storage.key_builder.build(make_key(1))}")
+        storage._pool.release.set()
+        await flush  # Fails, the key is dirty again
+        return storage
+
+    storage = asyncio.run(scenario())
+    key = storage.key_builder.build(make_key(1))
+    assert storage._dirty == {key}
+    assert storage._cache[key].state == 'first'  # The next flush writes it
+    assert not storage._inflight
+
+
+def test_row_invalidated_during_its_fetch_is_fetched_again():
+    storage = make_storage(cache_size=10)
+    key = storage.key_builder.build(make_key(1))
+    storage._pool.rows[key] = {'state': 'old', 'data': json.dumps({})}
+
+    def other_process_writes(key):
+        storage._pool.rows[key] = {'state': 'new', 'data': json.dumps({})}
+        storage._on_notify(None, 0, storage.CHANNEL, f"other|{key}")
+
+    storage._pool.on_fetch = other_process_writes
+
+    assert asyncio.run(storage.get_state(make_key(1))) == 'new'
+    assert storage._pool.fetches == 2
+    assert storage._cache[key].state == 'new'
+    assert not storage._generations
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+import pytest
+from aiogram.types import Chat, Location, Message, User
+from middlewares import base
+from middlewares.base import ThrottlingMiddleware
+
+
+class FakeMessage(Message):
+    async def answer(self, text, **kwargs):
+        warnings.append((self.from_user.id, text))
+
+
+warnings: list[tuple[int, str]] = []
+
+
+def make_message(user_id: int = 1, message_id: int = 1, **fields) -> FakeMessage:
+    return FakeMessage(
+        message_id=message_id,
+        date=datetime(2024, 1, 1, tzinfo=UTC),
+        chat=Chat(id=user_id, type='private'),
+        from_user=User(id=user_id, is_bot=False, first_name='User'),
+        **fields
+    )
+
+
+def make_location(message_id: int, user_id: int = 1) -> FakeMessage:
+    return make_message(user_id, message_id, location=Location(latitude=55.7, longitude=37.6 + message_id * 1e-4))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(base, 'time', SimpleNamespace(monotonic=clock.monotonic, time=clock.monotonic))
+    warnings.clear()
+    return clock
+
+
+def send(middleware: ThrottlingMiddleware, messages: list[Message]) -> list[int]:
+    """Passes messages through the middleware, returns ids of the handled ones"""
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.message_id)
+
+    async def run():
+        for message in messages:
+            await middleware(handler, message, {})
+
+    asyncio.run(run())
+    return handled
+
+
+def test_burst_then_one_token_per_interval(clock):
+    middleware = ThrottlingMiddleware(rate_limit=10.0, burst=3, warning_cooldown=30.0)
+
+    assert send(middleware, [make_message(message_id=i) for i in range(5)]) == [0, 1, 2]
+    assert len(warnings) == 1  # Once per cooldown
+    clock.now += 15.0  # 1.5 tokens
+    assert send(middleware, [make_message(message_id=i) for i in range(5, 8)]) == [5]
+    assert len(warnings) == 1
+    clock.now += 25.0  # Capped at burst
+    assert send(middleware, [make_message(message_id=i) for i in range(8, 12)]) == [8, 9, 10]
+    assert len(warnings) == 2
+
+
+def test_users_have_separate_buckets(clock):
+    middleware = ThrottlingMiddleware(rate_limit=10.0, burst=1)
+
+    assert send(middleware, [make_message(1, 1), make_message(1, 2), make_message(2, 3)]) == [1, 3]
+    assert warnings == [(1, '⚠️ Слишком много запросов. Подождите немного.')]
+
+
+def test_album_costs_one_token(clock):
+    middleware = ThrottlingMiddleware(rate_limit=10.0, burst=1)
+    album = [make_message(message_id=i, media_group_id='album') for i in range(4)]
+
+    assert send(middleware, [*album, make_message(message_id=4)]) == [0, 1, 2, 3]
+    assert send(middleware, [make_message(message_id=i, media_group_id='other') for i in range(5, 7)]) == []
+    assert len(warnings) == 1
+
+
+def test_buckets_are_evicted_when_full_again(clock):
+    middleware = ThrottlingMiddleware(rate_limit=1.0, burst=2, warning_cooldown=5.0)
+    send(middleware, [make_message(user_id) for user_id in range(100)])
+    assert len(middleware.buckets) == 100
+
+    clock.now += middleware.ttl
+    send(middleware, [make_message(100)])
+    assert list(middleware.buckets) == [100]
+
+
+def test_throttled_locations_are_coalesced():
+    # Real time: delivery of the latest location is scheduled on the event loop
+    middleware = ThrottlingMiddleware(rate_limit=0.05, burst=1)
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.message_id)
+
+    async def run():
+        for message_id in range(4):
+            await middleware(handler, make_location(message_id), {})
+        assert handled == [0]
+        await asyncio.sleep(0.2)
+
+    warnings.clear()
+    asyncio.run(run())
+    assert handled == [0, 3]  # Only the latest throttled location, and no warning for it
+    assert warnings == []
+    assert middleware.buckets[1].pending is None